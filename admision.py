@@ -0,0 +1,166 @@
+"""
+Control de admisión de las subidas al servidor
+
+Cada subida reserva, antes de leer su cuerpo, un hueco en la cola de archivos
+en curso y los bytes que trae (Content-Length), y los libera al terminar la
+solicitud. Si el pipeline ya está lleno (demasiados archivos o bytes pendientes
+de organizar, poco espacio libre en UPLOAD_FOLDER / MANGA_DESTINATION o todas
+las API keys en cuarentena) la subida se rechaza al momento con 503 y
+Retry-After en vez de sumarse a la espera de todos.
+
+Los límites son por proceso del servidor.
+"""
+import logging
+import shutil
+import threading
+from typing import Dict, Optional
+
+import config
+import gemini_organizer
+import metricas
+
+log = logging.getLogger(__name__)
+
+# Motivos de rechazo (etiqueta de manga_admision_rechazos_total)
+ARCHIVOS = 'archivos'
+BYTES = 'bytes'
+DISCO = 'disco'
+CLAVES = 'claves'
+TAMANO = 'tamano'  # Subida mayor que ADMISSION_MAX_PENDING_MB (413, no 503)
+
+MB = 1024 * 1024
+
+_lock = threading.Lock()
+_archivos = 0
+_bytes = 0
+
+
+class Saturado(Exception):
+    """El pipeline no admite más trabajo ahora; reintentar tras `retry_after` segundos"""
+
+    def __init__(self, motivo: str, mensaje: str, retry_after: int):
+        super().__init__(mensaje)
+        self.motivo = motivo
+        self.retry_after = retry_after
+
+
+class DemasiadoGrande(Exception):
+    """La subida no cabría nunca en los límites de admisión (no tiene sentido reintentarla)"""
+
+
+class Reserva:
+    """Hueco reservado por una subida; se libera con liberar() (idempotente)"""
+
+    def __init__(self, archivos: int, bytes_: int):
+        self.archivos = archivos
+        self.bytes = bytes_
+        self._liberada = False
+
+    def ampliar(self, archivos: int):
+        """
+        Añade archivos a la reserva cuando se conocen (p. ej. tras leer un /upload con varios)
+
+        Raises:
+            Saturado: Si con ellos se supera ADMISSION_MAX_FILES
+        """
+        global _archivos
+        with _lock:
+            if (config.ADMISSION_MAX_FILES and _archivos > self.archivos
+                    and _archivos + archivos > config.ADMISSION_MAX_FILES):
+                _rechazar(ARCHIVOS, f"{_archivos} archivos en curso (máximo {config.ADMISSION_MAX_FILES})",
+                          config.ADMISSION_RETRY_AFTER)
+            _archivos += archivos
+            self.archivos += archivos
+            metricas.fijar('manga_admision_en_curso', _archivos, recurso=ARCHIVOS)
+
+    def liberar(self):
+        global _archivos, _bytes
+        with _lock:
+            if self._liberada:
+                return
+            self._liberada = True
+            _archivos -= self.archivos
+            _bytes -= self.bytes
+            metricas.fijar('manga_admision_en_curso', _archivos, recurso=ARCHIVOS)
+            metricas.fijar('manga_admision_en_curso', _bytes, recurso=BYTES)
+
+
+def _rechazar(motivo: str, mensaje: str, retry_after: int):
+    metricas.incrementar('manga_admision_rechazos_total', motivo=motivo)
+    log.warning(f"🚦 Subida rechazada ({motivo}): {mensaje}")
+    raise Saturado(motivo, mensaje, retry_after)
+
+
+def _espacio_libre(ruta: str) -> Optional[int]:
+    try:
+        return shutil.disk_usage(ruta).free
+    except OSError:
+        return None
+
+
+def reservar(archivos: int = 1, bytes_: int = 0) -> Reserva:
+    """
+    Reserva sitio en el pipeline para una subida
+
+    Una subida se admite siempre si no hay nada en curso (aunque supere los
+    límites de archivos o bytes), para que un archivo grande no quede bloqueado
+    para siempre; el límite de disco se aplica igualmente.
+
+    Args:
+        archivos: Archivos que trae la subida (1 si aún no se sabe)
+        bytes_: Tamaño de la subida (Content-Length)
+
+    Raises:
+        DemasiadoGrande: Si la subida no cabe en ADMISSION_MAX_PENDING_MB ni con la cola vacía
+        Saturado: Si ahora mismo no hay sitio
+    """
+    global _archivos, _bytes
+    max_bytes = config.ADMISSION_MAX_PENDING_MB * MB if config.ADMISSION_MAX_PENDING_MB else None
+    if max_bytes and bytes_ > max_bytes:
+        metricas.incrementar('manga_admision_rechazos_total', motivo=TAMANO)
+        raise DemasiadoGrande(
+            f"La subida ({bytes_ // MB} MB) supera el máximo pendiente de {config.ADMISSION_MAX_PENDING_MB} MB"
+        )
+
+    limites = (config.ADMISSION_MAX_FILES, config.ADMISSION_MAX_PENDING_MB, config.ADMISSION_MIN_FREE_MB)
+    cuarentena = gemini_organizer.claves_en_cuarentena()
+    activas = gemini_organizer.claves_activas()
+    # Sin ningún límite configurado el control de admisión está desactivado del todo
+    if any(limites) and activas and all(clave in cuarentena for clave in activas):
+        _rechazar(CLAVES, "todas las API keys están en cuarentena",
+                  max(1, int(min(cuarentena[clave] for clave in activas)) + 1))
+
+    with _lock:
+        if config.ADMISSION_MAX_FILES and _archivos and _archivos + archivos > config.ADMISSION_MAX_FILES:
+            _rechazar(ARCHIVOS, f"{_archivos} archivos en curso (máximo {config.ADMISSION_MAX_FILES})",
+                      config.ADMISSION_RETRY_AFTER)
+        if max_bytes and _bytes and _bytes + bytes_ > max_bytes:
+            _rechazar(BYTES, f"{_bytes // MB} MB pendientes de organizar "
+                             f"(máximo {config.ADMISSION_MAX_PENDING_MB} MB)",
+                      config.ADMISSION_RETRY_AFTER)
+        # Lo que está en curso aún tiene que escribirse en disco: se descuenta del espacio libre
+        minimo = (config.ADMISSION_MIN_FREE_MB or 0) * MB
+        for ruta in (config.UPLOAD_FOLDER, config.MANGA_DESTINATION) if minimo else ():
+            libre = _espacio_libre(ruta)
+            if libre is not None and libre - _bytes - bytes_ < minimo:
+                _rechazar(DISCO, f"quedan {libre // MB} MB libres en {ruta} "
+                                 f"(mínimo {config.ADMISSION_MIN_FREE_MB} MB)",
+                          config.ADMISSION_RETRY_AFTER_DISK)
+
+        _archivos += archivos
+        _bytes += bytes_
+        metricas.fijar('manga_admision_en_curso', _archivos, recurso=ARCHIVOS)
+        metricas.fijar('manga_admision_en_curso', _bytes, recurso=BYTES)
+    return Reserva(archivos, bytes_)
+
+
+def estado() -> Dict:
+    """Ocupación actual y límites, para /status"""
+    with _lock:
+        return {
+            'archivos_en_curso': _archivos,
+            'mb_pendientes': round(_bytes / MB, 1),
+            'max_archivos': config.ADMISSION_MAX_FILES,
+            'max_mb_pendientes': config.ADMISSION_MAX_PENDING_MB,
+            'min_mb_libres': config.ADMISSION_MIN_FREE_MB,
+        }
@@ -0,0 +1,172 @@
+"""
+Agrupación de archivos por serie para ahorrar llamadas a Gemini
+
+Los lotes grandes traen muchos archivos de la misma serie ('Purgatorio 86.pdf',
+'Purgatorio 87.pdf'...). Si el nombre termina en un número de capítulo, el
+título sin ese número (normalizado) identifica la serie: basta con analizar un
+archivo del grupo con Gemini y aplicar su carpeta y título a los demás, cuyo
+capítulo se extrae localmente. Así además todos acaban en la misma carpeta.
+
+El resultado de Gemini solo se reutiliza si coincide con el capítulo extraído
+localmente para ese mismo archivo; si no, la serie se marca como no agrupable
+y cada archivo se analiza por separado.
+"""
+import os
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from unificar_carpetas import normalizar_nombre
+
+# Título + capítulo o rango al final: 'Purgatorio 86', 'The Hornies CH1', 'Ghost 1-81'
+PATRON_CAPITULO = re.compile(
+    r'^(?P<titulo>.*?[^\W\d_].*?)'
+    r'(?:[\s_\-]+(?:cap[ií]tulo|chapter|cap|ch|episodio|ep)\.?\s*|[\s_\-#]+)'
+    r'(?P<capitulo>\d+(?:\s*-\s*\d+)?)$',
+    re.IGNORECASE
+)
+
+PATRON_RANGO = re.compile(r'^\s*(\d+)\s*(?:-\s*(\d+))?\s*$')
+
+EXTENSIONES = ('.pdf', '.zip', '.cbz')
+
+# Datos de la serie que se comparten entre los archivos de un grupo
+CAMPOS_SERIE = ('nombre_carpeta_estandarizado', 'titulo_limpio_archivo', 'es_secuela_o_extra')
+
+
+def normalizar_capitulo(texto: str) -> Optional[str]:
+    """'086' -> '86', '1 - 81' -> '1-81'; None si no es un número o rango"""
+    match = PATRON_RANGO.match(texto or '')
+    if not match:
+        return None
+    inicio = int(match.group(1))
+    if match.group(2) is None or int(match.group(2)) == inicio:
+        return str(inicio)
+    return f"{inicio}-{int(match.group(2))}"
+
+
+def extraer(filename: str) -> Optional[Dict]:
+    """
+    Separa un nombre de archivo en serie y capítulo sin llamar a Gemini
+
+    Returns:
+        {'raiz': título normalizado, 'titulo': título tal cual, 'capitulo': '86' o '1-81'}
+        o None si el nombre no termina en un número de capítulo
+    """
+    base, ext = os.path.splitext(filename.strip())
+    if ext.lower() not in EXTENSIONES:
+        base = filename.strip()
+    match = PATRON_CAPITULO.match(base)
+    if not match:
+        return None
+    titulo = match.group('titulo').strip(' -_')
+    raiz = normalizar_nombre(titulo.replace('_', ' '))
+    if not raiz:
+        return None
+    return {'raiz': raiz, 'titulo': titulo, 'capitulo': normalizar_capitulo(match.group('capitulo'))}
+
+
+def agrupar(nombres: Iterable[str]) -> Tuple[Dict[str, List[str]], List[str]]:
+    """
+    Pasada previa sobre un lote: agrupa los nombres de archivo por serie
+
+    Returns:
+        (grupos, sueltos): {raiz: [nombres]} y la lista de nombres sin capítulo reconocible
+    """
+    grupos: Dict[str, List[str]] = {}
+    sueltos = []
+    for nombre in nombres:
+        partes = extraer(os.path.basename(nombre))
+        if partes is None:
+            sueltos.append(nombre)
+        else:
+            grupos.setdefault(partes['raiz'], []).append(nombre)
+    return grupos, sueltos
+
+
+def llamadas_ahorradas(grupos: Dict[str, List[str]]) -> int:
+    """Llamadas a Gemini que se evitan si cada grupo se resuelve con una sola"""
+    return sum(len(nombres) - 1 for nombres in grupos.values())
+
+
+def aplicar_serie(serie: Dict, partes: Dict) -> Dict:
+    """Metadatos de un archivo a partir de los de su serie y su capítulo local"""
+    return {**serie, 'capitulo_o_rango': partes['capitulo']}
+
+
+class CacheSeries:
+    """
+    Series ya resueltas: {raiz: datos de la serie, o False si no es agrupable}
+
+    Acotada a `capacidad` series (las menos usadas se descartan primero).
+    """
+
+    def __init__(self, capacidad: int = 1000):
+        self.capacidad = capacidad
+        self._series: 'OrderedDict[str, object]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obtener(self, raiz: str):
+        """Datos de la serie, False si no es agrupable o None si aún no se conoce"""
+        with self._lock:
+            serie = self._series.get(raiz)
+            if serie is not None:
+                self._series.move_to_end(raiz)
+            return serie
+
+    def registrar(self, partes: Dict, metadatos: Dict) -> bool:
+        """
+        Guarda la serie del análisis completo de uno de sus archivos
+
+        Returns:
+            True si la serie se puede reutilizar (Gemini vio el mismo capítulo que la extracción local)
+        """
+        valida = normalizar_capitulo(str(metadatos.get('capitulo_o_rango', ''))) == partes['capitulo']
+        with self._lock:
+            self._series[partes['raiz']] = {c: metadatos[c] for c in CAMPOS_SERIE} if valida else False
+            self._series.move_to_end(partes['raiz'])
+            while len(self._series) > self.capacidad:
+                self._series.popitem(last=False)
+        return valida
+
+    def reiniciar(self):
+        with self._lock:
+            self._series.clear()
+
+
+class UnSoloVuelo:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola ejecución"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._vuelos: Dict[Hashable, Future] = {}
+
+    def hacer(self, clave: Hashable, funcion: Callable):
+        """
+        Ejecuta `funcion()` o espera a la ejecución en curso con la misma clave
+
+        Returns:
+            (resultado, propio): propio es False si se reutilizó la ejecución de otro hilo
+        """
+        with self._lock:
+            futuro = self._vuelos.get(clave)
+            propio = futuro is None
+            if propio:
+                futuro = Future()
+                self._vuelos[clave] = futuro
+        if not propio:
+            return futuro.result(), False
+
+        try:
+            resultado = funcion()
+        except BaseException as e:
+            futuro.set_exception(e)
+            raise
+        else:
+            futuro.set_result(resultado)
+        finally:
+            with self._lock:
+                del self._vuelos[clave]
+        return resultado, True
@@ -1,12 +1,28 @@
 """
 Servidor Flask para la aplicación Manga Organizer
 """
-from flask import Flask, render_template, request, jsonify, flash, redirect, url_for
+from flask import Flask, render_template, request, jsonify, flash, redirect, url_for, Response, send_file, g
 from werkzeug.utils import secure_filename
 import os
+import itertools
+import logging
+import threading
+import time
+import zipfile
 from pathlib import Path
+import admision
+import busqueda
 import config
 import gemini_organizer
+import manifiesto
+import metricas
+import paquetes
+import planificador
+import registro
+import sondeo
+
+registro.configurar()
+log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.secret_key = 'manga_organizer_secret_key_2024'
@@ -27,76 +43,276 @@ def archivo_permitido(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in config.ALLOWED_EXTENSIONS
 
 
+ERROR_TIPO = 'Tipo de archivo no permitido (solo PDF, ZIP o CBZ)'
+
+_servicios_iniciados = False
+_lock_servicios = threading.Lock()
+
+
+def iniciar_servicios():
+    """
+    Arranca los servicios de fondo del servidor (idempotente)
+
+    Solo en el proceso que sirve las solicitudes: no al importar este módulo,
+    que también ocurre en el proceso vigía del recargador de debug y en
+    cualquier script que lo importe.
+    """
+    global _servicios_iniciados
+    with _lock_servicios:
+        if _servicios_iniciados:
+            return
+        # Retirar las API keys inválidas o sin cuota antes de recibir tráfico
+        sondeo.iniciar()
+        # Manifiesto para el lector: al día al arrancar y después tras cada archivo organizado
+        manifiesto.iniciar()
+        busqueda.iniciar()
+        _servicios_iniciados = True
+
+
+@app.before_request
+def asegurar_servicios():
+    # Servido por un servidor WSGI externo (sin pasar por __main__): se arrancan con la primera solicitud
+    if not _servicios_iniciados:
+        iniciar_servicios()
+
+
+# Endpoints que pasan por el control de admisión (ver admision.py)
+ENDPOINTS_SUBIDA = {'upload_file', 'upload_single_file'}
+
+
+def _respuesta_saturado(error):
+    """503 con Retry-After para una subida que el pipeline no puede admitir ahora"""
+    respuesta = jsonify({
+        'success': False,
+        'error': f"Servidor saturado: {error}. Reintenta en {error.retry_after}s",
+        'retry_after': error.retry_after
+    })
+    respuesta.status_code = 503
+    respuesta.headers['Retry-After'] = str(error.retry_after)
+    return respuesta
+
+
+@app.before_request
+def admitir_subida():
+    """Reserva sitio para una subida antes de leer su cuerpo; si no lo hay, la rechaza al momento"""
+    if request.endpoint not in ENDPOINTS_SUBIDA:
+        return None
+    if request.content_length is None and (config.ADMISSION_MAX_PENDING_MB or config.ADMISSION_MIN_FREE_MB):
+        # Sin Content-Length (p. ej. chunked) no se sabe cuántos bytes reservar
+        log.warning("❌ Subida rechazada: sin Content-Length")
+        return jsonify({'success': False, 'error': 'La subida debe indicar Content-Length'}), 411
+    try:
+        g.reserva = admision.reservar(1, request.content_length or 0)
+    except admision.DemasiadoGrande as e:
+        return jsonify({'success': False, 'error': str(e)}), 413
+    except admision.Saturado as e:
+        return _respuesta_saturado(e)
+    return None
+
+
+@app.teardown_request
+def liberar_subida(_error):
+    reserva = g.pop('reserva', None)
+    if reserva is not None:
+        reserva.liberar()
+
+
+def _extraer_paquetes(paquetes_recibidos, carpeta_trabajo, resultados, reserva=None):
+    """
+    Va extrayendo los PDFs de los paquetes subidos, de uno en uno
+
+    Cada PDF se entrega al pipeline en cuanto está en disco; las entradas que no
+    se pudieron extraer se añaden a `resultados` como errores. Cada paquete entra
+    en `reserva` (admision.Reserva) como un archivo: los PDFs que trae de más se
+    van añadiendo según se extraen, y si el pipeline se llena se deja de extraer
+    ese paquete.
+    """
+    for file in paquetes_recibidos:
+        nombre = secure_filename(file.filename)
+        carpeta = os.path.join(carpeta_trabajo, os.path.splitext(nombre)[0] or 'paquete')
+        log.info(f"📦 Extrayendo {file.filename}")
+        errores = []
+        extraidos = 0
+        try:
+            # werkzeug guarda la subida en un archivo temporal con seek: se lee el ZIP sin copiarlo
+            for ruta in paquetes.extraer_pdfs(file.stream, carpeta, renombrar=secure_filename, errores=errores):
+                if extraidos and reserva is not None:
+                    try:
+                        reserva.ampliar(1)
+                    except admision.Saturado:
+                        os.remove(ruta)
+                        raise
+                extraidos += 1
+                metricas.incrementar('manga_archivos_total', resultado='aceptado')
+                yield ruta
+        except zipfile.BadZipFile:
+            log.warning(f"❌ Paquete dañado o no válido: {file.filename}")
+            errores.append({
+                'success': False,
+                'original_name': file.filename,
+                'error': 'Paquete ZIP/CBZ dañado o no válido'
+            })
+        except admision.Saturado as e:
+            log.warning(f"🚦 {file.filename}: se deja de extraer tras {extraidos} PDF(s)")
+            errores.append({
+                'success': False,
+                'original_name': file.filename,
+                'error': f"Servidor saturado: {e}. Solo se procesaron {extraidos} PDF(s) del paquete; "
+                         f"reintenta en {e.retry_after}s",
+                'retry_after': e.retry_after
+            })
+        if errores:
+            metricas.incrementar('manga_archivos_total', len(errores), resultado='rechazado')
+            resultados.extend(errores)
+        # La carpeta queda vacía si todos sus PDFs se organizaron
+        try:
+            os.rmdir(carpeta)
+        except OSError:
+            pass
+
+
+def _organizar_recibidos(files, trabajo, resultados):
+    """
+    Guarda y organiza archivos ya validados (PDF, ZIP o CBZ)
+
+    Se guardan en una carpeta propia del trabajo, para que dos subidas simultáneas
+    con el mismo nombre no se pisen.
+
+    Returns:
+        Cuerpo de la respuesta JSON con los resultados de cada archivo
+    """
+    carpeta_trabajo = os.path.join(app.config['UPLOAD_FOLDER'], trabajo)
+    os.makedirs(carpeta_trabajo, exist_ok=True)
+    archivos_guardados = []
+    paquetes_recibidos = []
+    
+    # Guardar todos los PDFs primero; los paquetes se extraen durante el procesamiento
+    for i, file in enumerate(files, 1):
+        if paquetes.es_paquete(file.filename):
+            paquetes_recibidos.append(file)
+            continue
+        filename = secure_filename(file.filename)
+        filepath = os.path.join(carpeta_trabajo, filename)
+        log.debug("[%d/%d] Guardando: %s", i, len(files), filename)
+        with metricas.cronometrar('subida_guardado'):
+            file.save(filepath)
+        archivos_guardados.append(filepath)
+        metricas.incrementar('manga_archivos_total', resultado='aceptado')
+    
+    # Procesar todos los archivos con Gemini; los PDFs de cada paquete según se extraen
+    if archivos_guardados or paquetes_recibidos:
+        log.info(f"🤖 Procesando {len(archivos_guardados)} archivo(s) y "
+                 f"{len(paquetes_recibidos)} paquete(s) con Gemini...")
+        pendientes = archivos_guardados
+        if paquetes_recibidos:
+            pendientes = itertools.chain(
+                archivos_guardados,
+                _extraer_paquetes(paquetes_recibidos, carpeta_trabajo, resultados, g.get('reserva'))
+            )
+        resultados.extend(gemini_organizer.procesar_multiples_archivos(
+            pendientes,
+            config.MANGA_DESTINATION,
+            prioridad=planificador.INTERACTIVA
+        ))
+    try:
+        os.rmdir(carpeta_trabajo)
+    except OSError:
+        pass
+    
+    # Contar éxitos y fallos
+    exitosos = sum(1 for r in resultados if r.get('success'))
+    fallidos = len(resultados) - exitosos
+    
+    return {
+        'success': True,
+        'trabajo': trabajo,
+        'total': len(resultados),
+        'exitosos': exitosos,
+        'fallidos': fallidos,
+        'resultados': resultados
+    }
+
+
 @app.route('/')
 def index():
     """Página principal con el formulario de subida"""
-    return render_template('index.html')
+    return render_template(
+        'index.html',
+        upload_concurrency=config.UPLOAD_CONCURRENCY,
+        upload_retries=config.UPLOAD_RETRIES
+    )
 
 
 @app.route('/upload', methods=['POST'])
 def upload_file():
     """Maneja la subida de archivos PDF"""
-    
-    print("\n" + "="*80)
-    print("🚀 NUEVA SOLICITUD DE SUBIDA DE ARCHIVOS")
-    print("="*80)
+    trabajo = registro.nuevo_id()
+    with registro.contexto(trabajo=trabajo), metricas.cronometrar('subida_total'):
+        return _procesar_subida(trabajo)
+
+
+def _procesar_subida(trabajo):
+    """Cuerpo de upload_file: guarda los archivos recibidos y los organiza"""
+    log.info("🚀 Nueva solicitud de subida de archivos")
     
     # Verificar si se enviaron archivos
     if 'files[]' not in request.files:
-        print("❌ Error: No se enviaron archivos")
+        log.warning("❌ Error: No se enviaron archivos")
         return jsonify({'success': False, 'error': 'No se enviaron archivos'}), 400
     
     files = request.files.getlist('files[]')
     
     if not files or files[0].filename == '':
-        print("❌ Error: No se seleccionaron archivos")
+        log.warning("❌ Error: No se seleccionaron archivos")
         return jsonify({'success': False, 'error': 'No se seleccionaron archivos'}), 400
     
-    print(f"📦 Total de archivos recibidos: {len(files)}")
+    log.info(f"📦 Total de archivos recibidos: {len(files)}")
     
     resultados = []
-    archivos_guardados = []
-    
-    # Guardar todos los archivos primero
-    print("\n📥 Guardando archivos...")
-    for i, file in enumerate(files, 1):
+    aceptados = []
+    for file in files:
         if file and archivo_permitido(file.filename):
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            print(f"  [{i}/{len(files)}] Guardando: {filename}")
-            file.save(filepath)
-            archivos_guardados.append(filepath)
-            print(f"  ✅ Guardado correctamente")
+            aceptados.append(file)
         else:
-            print(f"  ❌ Archivo rechazado: {file.filename if file else 'desconocido'}")
+            log.warning(f"❌ Archivo rechazado: {file.filename if file else 'desconocido'}")
+            metricas.incrementar('manga_archivos_total', resultado='rechazado')
             resultados.append({
                 'success': False,
                 'original_name': file.filename if file else 'desconocido',
-                'error': 'Tipo de archivo no permitido (solo PDF)'
+                'error': ERROR_TIPO
             })
     
-    # Procesar todos los archivos con Gemini
-    if archivos_guardados:
-        print(f"\n🤖 Procesando {len(archivos_guardados)} archivo(s) con Gemini...")
-        print("-"*80)
-        resultados_procesamiento = gemini_organizer.procesar_multiples_archivos(
-            archivos_guardados,
-            config.MANGA_DESTINATION
-        )
-        resultados.extend(resultados_procesamiento)
-        print("-"*80)
-    
-    # Contar éxitos y fallos
-    exitosos = sum(1 for r in resultados if r.get('success'))
-    fallidos = len(resultados) - exitosos
+    # La reserva se hizo para un archivo: se amplía con el resto de los recibidos
+    try:
+        g.reserva.ampliar(max(0, len(aceptados) - 1))
+    except admision.Saturado as e:
+        return _respuesta_saturado(e)
     
-    return jsonify({
-        'success': True,
-        'total': len(resultados),
-        'exitosos': exitosos,
-        'fallidos': fallidos,
-        'resultados': resultados
-    })
+    return jsonify(_organizar_recibidos(aceptados, trabajo, resultados))
+
+
+@app.route('/upload/archivo', methods=['POST'])
+def upload_single_file():
+    """
+    Sube y organiza un solo archivo (PDF, ZIP o CBZ) en el campo 'file'
+
+    La web envía así cada archivo por separado, varios a la vez: cada uno empieza a
+    procesarse en cuanto termina su subida y un fallo solo afecta a ese archivo.
+    Responde con el mismo formato que /upload.
+    """
+    trabajo = registro.nuevo_id()
+    with registro.contexto(trabajo=trabajo), metricas.cronometrar('subida_total'):
+        file = request.files.get('file')
+        if not file or file.filename == '':
+            log.warning("❌ Error: No se envió ningún archivo")
+            return jsonify({'success': False, 'error': 'No se envió ningún archivo'}), 400
+        if not archivo_permitido(file.filename):
+            log.warning(f"❌ Archivo rechazado: {file.filename}")
+            metricas.incrementar('manga_archivos_total', resultado='rechazado')
+            return jsonify({'success': False, 'error': ERROR_TIPO}), 400
+        
+        log.info(f"🚀 Subida individual: {file.filename}")
+        return jsonify(_organizar_recibidos([file], trabajo, []))
 
 
 @app.route('/status')
@@ -106,10 +322,20 @@ def status():
         'status': 'online',
         'upload_folder': config.UPLOAD_FOLDER,
         'destination': config.MANGA_DESTINATION,
-        'gemini_model': config.GEMINI_MODEL
+        'gemini_model': config.GEMINI_MODEL,
+        'admision': admision.estado()
     })
 
 
+@app.route('/metrics')
+def metrics():
+    """Métricas de rendimiento en formato de texto de Prometheus"""
+    return Response(
+        metricas.exportar_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
+
+
 @app.route('/folders')
 def list_folders():
     """Lista las carpetas de manga organizadas"""
@@ -140,11 +366,59 @@ def list_folders():
         }), 500
 
 
+@app.route('/search')
+def search():
+    """Busca series y capítulos por nombre (autocompletado: la última palabra puede estar a medias)"""
+    if not config.SEARCH_ENABLED:
+        return jsonify({'success': False, 'error': 'La búsqueda está desactivada (SEARCH_ENABLED)'}), 404
+    consulta = request.args.get('q', '')
+    limite = min(request.args.get('limite', 20, type=int), config.SEARCH_MAX_RESULTS)
+    inicio = time.perf_counter()
+    resultados = busqueda.buscar(consulta, limite)
+    return jsonify({
+        'success': True,
+        'consulta': consulta,
+        'total': len(resultados),
+        'resultados': resultados,
+        'milisegundos': round((time.perf_counter() - inicio) * 1000, 2),
+    })
+
+
+@app.route('/manifiesto/<nombre>')
+def manifiesto_archivo(nombre):
+    """
+    Índice o fragmento del manifiesto de la biblioteca, precomprimido
+
+    Se sirve la variante brotli o gzip si el cliente la acepta, con ETag para
+    que el lector solo vuelva a descargar lo que ha cambiado (304 si no).
+    """
+    if not config.MANIFEST_ENABLED:
+        return jsonify({'success': False, 'error': 'El manifiesto está desactivado (MANIFEST_ENABLED)'}), 404
+    variante = manifiesto.variante(nombre, lambda codificacion: request.accept_encodings[codificacion])
+    if variante is None:
+        return jsonify({'success': False, 'error': 'No existe ese archivo del manifiesto'}), 404
+    ruta, codificacion = variante
+    estado = os.stat(ruta)
+    respuesta = send_file(ruta, mimetype='application/json', conditional=True,
+                          etag=f"{estado.st_mtime_ns:x}-{estado.st_size:x}")
+    if codificacion:
+        respuesta.headers['Content-Encoding'] = codificacion
+    respuesta.vary.add('Accept-Encoding')
+    respuesta.cache_control.no_cache = True
+    return respuesta
+
+
 if __name__ == '__main__':
-    print(f"🚀 Iniciando Manga Organizer Server...")
-    print(f"📁 Carpeta de subida: {config.UPLOAD_FOLDER}")
-    print(f"📚 Carpeta de destino: {config.MANGA_DESTINATION}")
-    print(f"🤖 Modelo Gemini: {config.GEMINI_MODEL}")
-    print(f"🌐 Servidor corriendo en http://0.0.0.0:{config.PORT}")
+    log.info("🚀 Iniciando Manga Organizer Server...")
+    log.info(f"📁 Carpeta de subida: {config.UPLOAD_FOLDER}")
+    log.info(f"📚 Carpeta de destino: {config.MANGA_DESTINATION}")
+    log.info(f"🤖 Modelo Gemini: {config.GEMINI_MODEL}")
+    log.info(f"📝 Logs JSON en: {config.LOG_FILE}")
+    log.info(f"🌐 Servidor corriendo en http://0.0.0.0:{config.PORT}")
     
-    app.run(host='0.0.0.0', port=config.PORT, debug=True)
+    debug = True
+    # Con el recargador de debug este bloque corre también en el proceso vigía,
+    # que no sirve nada: los servicios solo arrancan en el hijo (WERKZEUG_RUN_MAIN)
+    if not debug or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        iniciar_servicios()
+    app.run(host='0.0.0.0', port=config.PORT, debug=debug)
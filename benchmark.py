@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+"""
+Benchmark del organizador contra un servidor Gemini simulado (mock_gemini.py).
+
+Reproduce un corpus de nombres de archivo (por ejemplo los 310 de
+reporte-lote-grande.txt) y mide archivos/seg, latencia p50/p99 por archivo y
+tiempo desperdiciado en esperas, sin red ni cuota real.
+
+Uso:
+    python benchmark.py --corpus reporte-lote-grande.txt --modos serial,paralelo,cache
+    python benchmark.py --modos paralelo,clusters   # análisis por series (agrupacion.py)
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agrupacion
+import config
+import gemini_organizer
+import lote
+import metricas
+import mock_gemini
+import registro
+
+MODOS = ('serial', 'paralelo', 'cache', 'clusters')
+
+# Líneas '12. Nombre del archivo.pdf' del reporte de lote
+PATRON_REPORTE = re.compile(r'^\d+\.\s+(.+\.pdf)\s*$', re.IGNORECASE)
+
+
+def cargar_corpus(ruta: str) -> list:
+    """Lee nombres de archivo de un informe de lote.py, un reporte de lote o un texto con uno por línea"""
+    if ruta.lower().endswith(('.jsonl', '.csv')):
+        return [fila['archivo'] for fila in lote.leer_informe(ruta) if fila.get('archivo')]
+    nombres = []
+    with open(ruta, encoding='utf-8') as f:
+        lineas = [linea.rstrip('\n') for linea in f]
+
+    for linea in lineas:
+        match = PATRON_REPORTE.match(linea)
+        if match:
+            nombres.append(match.group(1))
+    if nombres:
+        return nombres
+
+    return [linea.strip() for linea in lineas if linea.strip().lower().endswith('.pdf')]
+
+
+def percentil(valores: list, p: float) -> float:
+    """Percentil por el método del rango más cercano"""
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def primero_por_serie(nombres: list) -> list:
+    """Mismo orden que lote.ordenar_por_series: un archivo de cada serie y luego el resto"""
+    vistas = set()
+    primeros, resto = [], []
+    for nombre in nombres:
+        partes = agrupacion.extraer(nombre)
+        if partes is not None and partes['raiz'] in vistas:
+            resto.append(nombre)
+        else:
+            primeros.append(nombre)
+            if partes is not None:
+                vistas.add(partes['raiz'])
+    return primeros + resto
+
+
+def ejecutar_modo(modo: str, nombres: list, concurrencia: int, repeticiones: int) -> dict:
+    """Organiza el corpus (archivos vacíos en un directorio temporal) en un modo dado"""
+    metricas.reiniciar()
+    gemini_organizer.reiniciar_modelos()
+    config.ANALYSIS_CACHE_SIZE = len(nombres) if modo == 'cache' else 0
+    config.CLUSTER_ANALYSIS = modo == 'clusters'
+    if modo == 'clusters':
+        nombres = primero_por_serie(nombres)
+    hilos = 1 if modo == 'serial' else concurrencia
+    pasadas = repeticiones if modo == 'cache' else 1
+
+    latencias = []
+    exitosos = 0
+    trabajo = tempfile.mkdtemp(prefix='bench-manga-')
+    try:
+        inicio = time.perf_counter()
+        for pasada in range(pasadas):
+            origen = os.path.join(trabajo, f'origen-{pasada}')
+            destino = os.path.join(trabajo, f'destino-{pasada}')
+            os.makedirs(origen)
+            rutas = []
+            for i, nombre in enumerate(nombres):
+                # Subcarpeta por archivo: el corpus puede repetir nombres
+                carpeta = os.path.join(origen, str(i))
+                os.makedirs(carpeta)
+                ruta = os.path.join(carpeta, nombre)
+                open(ruta, 'wb').close()
+                rutas.append(ruta)
+
+            def organizar(ruta):
+                t0 = time.perf_counter()
+                resultado = gemini_organizer.organizar_manga(ruta, destino)
+                return resultado, time.perf_counter() - t0
+
+            with ThreadPoolExecutor(max_workers=hilos) as executor:
+                for resultado, segundos in executor.map(organizar, rutas):
+                    latencias.append(segundos)
+                    exitosos += 1 if resultado.get('success') else 0
+        total = time.perf_counter() - inicio
+    finally:
+        shutil.rmtree(trabajo, ignore_errors=True)
+
+    etapas = metricas.resumen_etapas()
+    espera = sum(v['suma'] for k, v in etapas.items() if k.startswith('espera_'))
+    aciertos = metricas.valor_contador('manga_cache_consultas_total', resultado='acierto')
+    consultas = metricas.valor_contador('manga_cache_consultas_total')
+    return {
+        'modo': modo,
+        'hilos': hilos,
+        'archivos': len(latencias),
+        'exitosos': exitosos,
+        'segundos': total,
+        'archivos_por_segundo': len(latencias) / total if total else 0.0,
+        'latencia_p50': percentil(latencias, 50),
+        'latencia_p99': percentil(latencias, 99),
+        'espera_desperdiciada': espera,
+        'solicitudes_gemini': metricas.valor_contador('manga_gemini_solicitudes_total'),
+        'respuestas_429': metricas.valor_contador('manga_gemini_429_total'),
+        'respaldos': metricas.valor_contador('manga_gemini_respaldos_total'),
+        'respaldos_ganados': metricas.valor_contador('manga_gemini_respaldos_total', resultado='ganado'),
+        'reintentos': metricas.valor_contador('manga_gemini_reintentos_total'),
+        'agrupados': metricas.valor_contador('manga_agrupacion_total'),
+        'tasa_aciertos_cache': aciertos / consultas if consultas else 0.0,
+        'limites_concurrencia': gemini_organizer.limites_concurrencia(),
+        'etapas': etapas,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark offline del Manga Organizer')
+    parser.add_argument('--corpus', default=os.path.join(config.BASE_DIR, 'reporte-lote-grande.txt'),
+                        help='Reporte de lote o archivo de texto con un nombre por línea')
+    parser.add_argument('--limite', type=int, default=None, help='Usar solo los primeros N nombres')
+    parser.add_argument('--modos', default='serial,paralelo,cache',
+                        help=f"Modos separados por comas: {', '.join(MODOS)}")
+    parser.add_argument('--concurrencia', type=int, default=8, help='Hilos en los modos paralelos')
+    parser.add_argument('--repeticiones', type=int, default=2, help='Pasadas del corpus en el modo cache')
+    parser.add_argument('--claves', type=int, default=10, help='Número de API keys simuladas')
+    parser.add_argument('--latencia', type=float, default=0.2, help='Latencia media simulada (s)')
+    parser.add_argument('--jitter', type=float, default=0.05, help='Desviación de la latencia (s)')
+    parser.add_argument('--tasa-429', type=float, default=0.02)
+    parser.add_argument('--tasa-malformado', type=float, default=0.01)
+    parser.add_argument('--tasa-lenta', type=float, default=0.0, help='Proporción de respuestas muy lentas')
+    parser.add_argument('--latencia-lenta', type=float, default=5.0, help='Segundos extra de una respuesta lenta')
+    parser.add_argument('--escala-esperas', type=float, default=0.01,
+                        help='Factor aplicado a REQUEST_DELAY, RETRY_DELAY, RATE_LIMIT_WAIT y ADAPTIVE_BACKOFF_MIN')
+    parser.add_argument('--fijo', action='store_true',
+                        help='Sin control adaptativo de concurrencia (esperas fijas de config.py)')
+    parser.add_argument('--respaldo', action='store_true',
+                        help='Activar las solicitudes de respaldo (HEDGING_ENABLED)')
+    parser.add_argument('--semilla', type=int, default=42)
+    parser.add_argument('--json', dest='salida_json', default=None, help='Guardar resultados en un JSON')
+    args = parser.parse_args()
+
+    modos = [m.strip() for m in args.modos.split(',') if m.strip()]
+    desconocidos = [m for m in modos if m not in MODOS]
+    if desconocidos:
+        parser.error(f"Modos desconocidos: {', '.join(desconocidos)}")
+
+    nombres = cargar_corpus(args.corpus)
+    if args.limite:
+        nombres = nombres[:args.limite]
+    if not nombres:
+        print(f"❌ No se encontraron nombres de archivo en {args.corpus}")
+        sys.exit(1)
+
+    # Solo errores por terminal: escribir cada línea de log falsearía la medición
+    registro.configurar(nivel='ERROR', archivo='')
+
+    opciones = mock_gemini.OpcionesSimulacion(
+        latencia=args.latencia, jitter=args.jitter, tasa_429=args.tasa_429,
+        tasa_malformado=args.tasa_malformado, tasa_lenta=args.tasa_lenta,
+        latencia_lenta=args.latencia_lenta, semilla=args.semilla,
+    )
+    servidor, endpoint = mock_gemini.iniciar_servidor(opciones)
+
+    config.GEMINI_API_ENDPOINT = endpoint
+    config.GOOGLE_API_KEYS = [f'clave-simulada-{i}' for i in range(1, args.claves + 1)]
+    config.REQUEST_DELAY *= args.escala_esperas
+    config.RETRY_DELAY *= args.escala_esperas
+    config.RATE_LIMIT_WAIT *= args.escala_esperas
+    config.ADAPTIVE_BACKOFF_MIN *= args.escala_esperas
+    config.ADAPTIVE_CONCURRENCY = not args.fijo
+    config.HEDGING_ENABLED = args.respaldo
+    config.ADAPTIVE_STATE_PATH = ''  # No mezclar los límites simulados con los reales
+
+    print(f"🤖 Gemini simulado en {endpoint}")
+    print(f"📚 Corpus: {len(nombres)} nombres ({args.corpus})")
+    print(f"⏱️  Esperas escaladas x{args.escala_esperas}: REQUEST_DELAY={config.REQUEST_DELAY:.3f}s, "
+          f"RATE_LIMIT_WAIT={config.RATE_LIMIT_WAIT:.3f}s")
+    print(f"🎚️  Concurrencia por key: {'fija' if args.fijo else 'adaptativa (AIMD)'}, "
+          f"respaldos: {'sí' if args.respaldo else 'no'}\n")
+
+    resultados = []
+    try:
+        for modo in modos:
+            print(f"▶️  Modo {modo}...")
+            resultados.append(ejecutar_modo(modo, nombres, args.concurrencia, args.repeticiones))
+    finally:
+        servidor.shutdown()
+
+    print(f"\n{'modo':<10} {'hilos':>5} {'archivos':>8} {'ok':>5} {'arch/s':>8} "
+          f"{'p50 (s)':>8} {'p99 (s)':>8} {'espera (s)':>10} {'429':>5} {'cache':>6} {'resp.':>7} "
+          f"{'llamadas':>8} {'agrup.':>6}")
+    for r in resultados:
+        print(f"{r['modo']:<10} {r['hilos']:>5} {r['archivos']:>8} {r['exitosos']:>5} "
+              f"{r['archivos_por_segundo']:>8.2f} {r['latencia_p50']:>8.3f} {r['latencia_p99']:>8.3f} "
+              f"{r['espera_desperdiciada']:>10.2f} {int(r['respuestas_429']):>5} "
+              f"{r['tasa_aciertos_cache']:>6.0%} {int(r['respaldos_ganados']):>3}/{int(r['respaldos']):<3} "
+              f"{int(r['solicitudes_gemini']):>8} {int(r['agrupados']):>6}")
+    print(f"\n(espera = tiempo en sleeps de REQUEST_DELAY/reintentos/429, ya escalado x{args.escala_esperas}; "
+          f"resp. = respaldos ganados/lanzados; agrup. = análisis resueltos por serie sin llamada propia)")
+
+    if args.salida_json:
+        with open(args.salida_json, 'w', encoding='utf-8') as f:
+            json.dump({'parametros': vars(args), 'resultados': resultados}, f, indent=2, ensure_ascii=False)
+        print(f"💾 Resultados guardados en {args.salida_json}")
+
+
+if __name__ == "__main__":
+    main()
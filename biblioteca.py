@@ -0,0 +1,344 @@
+"""
+Índice de la biblioteca de mangas y motor de planes de movimiento
+
+El índice se construye con una sola pasada de os.scandir por carpeta de serie,
+de modo que los planes (unificación, correcciones...) se calculan en memoria sin
+hacer un stat por cada comprobación. Los planes se aplican después en bloque,
+en paralelo y con un diario que permite deshacerlos.
+"""
+import errno
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set
+
+
+def escanear_serie(ruta: str) -> Dict:
+    """
+    Lee el contenido de una carpeta de serie
+
+    Returns:
+        {'mtime_ns': int, 'archivos': {nombre: tamaño}, 'subcarpetas': [nombres]}
+    """
+    # El mtime se lee antes de listar: si algo cambia durante el listado,
+    # la próxima actualización verá un mtime distinto y volverá a leer la carpeta
+    mtime_ns = os.stat(ruta).st_mtime_ns
+    archivos = {}
+    subcarpetas = []
+    with os.scandir(ruta) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                subcarpetas.append(entrada.name)
+            else:
+                try:
+                    archivos[entrada.name] = entrada.stat(follow_symlinks=False).st_size
+                except FileNotFoundError:
+                    continue
+    return {
+        'mtime_ns': mtime_ns,
+        'archivos': archivos,
+        'subcarpetas': sorted(subcarpetas),
+    }
+
+
+def escanear_biblioteca(base: str) -> Dict[str, Dict]:
+    """
+    Construye el índice de la biblioteca: {nombre_serie: escanear_serie(...)}
+    """
+    indice = {}
+    if not os.path.isdir(base):
+        return indice
+    with os.scandir(base) as entradas:
+        for entrada in entradas:
+            if entrada.is_dir(follow_symlinks=False):
+                try:
+                    indice[entrada.name] = escanear_serie(entrada.path)
+                except FileNotFoundError:
+                    continue
+    return indice
+
+
+def actualizar_indice(base: str, previo: Optional[Dict[str, Dict]] = None):
+    """
+    Actualiza un índice existente volviendo a leer solo las series que cambiaron
+
+    Una carpeta cambia de mtime cuando se añade, borra o renombra algo dentro,
+    así que basta un stat por serie para saber si hay que releerla.
+
+    Returns:
+        (indice, cambiadas, eliminadas) — las dos últimas son sets de nombres de serie
+    """
+    previo = previo or {}
+    indice = {}
+    cambiadas = set()
+    if os.path.isdir(base):
+        with os.scandir(base) as entradas:
+            for entrada in entradas:
+                if not entrada.is_dir(follow_symlinks=False):
+                    continue
+                try:
+                    mtime_ns = entrada.stat(follow_symlinks=False).st_mtime_ns
+                    anterior = previo.get(entrada.name)
+                    if anterior is not None and anterior['mtime_ns'] == mtime_ns:
+                        indice[entrada.name] = anterior
+                    else:
+                        indice[entrada.name] = escanear_serie(entrada.path)
+                        cambiadas.add(entrada.name)
+                except FileNotFoundError:
+                    continue
+    eliminadas = set(previo) - set(indice)
+    return indice, cambiadas, eliminadas
+
+
+def cargar_json(ruta: str, por_defecto=None):
+    """Lee un estado JSON persistido; devuelve `por_defecto` si no existe o está dañado"""
+    try:
+        with open(ruta, encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return por_defecto
+
+
+def guardar_json(datos, ruta: str):
+    """
+    Guarda un estado JSON de forma atómica (archivo temporal + rename)
+
+    El temporal es único por escritura: varios procesos pueden guardar el mismo
+    archivo a la vez sin pisarse el temporal (gana el último rename).
+    """
+    carpeta = os.path.dirname(os.path.abspath(ruta))
+    os.makedirs(carpeta, exist_ok=True)
+    descriptor, temporal = tempfile.mkstemp(dir=carpeta, prefix=f".{os.path.basename(ruta)}.", suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as f:
+            json.dump(datos, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+    except BaseException:
+        try:
+            os.unlink(temporal)
+        except OSError:
+            pass
+        raise
+
+
+def resolver_colision(nombre: str, ocupados: Set[str]) -> str:
+    """
+    Devuelve un nombre libre ('Nombre (1).pdf', 'Nombre (2).pdf'...) y lo marca como ocupado
+
+    La comprobación se hace contra el conjunto en memoria, no contra el disco.
+    """
+    if nombre not in ocupados:
+        ocupados.add(nombre)
+        return nombre
+    base, ext = os.path.splitext(nombre)
+    contador = 1
+    while True:
+        candidato = f"{base} ({contador}){ext}"
+        if candidato not in ocupados:
+            ocupados.add(candidato)
+            return candidato
+        contador += 1
+
+
+def nuevo_plan(base: str, tipo: str) -> Dict:
+    """Crea un plan vacío de movimientos sobre la biblioteca `base`"""
+    return {
+        'tipo': tipo,
+        'base': base,
+        'creado': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'movimientos': [],
+        'eliminar_carpetas': [],
+    }
+
+
+def guardar_plan(plan: Dict, ruta: str):
+    """Exporta un plan a JSON (para revisarlo antes de aplicarlo)"""
+    os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+    with open(ruta, 'w', encoding='utf-8') as f:
+        json.dump(plan, f, indent=2, ensure_ascii=False)
+
+
+def cargar_plan(ruta: str) -> Dict:
+    """Lee un plan exportado con guardar_plan()"""
+    with open(ruta, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def revalidar_destinos(plan: Dict) -> int:
+    """
+    Renombra los destinos de un plan que ya existen en disco (p. ej. de un plan exportado hace tiempo)
+
+    Se lista una vez cada carpeta destino del plan. Los cambios se anotan en plan['colisiones'].
+
+    Returns:
+        Número de destinos renombrados
+    """
+    por_carpeta = {}
+    for movimiento in plan['movimientos']:
+        por_carpeta.setdefault(os.path.dirname(movimiento['destino']), []).append(movimiento)
+
+    renombrados = 0
+    for carpeta, movimientos in por_carpeta.items():
+        try:
+            en_disco = set(os.listdir(carpeta))
+        except FileNotFoundError:
+            continue
+        ocupados = en_disco | {os.path.basename(m['destino']) for m in movimientos}
+        for movimiento in movimientos:
+            nombre = os.path.basename(movimiento['destino'])
+            if nombre not in en_disco:
+                continue
+            nuevo = resolver_colision(nombre, ocupados)
+            movimiento['destino'] = os.path.join(carpeta, nuevo)
+            plan.setdefault('colisiones', []).append({
+                'archivo': movimiento.get('archivo', os.path.basename(movimiento['origen'])),
+                'carpeta': os.path.basename(carpeta),
+                'nombre': nombre,
+                'renombrado': nuevo,
+                'motivo': 'apareció en la biblioteca después de crear el plan',
+            })
+            renombrados += 1
+    return renombrados
+
+
+def _ya_existe(destino: str):
+    raise FileExistsError(errno.EEXIST, 'El destino ya existe, no se sobrescribe', destino)
+
+
+def _mover(origen: str, destino: str):
+    """
+    Mueve un archivo o carpeta sin sobrescribir nunca el destino
+
+    Los archivos se mueven con un enlace duro y el borrado del origen, así que si
+    el destino aparece mientras tanto el enlace falla en vez de pisarlo. Las
+    carpetas, los sistemas de archivos sin enlaces duros y los cambios de
+    dispositivo comprueban antes que el destino no exista.
+
+    Raises:
+        FileExistsError: Si el destino ya existe
+    """
+    if not os.path.isdir(origen) or os.path.islink(origen):
+        try:
+            os.link(origen, destino, follow_symlinks=False)
+        except FileExistsError:
+            _ya_existe(destino)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EPERM, errno.ENOTSUP, errno.EMLINK):
+                raise
+        else:
+            os.unlink(origen)
+            return
+
+    if os.path.lexists(destino):
+        _ya_existe(destino)
+    try:
+        os.rename(origen, destino)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(origen, destino)
+
+
+def mover_a_nombre_libre(origen: str, carpeta: str, nombre: str) -> str:
+    """
+    Mueve `origen` a `carpeta` como `nombre`, o como 'nombre (1)'... si ya existe
+
+    Returns:
+        Nombre con el que quedó el archivo
+    """
+    ocupados = set(os.listdir(carpeta))
+    while True:
+        libre = resolver_colision(nombre, ocupados)
+        try:
+            _mover(origen, os.path.join(carpeta, libre))
+            return libre
+        except FileExistsError:
+            # Apareció entre el listado y el movimiento: resolver_colision ya lo marcó ocupado
+            continue
+
+
+def aplicar_movimientos(movimientos: List[Dict], hilos: int = 8,
+                        diario: Optional[str] = None) -> Dict:
+    """
+    Ejecuta una lista de movimientos {'origen', 'destino'} en paralelo
+
+    Las carpetas destino se crean antes de empezar. Un destino que ya existe no
+    se sobrescribe: ese movimiento queda en 'errores'. Cada movimiento completado
+    se añade al diario (JSONL) en cuanto termina, así que incluso tras un corte
+    el diario refleja lo que realmente se movió y puede deshacerse.
+
+    Returns:
+        {'movidos': int, 'errores': [{'origen', 'destino', 'error'}]}
+    """
+    for carpeta in {os.path.dirname(m['destino']) for m in movimientos}:
+        os.makedirs(carpeta, exist_ok=True)
+
+    lock = threading.Lock()
+    errores = []
+    movidos = 0
+    f_diario = None
+    if diario:
+        os.makedirs(os.path.dirname(os.path.abspath(diario)), exist_ok=True)
+        f_diario = open(diario, 'a', encoding='utf-8')
+
+    def ejecutar(movimiento):
+        nonlocal movidos
+        try:
+            _mover(movimiento['origen'], movimiento['destino'])
+        except OSError as e:
+            with lock:
+                errores.append({**movimiento, 'error': str(e)})
+            return
+        with lock:
+            movidos += 1
+            if f_diario:
+                f_diario.write(json.dumps(
+                    {'origen': movimiento['origen'], 'destino': movimiento['destino']},
+                    ensure_ascii=False
+                ) + '\n')
+                f_diario.flush()
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, hilos)) as executor:
+            list(executor.map(ejecutar, movimientos))
+    finally:
+        if f_diario:
+            f_diario.close()
+
+    return {'movidos': movidos, 'errores': errores}
+
+
+def eliminar_carpetas_vacias(carpetas: Iterable[str]) -> List[str]:
+    """Borra las carpetas indicadas si quedaron vacías; devuelve las eliminadas"""
+    eliminadas = []
+    for carpeta in carpetas:
+        try:
+            os.rmdir(carpeta)
+            eliminadas.append(carpeta)
+        except OSError:
+            continue
+    return eliminadas
+
+
+def aplicar_plan(plan: Dict, hilos: int = 8, diario: Optional[str] = None) -> Dict:
+    """Aplica un plan completo: movimientos en paralelo y limpieza de carpetas vacías"""
+    resultado = aplicar_movimientos(plan['movimientos'], hilos=hilos, diario=diario)
+    resultado['carpetas_eliminadas'] = eliminar_carpetas_vacias(plan.get('eliminar_carpetas', []))
+    return resultado
+
+
+def deshacer(diario: str, hilos: int = 8) -> Dict:
+    """
+    Revierte los movimientos registrados en un diario de aplicar_movimientos()
+
+    Si algo ha vuelto a aparecer en una ruta original no se sobrescribe: ese
+    movimiento queda en 'errores' y el archivo sigue en su destino.
+    """
+    with open(diario, encoding='utf-8') as f:
+        hechos = [json.loads(linea) for linea in f if linea.strip()]
+    inversos = [{'origen': m['destino'], 'destino': m['origen']} for m in reversed(hechos)]
+    return aplicar_movimientos(inversos, hilos=hilos)
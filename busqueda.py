@@ -0,0 +1,322 @@
+"""
+Búsqueda y autocompletado sobre el catálogo de series
+
+Índice en memoria con las series de la biblioteca y sus capítulos: un índice
+invertido de palabras (normalizadas como normalizar_nombre: sin acentos,
+mayúsculas ni puntuación) y un trie de esas palabras para completar la última
+palabra de la consulta mientras se escribe. Series y capítulos van en índices
+separados: los capítulos solo se consultan si las series no llenan el límite
+de resultados, así que un prefijo corto no recorre miles de capítulos.
+
+Se mantiene al día con cada archivo organizado en este proceso (observador de
+gemini_organizer) y, para lo que mueven otros procesos (lote.py, workers,
+unificar_carpetas.py...), con una pasada periódica de un stat por serie.
+"""
+import heapq
+import logging
+import os
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set
+
+import biblioteca
+import config
+import gemini_organizer
+import manifiesto
+from unificar_carpetas import normalizar_nombre
+
+log = logging.getLogger(__name__)
+
+FIN = '\0'  # Marca de fin de palabra en los nodos del trie
+
+# Candidatos por debajo de los cuales la última palabra se comprueba en cada uno
+# en lugar de expandirla en el trie
+FILTRO_PREFIJO = 2000
+
+SERIE = 'serie'
+CAPITULO = 'capitulo'
+
+_hilo: Optional[threading.Thread] = None
+_parar = threading.Event()
+
+
+def normalizar(texto: str) -> str:
+    """normalizar_nombre() tratando '_' como espacio ('ONE_SHOT' -> 'one shot')"""
+    return normalizar_nombre((texto or '').replace('_', ' '))
+
+
+class IndiceTexto:
+    """Índice invertido palabra -> ids, con un trie de las palabras para buscar por prefijo"""
+
+    def __init__(self):
+        self._trie: Dict = {}
+        self._ids: Dict[str, Set[str]] = {}
+        self._palabras: Dict[str, Set[str]] = {}  # id -> sus palabras, para poder quitarlo
+
+    def agregar(self, id_: str, palabras: Iterable[str]):
+        self.quitar(id_)
+        palabras = set(palabras)
+        self._palabras[id_] = palabras
+        for palabra in palabras:
+            if palabra not in self._ids:
+                self._ids[palabra] = set()
+                nodo = self._trie
+                for letra in palabra:
+                    nodo = nodo.setdefault(letra, {})
+                nodo[FIN] = True
+            self._ids[palabra].add(id_)
+
+    def quitar(self, id_: str):
+        for palabra in self._palabras.pop(id_, ()):
+            ids = self._ids[palabra]
+            ids.discard(id_)
+            if not ids:
+                del self._ids[palabra]
+                self._quitar_del_trie(palabra)
+
+    def _quitar_del_trie(self, palabra: str):
+        camino = []
+        nodo = self._trie
+        for letra in palabra:
+            camino.append((nodo, letra))
+            nodo = nodo[letra]
+        del nodo[FIN]
+        # Podar los nodos que se quedaron sin hijos
+        for padre, letra in reversed(camino):
+            if padre[letra]:
+                break
+            del padre[letra]
+
+    def completar(self, prefijo: str, maximo: int) -> List[str]:
+        """Hasta `maximo` palabras que empiezan por `prefijo`, las más cortas primero"""
+        nodo = self._trie
+        for letra in prefijo:
+            nodo = nodo.get(letra)
+            if nodo is None:
+                return []
+        # Recorrido en anchura: las palabras salen por longitud y se para al llegar a `maximo`
+        palabras = []
+        nivel = [(prefijo, nodo)]
+        while nivel:
+            siguiente = []
+            for texto, nodo in nivel:
+                if FIN in nodo:
+                    palabras.append(texto)
+                    if len(palabras) >= maximo:
+                        return palabras
+                siguiente.extend((texto + letra, hijo) for letra, hijo in nodo.items() if letra != FIN)
+            nivel = siguiente
+        return palabras
+
+    def buscar(self, palabras: List[str], maximo_prefijo: int) -> Set[str]:
+        """
+        Ids que contienen todas las palabras; la última se trata como prefijo
+
+        Se intersecan primero los conjuntos más pequeños.
+        """
+        conjuntos = []
+        for palabra in palabras[:-1]:
+            ids = self._ids.get(palabra)
+            if not ids:
+                return set()
+            conjuntos.append(ids)
+        conjuntos.sort(key=len)
+        prefijo = palabras[-1]
+
+        if conjuntos and len(conjuntos[0]) <= FILTRO_PREFIJO:
+            # Pocos candidatos por las palabras completas: se filtran por el prefijo
+            # en vez de unir los ids de todas sus compleciones ('one piece 1' -> '1', '10', '100'...)
+            resultado = {id_ for id_ in conjuntos[0]
+                         if any(p.startswith(prefijo) for p in self._palabras[id_])}
+        else:
+            completadas = self.completar(prefijo, maximo_prefijo)
+            if not completadas:
+                return set()
+            conjuntos.append(set().union(*(self._ids[p] for p in completadas)))
+            conjuntos.sort(key=len)
+            resultado = set(conjuntos[0])
+        for ids in conjuntos[1:]:
+            if not resultado:
+                break
+            resultado &= ids
+        return resultado
+
+    def __len__(self):
+        return len(self._palabras)
+
+
+class Catalogo:
+    """Series y capítulos de la biblioteca indexados para buscar"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = IndiceTexto()
+        self._capitulos = IndiceTexto()
+        self._docs: Dict[str, Dict] = {}
+        self._por_serie: Dict[str, Set[str]] = {}
+        self._mtimes: Dict[str, Dict] = {}  # Para biblioteca.actualizar_indice
+
+    def _doc_serie(self, serie: str):
+        n = len(self._por_serie.get(serie, ()))
+        texto = normalizar(serie)
+        palabras = frozenset(texto.split())
+        self._docs[serie] = {'tipo': SERIE, 'serie': serie, 'capitulos': n,
+                             '_texto': texto, '_palabras': palabras}
+        self._series.agregar(serie, palabras)
+
+    def _doc_capitulo(self, serie: str, capitulo: Dict):
+        id_ = f"{serie}/{capitulo['archivo']}"
+        texto = normalizar(capitulo['titulo'])
+        # El número de capítulo (o los extremos del rango) también se busca: 'purgatorio 86'
+        numeros = {str(n) for n in (capitulo['inicio'], capitulo['fin']) if n is not None}
+        if not numeros:
+            numeros = set(normalizar(capitulo['capitulo'] or '').split())
+        palabras = frozenset(texto.split()) | frozenset(normalizar(serie).split()) | numeros
+        self._docs[id_] = {
+            'tipo': CAPITULO, 'serie': serie, 'archivo': capitulo['archivo'],
+            'titulo': capitulo['titulo'], 'capitulo': capitulo['capitulo'],
+            '_texto': f"{texto} {' '.join(sorted(numeros))}".strip(),
+            '_palabras': palabras,
+            '_orden': (capitulo['inicio'] is None, capitulo['inicio'] or 0, capitulo['archivo']),
+        }
+        self._capitulos.agregar(id_, palabras)
+        self._por_serie.setdefault(serie, set()).add(id_)
+
+    def _quitar_serie(self, serie: str):
+        for id_ in self._por_serie.pop(serie, ()):
+            self._capitulos.quitar(id_)
+            self._docs.pop(id_, None)
+        self._series.quitar(serie)
+        self._docs.pop(serie, None)
+
+    def actualizar_serie(self, serie: str, escaneo: Optional[Dict]):
+        """Vuelve a indexar una serie a partir de biblioteca.escanear_serie() (None = eliminada)"""
+        entrada = manifiesto.entrada_serie(serie, escaneo) if escaneo is not None else None
+        with self._lock:
+            self._quitar_serie(serie)
+            self._mtimes.pop(serie, None)
+            if entrada is None:
+                return
+            self._mtimes[serie] = {'mtime_ns': escaneo['mtime_ns']}
+            for capitulo in entrada['capitulos']:
+                self._doc_capitulo(serie, capitulo)
+            self._doc_serie(serie)
+
+    def agregar_capitulo(self, serie: str, archivo: str):
+        """Añade un archivo recién organizado sin volver a leer la carpeta de la serie"""
+        capitulo = {'archivo': archivo, **manifiesto.capitulo_de(archivo)}
+        with self._lock:
+            self._doc_capitulo(serie, capitulo)
+            self._doc_serie(serie)
+
+    def sincronizar(self, base: str) -> int:
+        """Reindexa las series cuya carpeta cambió (un stat por serie); devuelve cuántas"""
+        with self._lock:
+            previo = dict(self._mtimes)
+        escaneos, cambiadas, eliminadas = biblioteca.actualizar_indice(base, previo)
+        for serie in cambiadas:
+            self.actualizar_serie(serie, escaneos[serie])
+        for serie in eliminadas:
+            self.actualizar_serie(serie, None)
+        return len(cambiadas) + len(eliminadas)
+
+    def buscar(self, consulta: str, limite: int = 20) -> List[Dict]:
+        """
+        Series y capítulos que contienen todas las palabras de la consulta (la última como prefijo)
+
+        Orden: nombre idéntico a la consulta, nombre que empieza por ella, todas las
+        palabras completas y por último coincidencias solo por prefijo; a igualdad,
+        las series antes que los capítulos y los nombres más cortos primero.
+        """
+        texto = normalizar(consulta)
+        palabras = texto.split()
+        if not palabras or limite <= 0:
+            return []
+        completas = set(palabras)
+
+        def puntos(doc):
+            if doc['_texto'] == texto:
+                return 0
+            if doc['_texto'].startswith(texto):
+                return 1
+            return 2 if completas <= doc['_palabras'] else 3
+
+        with self._lock:
+            docs = [self._docs[id_] for id_ in self._series.buscar(palabras, config.SEARCH_PREFIX_EXPANSION)]
+            resultados = heapq.nsmallest(
+                limite, docs, key=lambda d: (puntos(d), len(d['_texto']), d['_texto'])
+            )
+            if len(resultados) < limite:
+                ids = self._capitulos.buscar(palabras, config.SEARCH_PREFIX_EXPANSION)
+                docs = [self._docs[id_] for id_ in ids]
+                resultados += heapq.nsmallest(
+                    limite - len(resultados), docs,
+                    key=lambda d: (puntos(d), len(d['serie']), d['serie'], d['_orden'])
+                )
+        return [{k: v for k, v in doc.items() if not k.startswith('_')} for doc in resultados]
+
+    def totales(self) -> Dict:
+        with self._lock:
+            return {'series': len(self._series), 'capitulos': len(self._capitulos)}
+
+
+_catalogo = Catalogo()
+
+
+def buscar(consulta: str, limite: int = 20) -> List[Dict]:
+    """Busca en el catálogo de este proceso (ver Catalogo.buscar)"""
+    return _catalogo.buscar(consulta, limite)
+
+
+def totales() -> Dict:
+    return _catalogo.totales()
+
+
+def _al_mover(resultado: Dict):
+    # Observador de gemini_organizer: solo los archivos que acaban en la biblioteca del catálogo
+    base = os.path.abspath(config.MANGA_DESTINATION)
+    ruta = os.path.abspath(resultado.get('full_path') or '')
+    if not ruta.startswith(base + os.sep):
+        return
+    partes = os.path.relpath(ruta, base).split(os.sep)
+    if len(partes) == 2:
+        _catalogo.agregar_capitulo(partes[0], partes[1])
+    else:
+        # Carpeta de serie anidada: se relee la serie de primer nivel
+        _catalogo.actualizar_serie(partes[0], biblioteca.escanear_serie(os.path.join(base, partes[0])))
+
+
+def _bucle_sincronizacion():
+    while not _parar.wait(config.SEARCH_SYNC_SECONDS):
+        try:
+            _catalogo.sincronizar(config.MANGA_DESTINATION)
+        except Exception:
+            log.exception("❌ Error al sincronizar el índice de búsqueda")
+
+
+def iniciar():
+    """
+    Indexa la biblioteca y la mantiene al día. Idempotente; no hace nada si
+    SEARCH_ENABLED es False.
+    """
+    global _hilo
+    if not config.SEARCH_ENABLED or _hilo is not None:
+        return
+    inicio = time.perf_counter()
+    _catalogo.sincronizar(config.MANGA_DESTINATION)
+    cuenta = _catalogo.totales()
+    log.info(f"🔎 Índice de búsqueda: {cuenta['series']} series y {cuenta['capitulos']} capítulos "
+             f"en {time.perf_counter() - inicio:.2f}s")
+    gemini_organizer.registrar_observador(_al_mover)
+    _parar.clear()
+    _hilo = threading.Thread(target=_bucle_sincronizacion, name='busqueda', daemon=True)
+    _hilo.start()
+
+
+def detener():
+    """Detiene la sincronización periódica"""
+    global _hilo
+    _parar.set()
+    if _hilo is not None:
+        _hilo.join()
+        _hilo = None
@@ -0,0 +1,230 @@
+"""
+Cola de trabajo durable compartida entre varios workers (ver worker.py)
+
+Las tareas viven en una base SQLite que puede estar en almacenamiento compartido.
+Un worker reclama una tarea con un lease (concesión temporal) y lo renueva con
+latidos mientras trabaja; si el worker muere, el lease caduca y otro worker
+vuelve a reclamar la tarea hasta agotar sus intentos.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional
+
+# Estados de una tarea
+PENDIENTE = 'pendiente'
+EN_CURSO = 'en_curso'
+HECHA = 'hecha'
+FALLIDA = 'fallida'
+
+# Tipos de tarea del pipeline de organización
+ANALISIS = 'analisis'
+MOVIMIENTO = 'movimiento'
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS tareas (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    tipo TEXT NOT NULL,
+    carga TEXT NOT NULL,
+    estado TEXT NOT NULL DEFAULT 'pendiente',
+    intentos INTEGER NOT NULL DEFAULT 0,
+    max_intentos INTEGER NOT NULL,
+    trabajador TEXT,
+    lease_hasta REAL,
+    disponible_desde REAL NOT NULL,
+    creada REAL NOT NULL,
+    actualizada REAL NOT NULL,
+    resultado TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS tareas_estado ON tareas (estado, disponible_desde);
+"""
+
+
+class Cola:
+    """Cola de tareas respaldada por SQLite, segura entre hilos y procesos"""
+
+    def __init__(self, ruta: str, timeout: float = 30.0):
+        self.ruta = ruta
+        self.timeout = timeout
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        with self._conexion() as con:
+            con.executescript(_ESQUEMA)
+
+    def _conexion(self) -> sqlite3.Connection:
+        # Una conexión por hilo: sqlite3 no permite compartirlas entre hilos
+        con = getattr(self._local, 'con', None)
+        if con is None:
+            con = sqlite3.connect(self.ruta, timeout=self.timeout, isolation_level=None)
+            con.row_factory = sqlite3.Row
+            self._local.con = con
+        return con
+
+    def _transaccion(self):
+        """BEGIN IMMEDIATE: bloquea la escritura para que dos workers no reclamen la misma tarea"""
+        con = self._conexion()
+        con.execute('BEGIN IMMEDIATE')
+        return con
+
+    @staticmethod
+    def _a_dict(fila: sqlite3.Row) -> Dict:
+        tarea = dict(fila)
+        tarea['carga'] = json.loads(tarea['carga'])
+        if tarea.get('resultado'):
+            tarea['resultado'] = json.loads(tarea['resultado'])
+        return tarea
+
+    def encolar(self, tipo: str, carga: Dict, max_intentos: int = 5) -> int:
+        """Añade una tarea y devuelve su id"""
+        ahora = time.time()
+        con = self._conexion()
+        cursor = con.execute(
+            'INSERT INTO tareas (tipo, carga, max_intentos, disponible_desde, creada, actualizada) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (tipo, json.dumps(carga, ensure_ascii=False), max_intentos, ahora, ahora, ahora)
+        )
+        return cursor.lastrowid
+
+    def reclamar(self, trabajador: str, lease: float, tipos: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Reclama la tarea disponible más antigua (pendiente o con lease caducado)
+
+        Las tareas con el lease caducado y sin intentos restantes se marcan como fallidas.
+        """
+        ahora = time.time()
+        filtro_tipo = ''
+        parametros = [PENDIENTE, ahora, EN_CURSO, ahora]
+        if tipos:
+            filtro_tipo = f" AND tipo IN ({','.join('?' * len(tipos))})"
+            parametros.extend(tipos)
+
+        con = self._transaccion()
+        try:
+            while True:
+                fila = con.execute(
+                    'SELECT * FROM tareas WHERE '
+                    '((estado = ? AND disponible_desde <= ?) OR (estado = ? AND lease_hasta < ?))'
+                    f'{filtro_tipo} ORDER BY id LIMIT 1',
+                    parametros
+                ).fetchone()
+                if fila is None:
+                    con.execute('COMMIT')
+                    return None
+                if fila['intentos'] >= fila['max_intentos']:
+                    con.execute(
+                        'UPDATE tareas SET estado = ?, error = ?, trabajador = NULL, actualizada = ? WHERE id = ?',
+                        (FALLIDA, fila['error'] or 'Lease caducado sin intentos restantes', ahora, fila['id'])
+                    )
+                    continue
+                con.execute(
+                    'UPDATE tareas SET estado = ?, trabajador = ?, lease_hasta = ?, '
+                    'intentos = intentos + 1, actualizada = ? WHERE id = ?',
+                    (EN_CURSO, trabajador, ahora + lease, ahora, fila['id'])
+                )
+                con.execute('COMMIT')
+                tarea = self._a_dict(fila)
+                tarea.update(estado=EN_CURSO, trabajador=trabajador, intentos=fila['intentos'] + 1)
+                return tarea
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+
+    def renovar(self, id_tarea: int, trabajador: str, lease: float) -> bool:
+        """Latido: extiende el lease. False si el worker ya no es dueño de la tarea"""
+        ahora = time.time()
+        cursor = self._conexion().execute(
+            'UPDATE tareas SET lease_hasta = ?, actualizada = ? '
+            'WHERE id = ? AND trabajador = ? AND estado = ?',
+            (ahora + lease, ahora, id_tarea, trabajador, EN_CURSO)
+        )
+        return cursor.rowcount == 1
+
+    def completar(self, id_tarea: int, trabajador: str, resultado: Optional[Dict] = None,
+                  siguientes: Optional[List[Dict]] = None) -> bool:
+        """
+        Marca la tarea como hecha y, en la misma transacción, encola las tareas siguientes
+
+        Args:
+            siguientes: Lista de {'tipo', 'carga'} que dependen de esta tarea
+        """
+        ahora = time.time()
+        con = self._transaccion()
+        try:
+            cursor = con.execute(
+                'UPDATE tareas SET estado = ?, resultado = ?, lease_hasta = NULL, actualizada = ? '
+                'WHERE id = ? AND trabajador = ? AND estado = ?',
+                (HECHA, json.dumps(resultado, ensure_ascii=False), ahora, id_tarea, trabajador, EN_CURSO)
+            )
+            if cursor.rowcount != 1:
+                con.execute('ROLLBACK')
+                return False
+            for siguiente in siguientes or []:
+                con.execute(
+                    'INSERT INTO tareas (tipo, carga, max_intentos, disponible_desde, creada, actualizada) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (siguiente['tipo'], json.dumps(siguiente['carga'], ensure_ascii=False),
+                     siguiente.get('max_intentos', 5), ahora, ahora, ahora)
+                )
+            con.execute('COMMIT')
+            return True
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+
+    def fallar(self, id_tarea: int, trabajador: str, error: str, reintentar_en: Optional[float] = 0) -> bool:
+        """
+        Registra un fallo. Si quedan intentos y reintentar_en no es None, la tarea
+        vuelve a estar pendiente tras esa espera; si no, queda como fallida.
+        """
+        ahora = time.time()
+        con = self._transaccion()
+        try:
+            fila = con.execute(
+                'SELECT intentos, max_intentos FROM tareas WHERE id = ? AND trabajador = ? AND estado = ?',
+                (id_tarea, trabajador, EN_CURSO)
+            ).fetchone()
+            if fila is None:
+                con.execute('ROLLBACK')
+                return False
+            if reintentar_en is not None and fila['intentos'] < fila['max_intentos']:
+                con.execute(
+                    'UPDATE tareas SET estado = ?, trabajador = NULL, lease_hasta = NULL, '
+                    'disponible_desde = ?, error = ?, actualizada = ? WHERE id = ?',
+                    (PENDIENTE, ahora + reintentar_en, error, ahora, id_tarea)
+                )
+            else:
+                con.execute(
+                    'UPDATE tareas SET estado = ?, lease_hasta = NULL, error = ?, actualizada = ? WHERE id = ?',
+                    (FALLIDA, error, ahora, id_tarea)
+                )
+            con.execute('COMMIT')
+            return True
+        except BaseException:
+            con.execute('ROLLBACK')
+            raise
+
+    def resumen(self) -> Dict[str, Dict[str, int]]:
+        """Conteo de tareas por tipo y estado: {tipo: {estado: n}}"""
+        resultado = {}
+        for fila in self._conexion().execute(
+            'SELECT tipo, estado, COUNT(*) AS n FROM tareas GROUP BY tipo, estado'
+        ):
+            resultado.setdefault(fila['tipo'], {})[fila['estado']] = fila['n']
+        return resultado
+
+    def pendientes(self) -> int:
+        """Tareas que aún no han terminado (pendientes o en curso)"""
+        fila = self._conexion().execute(
+            'SELECT COUNT(*) AS n FROM tareas WHERE estado IN (?, ?)', (PENDIENTE, EN_CURSO)
+        ).fetchone()
+        return fila['n']
+
+    def fallidas(self, limite: int = 50) -> List[Dict]:
+        """Últimas tareas fallidas, para el informe"""
+        filas = self._conexion().execute(
+            'SELECT * FROM tareas WHERE estado = ? ORDER BY actualizada DESC LIMIT ?', (FALLIDA, limite)
+        ).fetchall()
+        return [self._a_dict(fila) for fila in filas]
@@ -0,0 +1,189 @@
+"""
+Control adaptativo de la concurrencia por API key (AIMD)
+
+En lugar de esperas fijas (REQUEST_DELAY entre solicitudes, RATE_LIMIT_WAIT tras
+un 429), cada API key tiene un límite de solicitudes simultáneas que:
+
+- sube de forma aditiva (+ADAPTIVE_INCREASE por cada ventana de solicitudes
+  completadas) mientras la latencia media se mantiene cerca de la latencia base;
+- baja de forma multiplicativa ante un pico de latencia o un 429, como mucho una
+  vez por ventana (latencia media), para no encadenar recortes por las
+  respuestas de solicitudes que ya estaban en vuelo.
+
+Tras un 429 la key además queda en pausa unos segundos (ADAPTIVE_BACKOFF_MIN,
+duplicándose con cada 429 seguido hasta RATE_LIMIT_WAIT) y el planificador usa
+mientras tanto las demás. Los límites aprendidos se guardan en
+ADAPTIVE_STATE_PATH para que la siguiente ejecución no empiece de cero; el
+guardado lo hace un hilo en segundo plano (y atexit), nunca una solicitud.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+import biblioteca
+import config
+import metricas
+
+log = logging.getLogger(__name__)
+
+
+def _huella(api_key: str) -> str:
+    """Identificador estable de una key para el estado persistido (sin guardar la key)"""
+    return hashlib.sha256(api_key.encode('utf-8')).hexdigest()[:16]
+
+
+def _numero(api_key: str) -> int:
+    try:
+        return config.GOOGLE_API_KEYS.index(api_key) + 1
+    except ValueError:
+        return 0
+
+
+class ControladorAIMD:
+    """Límite de solicitudes simultáneas por API key, aprendido a partir de latencias y 429"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._lock_guardado = threading.Lock()
+        self._claves: Dict[str, Dict] = {}
+        self._persistido: Optional[Dict] = None
+        self._cambios = False  # Hay límites sin guardar
+        self._hilo: Optional[threading.Thread] = None
+
+    def _estado(self, api_key: str) -> Dict:
+        """Estado de una key, inicializado desde lo persistido (llamar con el lock)"""
+        estado = self._claves.get(api_key)
+        if estado is None:
+            if self._persistido is None:
+                ruta = config.ADAPTIVE_STATE_PATH
+                self._persistido = (biblioteca.cargar_json(ruta, {}) or {}) if ruta else {}
+            previo = self._persistido.get(_huella(api_key), {})
+            limite = float(previo.get('limite', config.CONCURRENCY_PER_KEY))
+            estado = {
+                'limite': min(max(limite, 1.0), float(config.ADAPTIVE_MAX_PER_KEY)),
+                'latencia_base': previo.get('latencia_base'),
+                'latencia_media': None,
+                'ultimo_recorte': 0.0,
+                'pausa_hasta': 0.0,
+                'racha_429': 0,
+            }
+            self._claves[api_key] = estado
+            self._iniciar_guardado()
+        return estado
+
+    def _iniciar_guardado(self):
+        """Arranca el hilo de guardado periódico la primera vez que hay estado (llamar con el lock)"""
+        if self._hilo is not None or not config.ADAPTIVE_STATE_PATH:
+            return
+        self._hilo = threading.Thread(target=self._bucle_guardado, name='concurrencia', daemon=True)
+        self._hilo.start()
+
+    def _bucle_guardado(self):
+        while True:
+            time.sleep(max(1.0, config.ADAPTIVE_SAVE_INTERVAL))
+            self.guardar()
+
+    def limite(self, api_key: str) -> int:
+        """Solicitudes simultáneas permitidas ahora (0 si la key está en pausa tras un 429)"""
+        with self._lock:
+            estado = self._estado(api_key)
+            if estado['pausa_hasta'] > time.monotonic():
+                return 0
+            return max(1, int(estado['limite']))
+
+    def _recortar(self, api_key: str, estado: Dict, factor: float, ahora: float):
+        ventana = estado['latencia_media'] or 1.0
+        if ahora - estado['ultimo_recorte'] < ventana:
+            return
+        estado['limite'] = max(1.0, estado['limite'] * factor)
+        estado['ultimo_recorte'] = ahora
+        metricas.fijar('manga_concurrencia_limite', int(estado['limite']), clave=_numero(api_key))
+
+    def exito(self, api_key: str, latencia: float):
+        """Registra una respuesta correcta y su latencia"""
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._estado(api_key)
+            estado['racha_429'] = 0
+
+            media = estado['latencia_media']
+            media = latencia if media is None else media * 0.8 + latencia * 0.2
+            estado['latencia_media'] = media
+            # La base sigue al mínimo observado y deriva lentamente hacia arriba
+            # para adaptarse si el servicio se vuelve más lento de forma estable.
+            # Con una sola solicitud en vuelo no hay cola propia que infle la
+            # latencia, así que ahí la base se recalibra deprisa
+            base = estado['latencia_base']
+            if base is None or latencia < base:
+                base = latencia
+            else:
+                base += (latencia - base) * (0.2 if estado['limite'] < 2 else 0.01)
+            estado['latencia_base'] = base
+
+            if media > base * config.ADAPTIVE_LATENCY_TOLERANCE:
+                self._recortar(api_key, estado, config.ADAPTIVE_DECREASE_FACTOR, ahora)
+            else:
+                estado['limite'] = min(float(config.ADAPTIVE_MAX_PER_KEY),
+                                       estado['limite'] + config.ADAPTIVE_INCREASE / estado['limite'])
+                metricas.fijar('manga_concurrencia_limite', int(estado['limite']), clave=_numero(api_key))
+            self._cambios = True
+
+    def limitado(self, api_key: str) -> float:
+        """
+        Registra un 429 / cuota agotada: recorta el límite y pausa la key
+
+        Returns:
+            Segundos que la key queda en pausa
+        """
+        ahora = time.monotonic()
+        with self._lock:
+            estado = self._estado(api_key)
+            estado['racha_429'] += 1
+            self._recortar(api_key, estado, config.ADAPTIVE_429_FACTOR, ahora)
+            pausa = min(config.RATE_LIMIT_WAIT,
+                        config.ADAPTIVE_BACKOFF_MIN * 2 ** (estado['racha_429'] - 1))
+            estado['pausa_hasta'] = max(estado['pausa_hasta'], ahora + pausa)
+            self._cambios = True
+        return pausa
+
+    def limites(self) -> Dict[int, float]:
+        """{número de key: límite actual} para informes"""
+        with self._lock:
+            return {_numero(clave): round(estado['limite'], 2) for clave, estado in self._claves.items()}
+
+    def guardar(self):
+        """
+        Persiste los límites aprendidos en ADAPTIVE_STATE_PATH si cambiaron
+
+        Un error de escritura solo se registra: perder el estado aprendido no
+        debe hacer fallar nada más.
+        """
+        ruta = config.ADAPTIVE_STATE_PATH
+        if not ruta:
+            return
+        with self._lock:
+            if not self._claves or not self._cambios:
+                return
+            self._cambios = False
+            datos = dict(self._persistido or {})
+            for clave, estado in self._claves.items():
+                datos[_huella(clave)] = {
+                    'limite': round(estado['limite'], 3),
+                    'latencia_base': estado['latencia_base'],
+                    'actualizado': time.strftime('%Y-%m-%d %H:%M:%S'),
+                }
+        with self._lock_guardado:
+            try:
+                biblioteca.guardar_json(datos, ruta)
+            except OSError as e:
+                log.warning(f"⚠️  No se pudieron guardar los límites de concurrencia en {ruta}: {e}")
+                with self._lock:
+                    self._cambios = True
+
+    def reiniciar(self):
+        """Olvida el estado en memoria; se vuelve a partir de lo persistido"""
+        with self._lock:
+            self._claves.clear()
+            self._persistido = None
@@ -16,6 +16,10 @@ UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
 # Carpeta destino donde se organizarán los mangas (la carpeta Mangas principal)
 MANGA_DESTINATION = '/opt/MangaRead/Mangas'
 
+# Carpeta de entrada por defecto de lote.py y carpeta de sus informes
+BATCH_SOURCE = os.path.join(BASE_DIR, 'Lote grande')
+REPORTS_DIR = os.path.join(BASE_DIR, 'reportes')
+
 # Múltiples API Keys de Google Gemini para rotación
 GOOGLE_API_KEYS = [
     os.environ.get('GOOGLE_API_KEY_1'),
@@ -38,11 +42,120 @@ GEMINI_MODEL = 'gemini-2.5-pro'
 # Tiempo de espera entre solicitudes (en segundos) para evitar límites de tasa
 REQUEST_DELAY = 2  # 2 segundos entre cada solicitud (si hay error 429, esperará 60s automáticamente)
 
+# Espera (en segundos) tras un error 429 / cuota agotada antes de reintentar
+RATE_LIMIT_WAIT = 60
+
+# Espera (en segundos) antes de reintentar tras una respuesta JSON inválida
+RETRY_DELAY = 2
+
+# Endpoint alternativo de la API de Gemini (ej. 'http://127.0.0.1:8765' para el
+# servidor simulado de mock_gemini.py). None = API real de Google
+GEMINI_API_ENDPOINT = os.environ.get('GEMINI_API_ENDPOINT') or None
+
+# Número de análisis recordados por nombre de archivo (0 = sin caché)
+ANALYSIS_CACHE_SIZE = 0
+
+# Análisis por series (agrupacion.py): los archivos cuyo nombre termina en un
+# capítulo ('Purgatorio 86.pdf', 'Purgatorio 87.pdf') comparten un solo análisis
+# con Gemini por serie; el capítulo de cada uno se extrae localmente
+CLUSTER_ANALYSIS = False
+CLUSTER_CACHE_SIZE = 1000  # Series recordadas
+
+# Planificador de turnos (planificador.py): solicitudes simultáneas por API key,
+# peso de cada prioridad al repartir los turnos y fracción de keys reservadas
+# a las subidas desde la web (las últimas de GOOGLE_API_KEYS)
+CONCURRENCY_PER_KEY = 1
+SCHEDULER_WEIGHTS = {'interactiva': 8, 'lote': 3, 'mantenimiento': 1}
+INTERACTIVE_RESERVED_SHARE = 0.2
+
+# Control adaptativo de concurrencia (concurrencia.py): con ADAPTIVE_CONCURRENCY
+# el límite por key se aprende (AIMD) a partir de la latencia y los 429, y
+# sustituye a CONCURRENCY_PER_KEY, REQUEST_DELAY y la espera fija de RATE_LIMIT_WAIT
+ADAPTIVE_CONCURRENCY = False
+ADAPTIVE_MAX_PER_KEY = 8  # Tope de solicitudes simultáneas por key
+ADAPTIVE_INCREASE = 1.0  # Subida por cada ventana de solicitudes sin problemas
+ADAPTIVE_DECREASE_FACTOR = 0.7  # Recorte ante un pico de latencia
+ADAPTIVE_429_FACTOR = 0.5  # Recorte ante un 429
+ADAPTIVE_LATENCY_TOLERANCE = 2.0  # Pico = latencia media por encima de 2x la latencia base
+ADAPTIVE_BACKOFF_MIN = 5  # Pausa de una key tras un 429; se duplica con cada 429 seguido hasta RATE_LIMIT_WAIT
+ADAPTIVE_STATE_PATH = os.path.join(BASE_DIR, 'estado', 'concurrencia.json')  # '' = no persistir
+ADAPTIVE_SAVE_INTERVAL = 30  # Segundos entre guardados de los límites aprendidos
+
+# Solicitudes de respaldo (respaldo.py): si una llamada a Gemini supera el percentil
+# HEDGING_PERCENTILE de las latencias recientes del modelo, se duplica en otra key libre
+# y se usa la primera respuesta. Desactivado por defecto: gasta cuota extra
+HEDGING_ENABLED = False
+HEDGING_PERCENTILE = 95
+HEDGING_MIN_DELAY = 1.0  # Nunca lanzar un respaldo antes de este tiempo (s)
+HEDGING_BUDGET = 0.05  # Respaldos permitidos por solicitud principal (0.05 = 5% extra como mucho)
+HEDGING_BURST = 5  # Respaldos que pueden acumularse para ráfagas de respuestas lentas
+HEDGING_WINDOW = 200  # Latencias recientes usadas para calcular el percentil
+HEDGING_MIN_SAMPLES = 20  # Muestras necesarias antes de lanzar respaldos
+HEDGING_MAX_THREADS = 64  # Hilos para las llamadas con respaldo
+
+# Sondeo de API keys (sondeo.py): al arrancar se prueban todas en paralelo contra
+# GEMINI_MODEL; las inválidas o sin cuota quedan en cuarentena y se vuelven a
+# probar en segundo plano cada KEY_PROBE_INTERVAL segundos
+KEY_PROBE_ON_STARTUP = False
+KEY_PROBE_INTERVAL = 60
+KEY_PROBE_TIMEOUT = 20  # Tiempo máximo de cada sondeo (s)
+KEY_QUARANTINE_EXHAUSTED = 300  # Cuarentena de una key sin cuota (s)
+KEY_QUARANTINE_INVALID = 3600  # Cuarentena de una key inválida o sin permisos (s)
+
 # Extensiones permitidas
-ALLOWED_EXTENSIONS = {'pdf'}
+ALLOWED_EXTENSIONS = {'pdf', 'zip', 'cbz'}
+
+# Paquetes ZIP/CBZ con PDFs (paquetes.py): se extraen de uno en uno al subirlos
+# o al encontrarlos en la carpeta de un lote
+ARCHIVE_EXTENSIONS = {'zip', 'cbz'}
+ARCHIVE_MAX_MEMBER_MB = 2048  # Tamaño máximo descomprimido de cada PDF (None = sin límite)
 
 # Puerto del servidor
 PORT = 5000
 
 # Tamaño máximo de archivo (en MB) - None = sin límite
 MAX_FILE_SIZE_MB = None  # Sin límite para archivos de manga grandes
+
+# Subidas desde la web: cada archivo va en su propia solicitud a /upload/archivo,
+# con este número de subidas simultáneas y de reintentos por archivo
+UPLOAD_CONCURRENCY = 4
+UPLOAD_RETRIES = 3
+
+# Control de admisión de las subidas (admision.py): por encima de estos límites el
+# servidor responde 503 con Retry-After en vez de aceptar más trabajo (None = sin límite)
+ADMISSION_MAX_FILES = None  # Archivos subidos que se están organizando a la vez (p. ej. 32)
+ADMISSION_MAX_PENDING_MB = None  # MB subidos pendientes de organizar (p. ej. 4096)
+ADMISSION_MIN_FREE_MB = None  # Espacio libre mínimo en UPLOAD_FOLDER y MANGA_DESTINATION (p. ej. 2048)
+ADMISSION_RETRY_AFTER = 5  # Segundos sugeridos al cliente si la cola está llena
+ADMISSION_RETRY_AFTER_DISK = 300  # Segundos sugeridos si falta espacio en disco
+
+# Estado de la última pasada de consistencia de la biblioteca (consistencia.py)
+CONSISTENCY_STATE_PATH = os.path.join(BASE_DIR, 'estado', 'consistencia.json')
+
+# Manifiesto de la biblioteca para el lector (manifiesto.py): un índice de series y
+# fragmentos JSON con sus capítulos, precomprimidos en gzip (y brotli si está
+# instalado) y servidos en /manifiesto/ con ETag. Se actualiza tras cada archivo movido
+MANIFEST_ENABLED = False
+MANIFEST_DIR = os.path.join(BASE_DIR, 'manifiesto')
+MANIFEST_SHARDS = 16  # Fragmentos de series (cambiarlo reconstruye el manifiesto)
+MANIFEST_FLUSH_SECONDS = 2  # Cada cuánto se escriben las series modificadas
+
+# Búsqueda y autocompletado de series y capítulos en /search (busqueda.py)
+SEARCH_ENABLED = False
+SEARCH_SYNC_SECONDS = 30  # Cada cuánto se recogen los cambios hechos por otros procesos
+SEARCH_PREFIX_EXPANSION = 200  # Palabras como máximo a las que se completa la última de la consulta
+SEARCH_MAX_RESULTS = 50
+
+# Cola durable para workers distribuidos (worker.py). Debe estar en un
+# almacenamiento accesible por todos los hosts, igual que la biblioteca
+QUEUE_DB_PATH = os.environ.get('QUEUE_DB_PATH', os.path.join(BASE_DIR, 'estado', 'cola.db'))
+QUEUE_LEASE_SECONDS = 300  # Tiempo tras el cual una tarea de un worker caído se reintenta
+QUEUE_HEARTBEAT_SECONDS = 30  # Cada cuánto renueva el lease un worker activo
+QUEUE_POLL_SECONDS = 2  # Espera cuando no hay tareas disponibles
+QUEUE_DB_RETRY_MAX = 60  # Espera máxima entre reintentos si la base de la cola falla (p. ej. bloqueada)
+QUEUE_MAX_ATTEMPTS = 5
+
+# Logs: nivel mínimo, archivo JSON con rotación por tamaño y salida por terminal
+LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
+LOG_FILE = os.path.join(BASE_DIR, 'logs', 'manga-organizer.log')
+LOG_CONSOLE = True
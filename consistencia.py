@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Pasada de consistencia de la biblioteca de mangas
+
+Interpreta los capítulos de cada archivo como intervalos por serie y título y
+detecta solapamientos, huecos, duplicados y ONE_SHOT mal archivados (la
+generalización de renombrar_one_shot.py). Solo revisa las series cuya carpeta
+cambió desde la última pasada y produce un plan de correcciones que se aplica
+en bloque con biblioteca.aplicar_plan().
+
+Uso:
+    python consistencia.py                 # informe incremental
+    python consistencia.py --aplicar --si  # aplicar las correcciones
+    python consistencia.py --completo      # revisar toda la biblioteca
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import biblioteca
+import config
+from unificar_carpetas import normalizar_nombre
+
+# Nombre generado por gemini_organizer: '<título> - Cap. <capítulo>.pdf',
+# con un posible sufijo ' (n)' añadido al resolver duplicados
+PATRON_ORGANIZADO = re.compile(
+    r'^(?P<titulo>.*?)\s*-\s*Cap\.\s*(?P<capitulo>.+?)(?P<copia>\s*\(\d+\))?(?P<ext>\.[^.]+)$',
+    re.IGNORECASE
+)
+
+# Nombre sin organizar con el capítulo al final: 'Purgatorio 86.pdf', 'Ghost 1-81.pdf'
+PATRON_LIBRE = re.compile(
+    r'^(?P<titulo>.*?)[\s_\-]+(?P<capitulo>\d+(?:\s*-\s*\d+)?)(?P<copia>\s*\(\d+\))?(?P<ext>\.[^.]+)$'
+)
+
+PATRON_RANGO = re.compile(r'^(\d+)(?:\s*-\s*(\d+))?$')
+
+# Tipos de problema detectados
+ONE_SHOT = 'one_shot'
+DUPLICADO = 'duplicado'
+SOLAPAMIENTO = 'solapamiento'
+HUECO = 'hueco'
+
+
+def parsear_capitulo(texto: str) -> Optional[Tuple[int, int]]:
+    """Convierte '5' en (5, 5) y '1-81' en (1, 81); None si no es numérico"""
+    match = PATRON_RANGO.match(texto.strip())
+    if not match:
+        return None
+    inicio = int(match.group(1))
+    fin = int(match.group(2)) if match.group(2) else inicio
+    return (min(inicio, fin), max(inicio, fin))
+
+
+def parsear_archivo(nombre: str) -> Optional[Dict]:
+    """
+    Extrae título, capítulo e intervalo de un nombre de archivo
+
+    Returns:
+        {'titulo', 'capitulo', 'intervalo', 'one_shot', 'copia'} o None si no se reconoce
+    """
+    match = PATRON_ORGANIZADO.match(nombre) or PATRON_LIBRE.match(nombre)
+    if not match:
+        return None
+    capitulo = match.group('capitulo').strip()
+    return {
+        'titulo': match.group('titulo').strip(),
+        'capitulo': capitulo,
+        'intervalo': parsear_capitulo(capitulo),
+        'one_shot': capitulo.upper().replace(' ', '_') == 'ONE_SHOT',
+        'copia': bool(match.group('copia')),
+    }
+
+
+def formatear_intervalo(inicio: int, fin: int) -> str:
+    """(5, 5) -> '5'; (1, 81) -> '1-81'"""
+    return str(inicio) if inicio == fin else f"{inicio}-{fin}"
+
+
+def _cubre(intervalos: List[Tuple[int, int]], capitulo: int) -> bool:
+    return any(inicio <= capitulo <= fin for inicio, fin in intervalos)
+
+
+def revisar_serie(serie: str, contenido: Dict) -> Tuple[List[Dict], List[Dict]]:
+    """
+    Revisa una carpeta de serie a partir de su entrada en el índice
+
+    Returns:
+        (problemas, correcciones) — las correcciones son renombrados {'origen', 'destino'}
+        relativos a la carpeta de la serie
+    """
+    problemas = []
+    correcciones = []
+    grupos = defaultdict(list)  # título normalizado -> [(archivo, datos)]
+    numerados_serie = []
+
+    for archivo in sorted(contenido['archivos']):
+        if not archivo.lower().endswith('.pdf'):
+            continue
+        datos = parsear_archivo(archivo)
+        if datos is None:
+            continue
+        grupos[normalizar_nombre(datos['titulo'])].append((archivo, datos))
+        if datos['intervalo']:
+            numerados_serie.append(datos['intervalo'])
+
+    ocupados = set(contenido['archivos']) | set(contenido['subcarpetas'])
+
+    for titulo, archivos in grupos.items():
+        numerados = sorted(
+            ((datos['intervalo'], archivo) for archivo, datos in archivos if datos['intervalo']),
+            key=lambda x: x[0]
+        )
+        intervalos = [intervalo for intervalo, _ in numerados]
+
+        # Duplicados y solapamientos
+        por_intervalo = defaultdict(list)
+        for intervalo, archivo in numerados:
+            por_intervalo[intervalo].append(archivo)
+        for intervalo, iguales in por_intervalo.items():
+            if len(iguales) > 1:
+                problemas.append({'tipo': DUPLICADO, 'serie': serie, 'archivos': iguales,
+                                  'capitulos': formatear_intervalo(*intervalo)})
+
+        unicos = sorted(por_intervalo.items())
+        fin_max, archivo_max = None, None
+        for (inicio, fin), iguales in unicos:
+            if fin_max is not None and inicio <= fin_max:
+                problemas.append({'tipo': SOLAPAMIENTO, 'serie': serie,
+                                  'archivos': [archivo_max, iguales[0]],
+                                  'capitulos': formatear_intervalo(inicio, min(fin, fin_max))})
+            elif fin_max is not None and inicio > fin_max + 1:
+                problemas.append({'tipo': HUECO, 'serie': serie,
+                                  'archivos': [archivo_max, iguales[0]],
+                                  'capitulos': formatear_intervalo(fin_max + 1, inicio - 1)})
+            if fin_max is None or fin > fin_max:
+                fin_max, archivo_max = fin, iguales[0]
+
+        # ONE_SHOT en una serie con capítulos numerados: en realidad es el capítulo 1
+        referencia = intervalos or numerados_serie
+        for archivo, datos in archivos:
+            if not datos['one_shot'] or not referencia:
+                continue
+            if _cubre(referencia, 1):
+                problemas.append({'tipo': ONE_SHOT, 'serie': serie, 'archivos': [archivo],
+                                  'capitulos': '1', 'detalle': 'el capítulo 1 ya existe'})
+                continue
+            ext = os.path.splitext(archivo)[1]
+            ocupados.discard(archivo)
+            nuevo = biblioteca.resolver_colision(f"{datos['titulo'] or serie} - Cap. 1{ext}", ocupados)
+            problemas.append({'tipo': ONE_SHOT, 'serie': serie, 'archivos': [archivo],
+                              'capitulos': '1', 'detalle': f"se renombrará a '{nuevo}'"})
+            correcciones.append({'origen': archivo, 'destino': nuevo})
+            referencia = referencia + [(1, 1)]
+
+    return problemas, correcciones
+
+
+def ejecutar_pasada(base: str, ruta_estado: str, completo: bool = False) -> Dict:
+    """
+    Revisa la biblioteca de forma incremental y devuelve el plan de correcciones
+
+    El estado guarda el índice y los resultados de cada serie; las series cuya
+    carpeta no cambió reutilizan sus resultados anteriores.
+    """
+    estado = {} if completo else biblioteca.cargar_json(ruta_estado, {}) or {}
+    if estado.get('base') != base:
+        estado = {}
+    previo = estado.get('indice', {})
+    resultados = estado.get('resultados', {})
+
+    indice, cambiadas, eliminadas = biblioteca.actualizar_indice(base, previo)
+    for serie in eliminadas:
+        resultados.pop(serie, None)
+    for serie in cambiadas:
+        problemas, correcciones = revisar_serie(serie, indice[serie])
+        resultados[serie] = {'problemas': problemas, 'correcciones': correcciones}
+
+    biblioteca.guardar_json({'base': base, 'indice': indice, 'resultados': resultados}, ruta_estado)
+
+    plan = biblioteca.nuevo_plan(base, 'consistencia')
+    plan['revisadas'] = sorted(cambiadas)
+    plan['problemas'] = []
+    for serie in sorted(resultados):
+        plan['problemas'].extend(resultados[serie]['problemas'])
+        for correccion in resultados[serie]['correcciones']:
+            plan['movimientos'].append({
+                'origen': os.path.join(base, serie, correccion['origen']),
+                'destino': os.path.join(base, serie, correccion['destino']),
+            })
+    return plan
+
+
+def mostrar_informe(plan: Dict, series_totales: int):
+    """Resumen por tipo de problema y detalle por serie"""
+    conteo = defaultdict(int)
+    por_serie = defaultdict(list)
+    for problema in plan['problemas']:
+        conteo[problema['tipo']] += 1
+        por_serie[problema['serie']].append(problema)
+
+    print(f"🔍 Series revisadas en esta pasada: {len(plan['revisadas'])}/{series_totales}")
+    print(f"📊 Problemas: {len(plan['problemas'])} "
+          f"(one-shots: {conteo[ONE_SHOT]}, duplicados: {conteo[DUPLICADO]}, "
+          f"solapamientos: {conteo[SOLAPAMIENTO]}, huecos: {conteo[HUECO]})\n")
+    for serie, problemas in por_serie.items():
+        print(f"📁 {serie}")
+        for problema in problemas:
+            detalle = f" — {problema['detalle']}" if problema.get('detalle') else ''
+            print(f"   [{problema['tipo']}] cap. {problema['capitulos']}: "
+                  f"{', '.join(problema['archivos'])}{detalle}")
+    print(f"\n📝 Correcciones automáticas: {len(plan['movimientos'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Revisa la consistencia de capítulos de la biblioteca')
+    parser.add_argument('--base', default=config.MANGA_DESTINATION, help='Carpeta de la biblioteca')
+    parser.add_argument('--estado', default=config.CONSISTENCY_STATE_PATH, help='Archivo de estado incremental')
+    parser.add_argument('--completo', action='store_true', help='Revisar todas las series, no solo las modificadas')
+    parser.add_argument('--exportar-plan', metavar='RUTA', help='Guardar el plan de correcciones en JSON')
+    parser.add_argument('--aplicar', action='store_true', help='Aplicar las correcciones automáticas')
+    parser.add_argument('--hilos', type=int, default=16, help='Renombrados en paralelo')
+    parser.add_argument('-s', '--si', action='store_true', help='No pedir confirmación')
+    args = parser.parse_args()
+
+    print("=" * 80)
+    print("🧭 CONSISTENCIA DE LA BIBLIOTECA")
+    print("=" * 80)
+    print(f"📂 Ruta base: {args.base}\n")
+
+    inicio = time.time()
+    plan = ejecutar_pasada(args.base, args.estado, completo=args.completo)
+    series = len(biblioteca.cargar_json(args.estado, {}).get('indice', {}))
+    mostrar_informe(plan, series)
+    print(f"⏱️  Pasada completada en {time.time() - inicio:.2f}s")
+
+    if args.exportar_plan:
+        biblioteca.guardar_plan(plan, args.exportar_plan)
+        print(f"💾 Plan guardado en: {args.exportar_plan}")
+
+    if not args.aplicar or not plan['movimientos']:
+        return
+
+    if not args.si:
+        respuesta = input("\n¿Aplicar las correcciones? (s/N): ").strip().lower()
+        if respuesta != 's':
+            print("❌ Operación cancelada")
+            return
+
+    diario = os.path.join(config.BASE_DIR, 'diarios', f"consistencia-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    resultado = biblioteca.aplicar_plan(plan, hilos=args.hilos, diario=diario)
+    print(f"\n✅ {resultado['movidos']} archivos renombrados")
+    for error in resultado['errores']:
+        print(f"  ❌ {error['origen']}: {error['error']}")
+    print(f"↩️  Para deshacer: python unificar_carpetas.py --deshacer '{diario}'")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Script para corregir archivos 'ONE_SHOT' que en realidad son el capítulo 1 de una serie.
+
+Usa la pasada incremental de consistencia.py y aplica solo sus correcciones de
+one-shots, en bloque y con diario para deshacer.
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import biblioteca
+import config
+import consistencia
+
+
+def main():
+    print("=" * 80)
+    print("🔄 CORRECTOR DE ONE_SHOT")
+    print("=" * 80)
+    print(f"📂 Ruta base: {config.MANGA_DESTINATION}\n")
+
+    plan = consistencia.ejecutar_pasada(config.MANGA_DESTINATION, config.CONSISTENCY_STATE_PATH)
+    one_shots = [p for p in plan['problemas'] if p['tipo'] == consistencia.ONE_SHOT]
+
+    for problema in one_shots:
+        print(f"📁 {problema['serie']}: {problema['archivos'][0]} — {problema['detalle']}")
+
+    if not plan['movimientos']:
+        print("✅ No hay one-shots que corregir")
+        return
+
+    respuesta = input(f"\n¿Renombrar {len(plan['movimientos'])} archivo(s)? (s/N): ").strip().lower()
+    if respuesta != 's':
+        print("❌ Operación cancelada")
+        return
+
+    diario = os.path.join(config.BASE_DIR, 'diarios', f"oneshots-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    resultado = biblioteca.aplicar_plan(plan, diario=diario)
+    print(f"\n✅ {resultado['movidos']} archivos renombrados")
+    for error in resultado['errores']:
+        print(f"  ❌ {error['origen']}: {error['error']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,29 +3,173 @@ Módulo de integración con Google Gemini para análisis y organización de mang
 """
 import os
 import json
+import atexit
+import contextvars
+import logging
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, as_completed
 import google.generativeai as genai
-from typing import Dict, Optional
+from google.api_core import exceptions as google_exceptions
+from google.generativeai import client as genai_client
+from typing import Callable, Dict, Optional
+import agrupacion
+import biblioteca
+import concurrencia
 import config
+import metricas
+import planificador
+import registro
+import respaldo
 
-# Índice para rotación de API keys
-current_key_index = 0
+log = logging.getLogger(__name__)
 
-def get_next_api_key():
-    """Obtiene la siguiente API key en rotación"""
-    global current_key_index
-    if not config.GOOGLE_API_KEYS:
-        raise ValueError("No hay API keys configuradas")
+_lock_claves = threading.Lock()
+
+# Subconjunto de API keys que usa este proceso (None = todas las de config)
+_claves_activas = None
+
+# Modelos ya configurados, uno por API key
+_modelos = {}
+
+# Caché LRU de análisis por nombre de archivo (ver config.ANALYSIS_CACHE_SIZE)
+_cache_analisis = OrderedDict()
+_lock_cache = threading.Lock()
+
+# Series ya resueltas y análisis en curso compartidos entre hilos (ver config.CLUSTER_ANALYSIS)
+_series = agrupacion.CacheSeries(config.CLUSTER_CACHE_SIZE)
+_vuelos = agrupacion.UnSoloVuelo()
+
+# Límites de concurrencia aprendidos por API key (ver config.ADAPTIVE_CONCURRENCY)
+_controlador = concurrencia.ControladorAIMD()
+atexit.register(_controlador.guardar)
+
+def _capacidad_clave(api_key: str) -> int:
+    """Solicitudes simultáneas permitidas para una API key"""
+    if config.ADAPTIVE_CONCURRENCY:
+        return _controlador.limite(api_key)
+    return config.CONCURRENCY_PER_KEY
+
+# Turnos por API key y prioridad (interactiva / lote / mantenimiento)
+_planificador = planificador.Planificador(lambda: claves_activas(), capacidad=_capacidad_clave)
+
+# Hilos para las llamadas con respaldo (ver config.HEDGING_ENABLED); se crea al primer uso
+_ejecutor_respaldo = None
+
+# Funciones llamadas tras cada archivo movido a la biblioteca (ver registrar_observador)
+_observadores = []
+
+def registrar_observador(funcion: Callable[[Dict], None]):
+    """
+    Registra una función que recibe el resultado de cada archivo organizado
+
+    Se llama en el hilo que movió el archivo, justo después del movimiento; un
+    error del observador se registra en el log pero no afecta al resultado.
+    """
+    if funcion not in _observadores:
+        _observadores.append(funcion)
+
+
+def _notificar_movimiento(resultado: Dict):
+    for funcion in list(_observadores):
+        try:
+            funcion(resultado)
+        except Exception:
+            log.exception(f"❌ Error en el observador {getattr(funcion, '__name__', funcion)}")
+
+def usar_claves(numeros: Optional[list]):
+    """
+    Limita este proceso a un subconjunto de API keys
     
-    key = config.GOOGLE_API_KEYS[current_key_index]
-    current_key_index = (current_key_index + 1) % len(config.GOOGLE_API_KEYS)
-    return key
+    Args:
+        numeros: Números de key (1..N, como en GOOGLE_API_KEY_N) o None para usar todas
+    """
+    global _claves_activas
+    if numeros is None:
+        seleccion = None
+    else:
+        fuera = [n for n in numeros if not 1 <= n <= len(config.GOOGLE_API_KEYS)]
+        if fuera:
+            raise ValueError(f"API keys inexistentes: {fuera} (hay {len(config.GOOGLE_API_KEYS)})")
+        seleccion = [config.GOOGLE_API_KEYS[n - 1] for n in numeros]
+    with _lock_claves:
+        _claves_activas = seleccion
+    _planificador.reevaluar()
+
+def claves_activas() -> list:
+    """API keys que puede usar este proceso"""
+    return _claves_activas if _claves_activas is not None else config.GOOGLE_API_KEYS
+
+def estado_planificador() -> Dict:
+    """Turnos en uso por key y solicitudes en espera por prioridad"""
+    return _planificador.estado()
 
-def configure_gemini():
-    """Configura Gemini con la siguiente API key disponible"""
-    api_key = get_next_api_key()
-    genai.configure(api_key=api_key)
-    return api_key
+def poner_en_cuarentena(api_key: str, segundos: float, motivo: str):
+    """Retira una API key del reparto durante `segundos` (key inválida o sin cuota)"""
+    ya_estaba = api_key in _planificador.en_cuarentena()
+    _planificador.poner_en_cuarentena(api_key, segundos)
+    metricas.fijar('manga_clave_disponible', 0, clave=numero_clave(api_key))
+    if not ya_estaba:
+        log.warning(f"🚫 API key #{numero_clave(api_key)} en cuarentena {segundos:.0f}s: {motivo}")
+
+def levantar_cuarentena(api_key: str):
+    """Devuelve una API key al reparto"""
+    _planificador.levantar_cuarentena(api_key)
+    metricas.fijar('manga_clave_disponible', 1, clave=numero_clave(api_key))
+
+def claves_en_cuarentena() -> Dict[str, float]:
+    """{api_key: segundos de cuarentena restantes}"""
+    return _planificador.en_cuarentena()
+
+def numero_clave(api_key: str) -> int:
+    """Devuelve el número (1..N) de una API key, útil para logs y métricas"""
+    try:
+        return config.GOOGLE_API_KEYS.index(api_key) + 1
+    except ValueError:
+        return 0
+
+def obtener_modelo(api_key: str) -> genai.GenerativeModel:
+    """
+    Devuelve el modelo de Gemini ligado a una API key concreta
+
+    genai.configure() es global al proceso, así que cada modelo se crea con su
+    propio cliente ya resuelto y se reutiliza. Así varios hilos pueden usar
+    API keys distintas a la vez sin pisarse la configuración.
+    """
+    with _lock_claves:
+        model = _modelos.get(api_key)
+        if model is None:
+            opciones = {}
+            if config.GEMINI_API_ENDPOINT:
+                opciones = {
+                    'transport': 'rest',
+                    'client_options': {'api_endpoint': config.GEMINI_API_ENDPOINT},
+                }
+            genai.configure(api_key=api_key, **opciones)
+            model = genai.GenerativeModel(
+                model_name=config.GEMINI_MODEL,
+                generation_config={
+                    "temperature": 0.1,  # Baja temperatura para respuestas más consistentes
+                }
+            )
+            model._client = genai_client.get_default_generative_client()
+            _modelos[api_key] = model
+        return model
+
+def reiniciar_modelos():
+    """Descarta los modelos creados (tras cambiar endpoint, modelo o keys)"""
+    with _lock_claves:
+        _modelos.clear()
+    with _lock_cache:
+        _cache_analisis.clear()
+    _series.reiniciar()
+    _controlador.reiniciar()
+    respaldo.reiniciar()
+
+def limites_concurrencia() -> Dict[int, float]:
+    """Límites de concurrencia aprendidos por número de API key"""
+    return _controlador.limites()
 
 # Esquema JSON para la respuesta estructurada
 RESPONSE_SCHEMA = {
@@ -62,150 +206,406 @@ Capítulo o Rango: Identifica con precisión el capítulo o rango de capítulos.
 Nombre de archivo a analizar: {filename}"""
 
 
-def analizar_nombre_manga(filename: str, max_retries: int = 3) -> Optional[Dict]:
+def es_limite_tasa(error_msg: str) -> bool:
+    """True si el error es un 429 / cuota agotada"""
+    error_msg = error_msg.lower()
+    # "rate" a secas también aparecería en la URL de generateContent de cualquier error HTTP
+    return any(texto in error_msg for texto in (
+        "429", "quota", "rate limit", "resource exhausted", "resource_exhausted",
+    ))
+
+
+def es_clave_invalida(error: BaseException) -> bool:
+    """True si el error indica una API key inválida, caducada o sin permisos"""
+    # 401/403 por el tipo o el código HTTP de la excepción: buscarlos en el texto
+    # también acertaría con cualquier mensaje que contenga esos dígitos
+    if isinstance(error, (google_exceptions.PermissionDenied, google_exceptions.Unauthenticated)):
+        return True
+    if getattr(error, 'code', None) in (401, 403):
+        return True
+    # Una key mal escrita o caducada llega como 400 con el motivo API_KEY_INVALID
+    error_msg = str(error).lower()
+    return any(texto in error_msg for texto in (
+        "api_key_invalid", "api key not valid", "api key expired",
+    ))
+
+
+def _llamar_gemini(api_key: str, prompt: str) -> str:
+    """Una llamada a generate_content con una API key; devuelve el texto de la respuesta"""
+    model = obtener_modelo(api_key)
+    metricas.incrementar('manga_gemini_solicitudes_total', clave=numero_clave(api_key))
+    inicio = time.perf_counter()
+    with metricas.cronometrar('gemini_llamada'):
+        response = model.generate_content(prompt)
+        # Limpiar la respuesta de posibles marcadores de código
+        response_text = response.text.strip()
+    latencia = time.perf_counter() - inicio
+    respaldo.registrar_latencia(config.GEMINI_MODEL, latencia)
+    if config.ADAPTIVE_CONCURRENCY:
+        _controlador.exito(api_key, latencia)
+    return response_text
+
+
+def _enviar(api_key: str, prompt: str, empezada: Optional[threading.Event] = None):
+    """
+    Lanza _llamar_gemini en el ejecutor de respaldo conservando el contexto de logs
+
+    Si se pasa `empezada`, se activa cuando la llamada sale de la cola del
+    ejecutor y empieza de verdad.
+    """
+    global _ejecutor_respaldo
+    with _lock_claves:
+        if _ejecutor_respaldo is None:
+            _ejecutor_respaldo = ThreadPoolExecutor(max_workers=config.HEDGING_MAX_THREADS,
+                                                    thread_name_prefix='gemini')
+
+    def llamar():
+        if empezada is not None:
+            empezada.set()
+        return _llamar_gemini(api_key, prompt)
+
+    return _ejecutor_respaldo.submit(contextvars.copy_context().run, llamar)
+
+
+def _registrar_error_respaldo(api_key: str, error: BaseException):
+    """Un 429 en una llamada cuyo error no llega al bucle de reintentos también cuenta"""
+    if es_limite_tasa(str(error)):
+        metricas.incrementar('manga_gemini_429_total', clave=numero_clave(api_key))
+        if config.ADAPTIVE_CONCURRENCY:
+            _controlador.limitado(api_key)
+
+
+def _generar(api_key: str, prompt: str, prioridad: str, usadas: set) -> str:
+    """
+    Llama a Gemini con la key del turno y, si tarda más de lo habitual, con un respaldo
+
+    Con HEDGING_ENABLED, si la respuesta no llega antes del percentil
+    HEDGING_PERCENTILE del modelo y queda presupuesto y una key libre, se lanza
+    la misma solicitud en esa key y se usa la primera respuesta correcta. La
+    otra llamada no se puede cancelar: termina en segundo plano y se ignora.
+    """
+    if not config.HEDGING_ENABLED:
+        return _llamar_gemini(api_key, prompt)
+
+    respaldo.presupuesto.contar_principal()
+    umbral = respaldo.umbral(config.GEMINI_MODEL)
+    empezada = threading.Event()
+    principal = _enviar(api_key, prompt, empezada)
+    if umbral is None:
+        return principal.result()
+    # El umbral se cuenta desde que la llamada empieza, no desde que entra en la
+    # cola del ejecutor: con los hilos ocupados, la espera no es latencia de Gemini
+    empezada.wait()
+    try:
+        return principal.result(timeout=umbral)
+    except FuturesTimeout:
+        pass
+
+    clave_respaldo = _planificador.intentar_adquirir(prioridad, evitar=usadas | {api_key})
+    if clave_respaldo is None:
+        metricas.incrementar('manga_gemini_respaldos_total', resultado='sin_clave')
+        return principal.result()
+    # Comprobar y gastar el crédito en un solo paso: con varios hilos a la vez
+    # no se lanzan más respaldos de los que permite el presupuesto
+    if not respaldo.presupuesto.consumir():
+        _planificador.liberar(clave_respaldo)
+        metricas.incrementar('manga_gemini_respaldos_total', resultado='sin_presupuesto')
+        return principal.result()
+    usadas.add(clave_respaldo)
+    log.debug("🪂 Respaldo tras %.1fs: API key #%d", umbral, numero_clave(clave_respaldo))
+
+    secundario = _enviar(clave_respaldo, prompt)
+    secundario.add_done_callback(lambda _: _planificador.liberar(clave_respaldo))
+    for futuro in as_completed((principal, secundario)):
+        if futuro.exception() is not None:
+            continue
+        if futuro is secundario:
+            metricas.incrementar('manga_gemini_respaldos_total', resultado='ganado')
+            if principal.done():
+                _registrar_error_respaldo(api_key, principal.exception())
+            else:
+                # El llamador libera el turno de la key principal al volver, pero su
+                # llamada sigue en vuelo: se mantiene ocupado hasta que termine
+                _planificador.ocupar(api_key)
+                principal.add_done_callback(lambda _: _planificador.liberar(api_key))
+        else:
+            metricas.incrementar('manga_gemini_respaldos_total', resultado='perdido')
+            secundario.add_done_callback(
+                lambda f: f.exception() and _registrar_error_respaldo(clave_respaldo, f.exception()))
+        return futuro.result()
+
+    # Fallaron las dos: el error de la principal lo trata el bucle de reintentos
+    metricas.incrementar('manga_gemini_respaldos_total', resultado='fallido')
+    _registrar_error_respaldo(clave_respaldo, secundario.exception())
+    raise principal.exception()
+
+
+def analizar_nombre_manga(filename: str, max_retries: int = 3,
+                          prioridad: str = planificador.LOTE) -> Optional[Dict]:
     """
     Analiza el nombre de un archivo de manga usando Gemini API con rotación de keys
     
     Args:
         filename: Nombre del archivo PDF a analizar
         max_retries: Número máximo de intentos con diferentes API keys
+        prioridad: Clase de prioridad en el planificador (planificador.INTERACTIVA, LOTE o MANTENIMIENTO)
         
     Returns:
         Diccionario con los metadatos extraídos o None si hay error
     """
+    if config.ANALYSIS_CACHE_SIZE:
+        with _lock_cache:
+            cacheado = _cache_analisis.get(filename)
+            if cacheado is not None:
+                _cache_analisis.move_to_end(filename)
+        metricas.registrar_cache('analisis', cacheado is not None)
+        if cacheado is not None:
+            log.info(f"♻️  Análisis en caché para '{filename}'")
+            return dict(cacheado)
+
+    with metricas.cronometrar('analisis_total'):
+        if config.CLUSTER_ANALYSIS:
+            resultado = _analizar_por_serie(filename, max_retries, prioridad)
+        else:
+            resultado = _analizar_coalescido(filename, max_retries, prioridad)
+    metricas.incrementar('manga_analisis_total', resultado='ok' if resultado else 'fallo')
+
+    if resultado and config.ANALYSIS_CACHE_SIZE:
+        with _lock_cache:
+            _cache_analisis[filename] = dict(resultado)
+            while len(_cache_analisis) > config.ANALYSIS_CACHE_SIZE:
+                _cache_analisis.popitem(last=False)
+    return resultado
+
+
+def _analizar_coalescido(filename: str, max_retries: int, prioridad: str) -> Optional[Dict]:
+    """Análisis completo; las solicitudes simultáneas del mismo archivo comparten la llamada"""
+    resultado, propio = _vuelos.hacer(
+        ('archivo', prioridad, filename),
+        lambda: _analizar_con_reintentos(filename, max_retries, prioridad)
+    )
+    if not propio:
+        metricas.incrementar('manga_agrupacion_total', resultado='coalescido')
+    return dict(resultado) if resultado else resultado
+
+
+def _analizar_por_serie(filename: str, max_retries: int, prioridad: str) -> Optional[Dict]:
+    """
+    Análisis que reutiliza la carpeta y el título ya resueltos para otro archivo de la
+    misma serie; mientras se resuelve, los demás archivos de la serie esperan a ese análisis
+    """
+    partes = agrupacion.extraer(filename)
+    if partes is None:
+        return _analizar_coalescido(filename, max_retries, prioridad)
+
+    serie = _series.obtener(partes['raiz'])
+    if serie is None:
+        def resolver():
+            metadatos = _analizar_coalescido(filename, max_retries, prioridad)
+            if metadatos and not _series.registrar(partes, metadatos):
+                log.info(f"🧩 '{partes['titulo']}': el capítulo no coincide, se analizará archivo por archivo")
+            return metadatos
+
+        # La prioridad forma parte de la clave: una subida web no espera a un análisis de lote
+        metadatos, propio = _vuelos.hacer(('serie', prioridad, partes['raiz']), resolver)
+        if propio:
+            return metadatos
+        serie = _series.obtener(partes['raiz'])
+
+    if serie:
+        metricas.incrementar('manga_agrupacion_total', resultado='serie')
+        log.info(f"🧩 Serie '{serie['nombre_carpeta_estandarizado']}' ya resuelta, capítulo {partes['capitulo']}")
+        return agrupacion.aplicar_serie(serie, partes)
+    return _analizar_coalescido(filename, max_retries, prioridad)
+
+
+def _analizar_con_reintentos(filename: str, max_retries: int, prioridad: str) -> Optional[Dict]:
+    """Bucle de reintentos de analizar_nombre_manga"""
+    usadas = set()
     for attempt in range(max_retries):
+        if attempt > 0:
+            metricas.incrementar('manga_gemini_reintentos_total')
+        clave = 0
+        current_key = None
         try:
-            # Configurar Gemini con la siguiente API key
-            current_key = configure_gemini()
-            print(f"[Intento {attempt + 1}/{max_retries}] Usando API key #{(current_key_index - 1) % len(config.GOOGLE_API_KEYS) + 1}")
-            
-            # Configurar el modelo
-            model = genai.GenerativeModel(
-                model_name=config.GEMINI_MODEL,
-                generation_config={
-                    "temperature": 0.1,  # Baja temperatura para respuestas más consistentes
-                }
-            )
+            # Turno en una API key según la prioridad (prefiriendo keys no usadas en este análisis)
+            with _planificador.turno(prioridad, evitar=usadas) as current_key:
+                usadas.add(current_key)
+                clave = numero_clave(current_key)
+                log.debug("[Intento %d/%d] Usando API key #%d (%s)", attempt + 1, max_retries, clave, prioridad)
             
-            # Crear el prompt con el nombre del archivo y especificar formato JSON
-            prompt = PROMPT_TEMPLATE.format(filename=filename)
-            prompt += "\n\nResponde ÚNICAMENTE con un objeto JSON válido que siga exactamente este esquema, sin texto adicional ni markdown:\n"
-            prompt += json.dumps(RESPONSE_SCHEMA, indent=2)
+                # Crear el prompt con el nombre del archivo y especificar formato JSON
+                prompt = PROMPT_TEMPLATE.format(filename=filename)
+                prompt += "\n\nResponde ÚNICAMENTE con un objeto JSON válido que siga exactamente este esquema, sin texto adicional ni markdown:\n"
+                prompt += json.dumps(RESPONSE_SCHEMA, indent=2)
             
-            # Generar la respuesta
-            response = model.generate_content(prompt)
+                # Generar la respuesta (con el modelo ya configurado para esa API key)
+                response_text = _generar(current_key, prompt, prioridad, usadas)
             
-            # Limpiar la respuesta de posibles marcadores de código
-            response_text = response.text.strip()
+                # Eliminar bloques de código markdown si existen
+                if response_text.startswith("```"):
+                    # Buscar el contenido entre ``` y ```
+                    lines = response_text.split('\n')
+                    response_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else response_text
             
-            # Eliminar bloques de código markdown si existen
-            if response_text.startswith("```"):
-                # Buscar el contenido entre ``` y ```
-                lines = response_text.split('\n')
-                response_text = '\n'.join(lines[1:-1]) if len(lines) > 2 else response_text
+                # Eliminar cualquier texto antes del primer {
+                json_start = response_text.find('{')
+                if json_start > 0:
+                    response_text = response_text[json_start:]
             
-            # Eliminar cualquier texto antes del primer {
-            json_start = response_text.find('{')
-            if json_start > 0:
-                response_text = response_text[json_start:]
+                # Eliminar cualquier texto después del último }
+                json_end = response_text.rfind('}')
+                if json_end > 0:
+                    response_text = response_text[:json_end + 1]
             
-            # Eliminar cualquier texto después del último }
-            json_end = response_text.rfind('}')
-            if json_end > 0:
-                response_text = response_text[:json_end + 1]
+                log.debug("Respuesta de Gemini: %.200s...", response_text)
             
-            print(f"Respuesta de Gemini: {response_text[:200]}...")
+                # Parsear la respuesta JSON
+                result = json.loads(response_text)
             
-            # Parsear la respuesta JSON
-            result = json.loads(response_text)
+                # Validar que tenga los campos requeridos
+                required_fields = ["nombre_carpeta_estandarizado", "titulo_limpio_archivo", "capitulo_o_rango", "es_secuela_o_extra"]
+                if not all(field in result for field in required_fields):
+                    raise ValueError(f"Respuesta JSON incompleta. Campos requeridos: {required_fields}")
             
-            # Validar que tenga los campos requeridos
-            required_fields = ["nombre_carpeta_estandarizado", "titulo_limpio_archivo", "capitulo_o_rango", "es_secuela_o_extra"]
-            if not all(field in result for field in required_fields):
-                raise ValueError(f"Respuesta JSON incompleta. Campos requeridos: {required_fields}")
+                # Esperar un poco para no saturar la API (con control adaptativo,
+                # el límite de solicitudes simultáneas ya se encarga de eso)
+                if not config.ADAPTIVE_CONCURRENCY:
+                    metricas.dormir('espera_request_delay', config.REQUEST_DELAY)
             
-            # Esperar un poco para no saturar la API
-            time.sleep(config.REQUEST_DELAY)
-            
-            return result
+                return result
             
         except json.JSONDecodeError as e:
             error_msg = f"Error al parsear JSON: {str(e)}"
-            print(f"Error en intento {attempt + 1} al analizar '{filename}': {error_msg}")
+            log.warning(f"Error en intento {attempt + 1} al analizar '{filename}' (API key #{clave}): {error_msg}")
+            metricas.incrementar('manga_gemini_errores_total', clave=clave, tipo='json')
             if attempt < max_retries - 1:
-                print(f"Reintentando con otra API key...")
-                time.sleep(2)
+                log.info("Reintentando con otra API key...")
+                metricas.dormir('espera_reintento', config.RETRY_DELAY)
                 continue
             
         except Exception as e:
             error_msg = str(e)
-            print(f"Error en intento {attempt + 1} al analizar '{filename}': {error_msg}")
+            log.warning(f"Error en intento {attempt + 1} al analizar '{filename}' (API key #{clave}): {error_msg}")
             
             # Si es error de límite de tasa o quota, esperar 1 minuto y reintentar
-            if "429" in error_msg or "quota" in error_msg.lower() or "rate" in error_msg.lower() or "resource exhausted" in error_msg.lower():
+            if es_limite_tasa(error_msg):
+                metricas.incrementar('manga_gemini_errores_total', clave=clave, tipo='429')
+                metricas.incrementar('manga_gemini_429_total', clave=clave)
+                if config.ADAPTIVE_CONCURRENCY and current_key:
+                    # La key queda en pausa y el planificador reintenta con otra
+                    pausa = _controlador.limitado(current_key)
+                    if attempt < max_retries - 1:
+                        log.warning(f"⏳ Límite de API alcanzado en la key #{clave}: en pausa {pausa:.0f}s, reintentando con otra...")
+                        continue
+                elif attempt < max_retries - 1:
+                    log.warning(f"⏳ Límite de API alcanzado. Esperando {config.RATE_LIMIT_WAIT} segundos antes de reintentar...")
+                    metricas.dormir('espera_backoff_429', config.RATE_LIMIT_WAIT)
+                    log.info("🔄 Reintentando con la siguiente API key...")
+                    continue
+            elif es_clave_invalida(e) and current_key:
+                # Key inválida: fuera del reparto y reintento inmediato con otra
+                metricas.incrementar('manga_gemini_errores_total', clave=clave, tipo='clave_invalida')
+                poner_en_cuarentena(current_key, config.KEY_QUARANTINE_INVALID, 'key inválida')
                 if attempt < max_retries - 1:
-                    print(f"⏳ Límite de API alcanzado. Esperando 60 segundos antes de reintentar...")
-                    time.sleep(60)  # Esperar 1 minuto
-                    print(f"🔄 Reintentando con la siguiente API key...")
                     continue
             else:
                 # Si es otro tipo de error, no reintentar
+                metricas.incrementar('manga_gemini_errores_total', clave=clave, tipo='otro')
                 break
     
-    print(f"No se pudo analizar '{filename}' después de {max_retries} intentos")
+    log.error(f"No se pudo analizar '{filename}' después de {max_retries} intentos")
     return None
 
 
-def organizar_manga(pdf_path: str, destino_base: str) -> Dict:
+def organizar_manga(pdf_path: str, destino_base: str, prioridad: str = planificador.LOTE) -> Dict:
     """
     Organiza un archivo PDF de manga en la estructura de carpetas correcta
     
     Args:
         pdf_path: Ruta completa al archivo PDF
         destino_base: Carpeta base donde se organizarán los mangas
+        prioridad: Clase de prioridad para el análisis con Gemini
         
     Returns:
         Diccionario con información del resultado
     """
     filename = os.path.basename(pdf_path)
     
-    print(f"\n📄 Procesando: {filename}")
-    
+    with registro.contexto(archivo=filename), metricas.cronometrar('organizar_total'):
+        log.info(f"📄 Procesando: {filename}")
+        return _organizar(pdf_path, filename, destino_base, prioridad)
+
+
+def _organizar(pdf_path: str, filename: str, destino_base: str, prioridad: str) -> Dict:
+    """Cuerpo de organizar_manga: análisis y movimiento del archivo"""
     # Analizar el nombre del archivo con Gemini
-    print(f"  🔍 Analizando con Gemini...")
-    metadatos = analizar_nombre_manga(filename)
+    log.debug("🔍 Analizando con Gemini...")
+    metadatos = analizar_nombre_manga(filename, prioridad=prioridad)
     
     if not metadatos:
-        print(f"  ❌ Error: No se pudieron extraer metadatos")
+        log.error("❌ Error: No se pudieron extraer metadatos")
         return {
             "success": False,
             "error": "No se pudieron extraer metadatos del archivo",
             "original_name": filename
         }
     
-    try:
-        print(f"  📊 Metadatos extraídos:")
-        print(f"     - Serie: {metadatos['nombre_carpeta_estandarizado']}")
-        print(f"     - Capítulo: {metadatos['capitulo_o_rango']}")
+    return mover_manga(pdf_path, metadatos, destino_base)
+
+
+def ruta_destino(metadatos: Dict, destino_base: str) -> Dict:
+    """
+    Calcula dónde quedará un PDF analizado, sin tocar el disco
+    
+    Returns:
+        {'carpeta': ruta de la carpeta de la serie, 'nombre': nuevo nombre, 'ruta': ruta completa}
+    """
+    carpeta_serie = os.path.join(destino_base, metadatos['nombre_carpeta_estandarizado'])
+    nuevo_nombre = f"{metadatos['titulo_limpio_archivo']} - Cap. {metadatos['capitulo_o_rango']}.pdf"
+    return {
+        'carpeta': carpeta_serie,
+        'nombre': nuevo_nombre,
+        'ruta': os.path.join(carpeta_serie, nuevo_nombre),
+    }
+
+
+def mover_manga(pdf_path: str, metadatos: Dict, destino_base: str) -> Dict:
+    """
+    Mueve y renombra un PDF ya analizado a la carpeta de su serie
+    
+    Args:
+        pdf_path: Ruta completa al archivo PDF
+        metadatos: Resultado de analizar_nombre_manga
+        destino_base: Carpeta base donde se organizarán los mangas
         
-        # Crear la carpeta de la serie si no existe
-        carpeta_serie = os.path.join(destino_base, metadatos['nombre_carpeta_estandarizado'])
-        os.makedirs(carpeta_serie, exist_ok=True)
-        print(f"  📁 Carpeta: {carpeta_serie}")
+    Returns:
+        Diccionario con información del resultado (mismo formato que organizar_manga)
+    """
+    filename = os.path.basename(pdf_path)
+    try:
+        log.debug("📊 Metadatos extraídos: serie '%s', capítulo %s",
+                  metadatos['nombre_carpeta_estandarizado'], metadatos['capitulo_o_rango'])
         
-        # Construir el nuevo nombre del archivo
-        nuevo_nombre = f"{metadatos['titulo_limpio_archivo']} - Cap. {metadatos['capitulo_o_rango']}.pdf"
-        print(f"  📝 Nuevo nombre: {nuevo_nombre}")
+        # Carpeta de la serie, nuevo nombre y ruta completa del destino
+        destino = ruta_destino(metadatos, destino_base)
+        nuevo_nombre = destino['nombre']
+        destino_completo = destino['ruta']
         
-        # Ruta completa del destino
-        destino_completo = os.path.join(carpeta_serie, nuevo_nombre)
+        # Crear la carpeta de la serie si no existe
+        os.makedirs(destino['carpeta'], exist_ok=True)
         
-        # Mover y renombrar el archivo
-        print(f"  🚚 Moviendo archivo...")
-        os.rename(pdf_path, destino_completo)
-        print(f"  ✅ Archivo organizado correctamente!")
+        # Mover y renombrar el archivo sin pisar uno que ya esté (p. ej. una subida
+        # reintentada): el recién llegado queda como 'Nombre (1).pdf'
+        with metricas.cronometrar('movimiento_disco'):
+            libre = biblioteca.mover_a_nombre_libre(pdf_path, destino['carpeta'], nuevo_nombre)
+        if libre != nuevo_nombre:
+            log.warning(f"⚠️  Ya existía {nuevo_nombre}: se guarda como {libre}")
+            nuevo_nombre = libre
+            destino_completo = os.path.join(destino['carpeta'], libre)
+        log.info(f"✅ Organizado en {metadatos['nombre_carpeta_estandarizado']}/{nuevo_nombre}")
         
-        return {
+        resultado = {
             "success": True,
             "original_name": filename,
             "new_name": nuevo_nombre,
@@ -214,8 +614,11 @@ def organizar_manga(pdf_path: str, destino_base: str) -> Dict:
             "is_extra": metadatos['es_secuela_o_extra'],
             "full_path": destino_completo
         }
+        _notificar_movimiento(resultado)
+        return resultado
         
     except Exception as e:
+        log.exception(f"❌ Error al mover el archivo: {e}")
         return {
             "success": False,
             "error": str(e),
@@ -224,42 +627,39 @@ def organizar_manga(pdf_path: str, destino_base: str) -> Dict:
         }
 
 
-def procesar_multiples_archivos(archivos_pdf: list, destino_base: str) -> list:
+def procesar_multiples_archivos(archivos_pdf: list, destino_base: str,
+                                prioridad: str = planificador.LOTE) -> list:
     """
     Procesa múltiples archivos PDF
     
     Args:
-        archivos_pdf: Lista de rutas a archivos PDF
+        archivos_pdf: Lista de rutas a archivos PDF (o un iterable que las va
+            produciendo, como los PDFs de un paquete a medida que se extraen)
         destino_base: Carpeta base donde se organizarán
+        prioridad: Clase de prioridad para el análisis con Gemini
         
     Returns:
         Lista con los resultados de cada archivo
     """
     resultados = []
-    total = len(archivos_pdf)
+    total = len(archivos_pdf) if hasattr(archivos_pdf, '__len__') else '?'
     
-    print(f"\n{'='*80}")
-    print(f"📚 PROCESANDO {total} ARCHIVO(S)")
-    print(f"{'='*80}")
+    log.info(f"📚 Procesando {total} archivo(s)")
     
     for i, pdf_path in enumerate(archivos_pdf, 1):
-        print(f"\n[{i}/{total}] ⚙️  Procesando archivo {i} de {total}...")
-        resultado = organizar_manga(pdf_path, destino_base)
+        log.debug(f"[{i}/{total}] ⚙️  Procesando archivo {i} de {total}...")
+        resultado = organizar_manga(pdf_path, destino_base, prioridad)
         resultados.append(resultado)
         
         if resultado['success']:
-            print(f"[{i}/{total}] ✅ Completado exitosamente")
+            log.info(f"[{i}/{total}] ✅ Completado exitosamente")
         else:
-            print(f"[{i}/{total}] ❌ Error: {resultado.get('error', 'Error desconocido')}")
+            log.error(f"[{i}/{total}] ❌ Error: {resultado.get('error', 'Error desconocido')}")
     
+    total = len(resultados)
     exitosos = sum(1 for r in resultados if r.get('success'))
     fallidos = total - exitosos
     
-    print(f"\n{'='*80}")
-    print(f"📊 RESUMEN FINAL")
-    print(f"{'='*80}")
-    print(f"✅ Exitosos: {exitosos}/{total}")
-    print(f"❌ Fallidos: {fallidos}/{total}")
-    print(f"{'='*80}\n")
+    log.info(f"📊 Resumen: ✅ {exitosos}/{total} exitosos, ❌ {fallidos}/{total} fallidos")
     
     return resultados
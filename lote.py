@@ -0,0 +1,591 @@
+#!/usr/bin/env python3
+"""
+Procesamiento en lote de PDFs de manga con informe en streaming
+
+Cada archivo se analiza y mueve en paralelo, y en cuanto termina se añade una
+línea al informe de la ejecución (JSONL o CSV, con fecha en el nombre), así que
+la memoria no crece con el tamaño del lote y, si el proceso se corta, el
+informe conserva todo lo hecho hasta ese momento. El resumen se genera después
+leyendo el propio informe.
+
+Los paquetes ZIP/CBZ de la carpeta se extraen de uno en uno (paquetes.py) en
+una carpeta con su nombre a medida que el lote pide archivos; el paquete se
+borra cuando todos sus PDFs están fuera, igual que los PDFs sueltos se mueven.
+
+Con config.CLUSTER_ANALYSIS se procesa primero un archivo de cada serie y
+después el resto, que reutilizan su análisis (ver agrupacion.py).
+
+Con --plan o --exportar-plan el lote se hace en dos fases: primero se analiza
+entero en paralelo sin mover nada y se construye un plan de movimientos
+(biblioteca.py) con la carpeta y el nombre de cada archivo y las colisiones de
+nombres ya resueltas; después el plan se aplica en bloque, con diario para
+deshacerlo. Los paquetes ZIP/CBZ se extraen ya en la fase de plan, para que el
+plan tenga rutas reales.
+
+Uso:
+    python lote.py --origen "/opt/MangaRead/manga-organizer/Lote grande"
+    python lote.py --concurrencia 16 --formato csv --si
+    python lote.py --dry-run                      # solo analizar, sin mover
+    python lote.py --plan                         # analizar todo, revisar el plan y aplicarlo
+    python lote.py --exportar-plan plan-lote.json # solo guardar el plan para revisarlo
+    python lote.py --aplicar-plan plan-lote.json
+    python lote.py --resumen reportes/lote-20250101-120000.jsonl
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterator, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agrupacion
+import biblioteca
+import config
+import gemini_organizer
+import manifiesto
+import paquetes
+import planificador
+import registro
+import sondeo
+
+log = logging.getLogger('lote')
+
+FORMATOS = ('jsonl', 'csv')
+
+# Columnas del informe (en este orden en CSV)
+CAMPOS = ('fecha', 'archivo', 'origen', 'exito', 'simulado', 'carpeta',
+          'nuevo_nombre', 'capitulo', 'extra', 'ruta', 'error', 'segundos')
+
+
+# Qué hacer con los paquetes ZIP/CBZ al recorrer la carpeta de origen
+EXTRAER = 'extraer'  # Extraer sus PDFs junto al paquete
+LISTAR = 'listar'    # Solo los nombres, como rutas 'paquete.zip/archivo.pdf' (conteo y dry-run)
+IGNORAR = 'ignorar'
+
+
+def buscar_pdfs(origen: str, modo_paquetes: str = EXTRAER) -> Iterator[str]:
+    """Recorre la carpeta de origen y va devolviendo las rutas de los PDFs"""
+    for root, dirs, files in os.walk(origen):
+        paquetes_aqui = set() if modo_paquetes == IGNORAR else {f for f in files if paquetes.es_paquete(f)}
+        # La carpeta de extracción de un paquete que sigue ahí se recorre a través del paquete
+        extraidas = {os.path.splitext(f)[0] for f in paquetes_aqui}
+        dirs[:] = sorted(d for d in dirs if d not in extraidas)
+        for file in sorted(files):
+            if file.lower().endswith('.pdf'):
+                yield os.path.join(root, file)
+            elif file in paquetes_aqui:
+                yield from _pdfs_de_paquete(os.path.join(root, file), modo_paquetes)
+
+
+def _pdfs_de_paquete(ruta: str, modo_paquetes: str) -> Iterator[str]:
+    """PDFs de un paquete ZIP/CBZ de la carpeta de origen (ver buscar_pdfs)"""
+    try:
+        if modo_paquetes == LISTAR:
+            for nombre in paquetes.listar_pdfs(ruta):
+                yield os.path.join(ruta, nombre)
+            return
+        errores = []
+        carpeta = os.path.splitext(ruta)[0]
+        yield from paquetes.extraer_pdfs(ruta, carpeta, errores=errores)
+    except zipfile.BadZipFile:
+        log.error(f"❌ Paquete dañado o no válido: {ruta}")
+        return
+
+    if errores:
+        log.warning(f"⚠️  {len(errores)} PDF(s) sin extraer de {os.path.basename(ruta)}: se conserva el paquete")
+    else:
+        os.remove(ruta)
+        log.info(f"📦 {os.path.basename(ruta)} extraído en {carpeta}")
+
+
+def ordenar_por_series(origen: str, modo_paquetes: str = EXTRAER) -> Iterator[str]:
+    """
+    Recorre los PDFs con un archivo por serie primero y los demás de cada serie después
+
+    Cuando llega el segundo recorrido las series ya están resueltas y sus archivos
+    no necesitan llamada a Gemini. Solo se guarda en memoria un archivo por serie.
+    Los paquetes se extraen en el primer recorrido; en el segundo sus PDFs ya están
+    en la carpeta de extracción.
+    """
+    representantes = {}
+    for pdf_path in buscar_pdfs(origen, modo_paquetes):
+        partes = agrupacion.extraer(os.path.basename(pdf_path))
+        if partes is None:
+            yield pdf_path
+        elif partes['raiz'] not in representantes:
+            representantes[partes['raiz']] = pdf_path
+            yield pdf_path
+    procesados = set(representantes.values())
+    for pdf_path in buscar_pdfs(origen, IGNORAR if modo_paquetes == EXTRAER else modo_paquetes):
+        partes = agrupacion.extraer(os.path.basename(pdf_path))
+        if partes is not None and pdf_path not in procesados:
+            yield pdf_path
+
+
+class Informe:
+    """Escritor del informe de una ejecución: un registro por archivo, con flush inmediato"""
+
+    def __init__(self, ruta: str, formato: str):
+        self.ruta = ruta
+        self.formato = formato
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+        self._f = open(ruta, 'a', encoding='utf-8', newline='')
+        self._csv = None
+        if formato == 'csv':
+            self._csv = csv.DictWriter(self._f, fieldnames=CAMPOS)
+            if self._f.tell() == 0:
+                self._csv.writeheader()
+
+    def escribir(self, registro_archivo: Dict):
+        fila = {campo: registro_archivo.get(campo) for campo in CAMPOS}
+        with self._lock:
+            if self._csv:
+                self._csv.writerow(fila)
+            else:
+                self._f.write(json.dumps(fila, ensure_ascii=False) + '\n')
+            self._f.flush()
+
+    def cerrar(self):
+        with self._lock:
+            self._f.close()
+
+
+def leer_informe(ruta: str) -> Iterator[Dict]:
+    """Lee un informe JSONL o CSV registro a registro (tolera una última línea a medias)"""
+    with open(ruta, encoding='utf-8', newline='') as f:
+        if ruta.lower().endswith('.csv'):
+            for fila in csv.DictReader(f):
+                for campo in ('exito', 'simulado', 'extra'):
+                    fila[campo] = fila.get(campo) == 'True'
+                fila['segundos'] = float(fila.get('segundos') or 0)
+                yield fila
+        else:
+            for linea in f:
+                try:
+                    yield json.loads(linea)
+                except ValueError:
+                    continue
+
+
+def procesar_archivo(pdf_path: str, destino: str, dry_run: bool) -> Dict:
+    """Organiza (o en dry-run solo analiza) un PDF y devuelve su registro para el informe"""
+    inicio = time.perf_counter()
+    filename = os.path.basename(pdf_path)
+    try:
+        if dry_run:
+            with registro.contexto(archivo=filename):
+                metadatos = gemini_organizer.analizar_nombre_manga(filename, prioridad=planificador.LOTE)
+            if metadatos:
+                destino_archivo = gemini_organizer.ruta_destino(metadatos, destino)
+                resultado = {
+                    'success': True,
+                    'folder': metadatos['nombre_carpeta_estandarizado'],
+                    'new_name': destino_archivo['nombre'],
+                    'chapter': metadatos['capitulo_o_rango'],
+                    'is_extra': metadatos['es_secuela_o_extra'],
+                    'full_path': destino_archivo['ruta'],
+                }
+            else:
+                resultado = {'success': False, 'error': 'No se pudieron extraer metadatos del archivo'}
+        else:
+            resultado = gemini_organizer.organizar_manga(pdf_path, destino, planificador.LOTE)
+    except Exception as e:
+        log.exception(f"❌ Error inesperado con {filename}")
+        resultado = {'success': False, 'error': str(e)}
+
+    return {
+        'fecha': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'archivo': filename,
+        'origen': pdf_path,
+        'exito': bool(resultado.get('success')),
+        'simulado': dry_run,
+        'carpeta': resultado.get('folder'),
+        'nuevo_nombre': resultado.get('new_name'),
+        'capitulo': resultado.get('chapter'),
+        'extra': bool(resultado.get('is_extra')),
+        'ruta': resultado.get('full_path'),
+        'error': resultado.get('error'),
+        'segundos': round(time.perf_counter() - inicio, 3),
+    }
+
+
+def procesar_lote(origen: str, destino: str, concurrencia: int, informe: Informe,
+                  dry_run: bool = False, total: Optional[int] = None,
+                  modo_paquetes: Optional[str] = None) -> Dict:
+    """
+    Procesa los PDFs de `origen` con `concurrencia` archivos en paralelo
+
+    Solo hay como mucho 2 x concurrencia archivos pendientes a la vez: el resto
+    se va leyendo del recorrido de la carpeta a medida que hay hueco.
+    Por defecto los paquetes se extraen, salvo en dry-run, donde solo se listan.
+
+    Returns:
+        {'procesados', 'exitosos', 'fallidos', 'segundos'}
+    """
+    contadores = {'procesados': 0, 'exitosos': 0, 'fallidos': 0}
+    lock = threading.Lock()
+    inicio = time.time()
+
+    def terminar(futuro):
+        # Callback al acabar cada archivo: se escribe aunque el lote se interrumpa después
+        if futuro.cancelled():
+            return
+        registro_archivo = futuro.result()
+        informe.escribir(registro_archivo)
+        with lock:
+            contadores['procesados'] += 1
+            contadores['exitosos' if registro_archivo['exito'] else 'fallidos'] += 1
+            n = contadores['procesados']
+        transcurrido = time.time() - inicio
+        restante = f", ~{int(transcurrido / n * (total - n))}s restantes" if total else ''
+        icono = '✅' if registro_archivo['exito'] else '❌'
+        log.info(f"{icono} [{n}/{total or '?'}] {registro_archivo['archivo']}{restante}")
+
+    if modo_paquetes is None:
+        modo_paquetes = LISTAR if dry_run else EXTRAER
+    if config.CLUSTER_ANALYSIS:
+        recorrido = ordenar_por_series(origen, modo_paquetes)
+    else:
+        recorrido = buscar_pdfs(origen, modo_paquetes)
+    pendientes = set()
+    with ThreadPoolExecutor(max_workers=max(1, concurrencia)) as executor:
+        try:
+            for pdf_path in recorrido:
+                if len(pendientes) >= 2 * max(1, concurrencia):
+                    _, pendientes = wait(pendientes, return_when=FIRST_COMPLETED)
+                futuro = executor.submit(procesar_archivo, pdf_path, destino, dry_run)
+                futuro.add_done_callback(terminar)
+                pendientes.add(futuro)
+        except BaseException:
+            # Ctrl+C: no empezar más archivos; los que están en curso terminan y quedan en el informe
+            for futuro in pendientes:
+                futuro.cancel()
+            raise
+
+    contadores['segundos'] = time.time() - inicio
+    return contadores
+
+
+def planificar_lote(ruta_informe: str, destino: str) -> Dict:
+    """
+    Construye el plan de movimientos de un lote a partir del informe de su análisis
+
+    Las colisiones (un nombre que ya existe en la carpeta de la serie o que se
+    repite dentro del lote) se resuelven en memoria contra el índice de la
+    biblioteca con biblioteca.resolver_colision() y quedan anotadas en el plan.
+
+    Returns:
+        Plan de biblioteca.nuevo_plan() con además 'colisiones' y 'errores'
+        (archivos que no se pudieron analizar y no se moverán)
+    """
+    indice = biblioteca.escanear_biblioteca(destino)
+    plan = biblioteca.nuevo_plan(destino, 'lote')
+    plan['informe'] = ruta_informe
+    plan['colisiones'] = []
+    plan['errores'] = []
+    ocupados = {}  # carpeta de serie -> nombres ya usados (biblioteca + plan)
+
+    for fila in leer_informe(ruta_informe):
+        if not fila.get('exito'):
+            plan['errores'].append({'archivo': fila['archivo'], 'origen': fila['origen'],
+                                    'error': fila.get('error') or 'Error desconocido'})
+            continue
+        carpeta = fila['carpeta']
+        serie = indice.get(carpeta)
+        if carpeta not in ocupados:
+            ocupados[carpeta] = set(serie['archivos']) | set(serie['subcarpetas']) if serie else set()
+        nombre = biblioteca.resolver_colision(fila['nuevo_nombre'], ocupados[carpeta])
+        if nombre != fila['nuevo_nombre']:
+            existia = serie is not None and fila['nuevo_nombre'] in serie['archivos']
+            plan['colisiones'].append({
+                'archivo': fila['archivo'],
+                'carpeta': carpeta,
+                'nombre': fila['nuevo_nombre'],
+                'renombrado': nombre,
+                'motivo': 'ya existe en la biblioteca' if existia else 'repetido en el lote',
+            })
+        plan['movimientos'].append({
+            'origen': fila['origen'],
+            'destino': os.path.join(destino, carpeta, nombre),
+            'archivo': fila['archivo'],
+            'carpeta': carpeta,
+            'capitulo': fila['capitulo'],
+            'extra': bool(fila.get('extra')),
+            'carpeta_nueva': serie is None,
+        })
+    return plan
+
+
+def mostrar_plan(plan: Dict):
+    """Muestra el plan de un lote por carpeta, con las colisiones y los archivos sin analizar"""
+    por_carpeta = {}
+    for movimiento in plan['movimientos']:
+        por_carpeta.setdefault(movimiento['carpeta'], []).append(movimiento)
+    nuevas = sum(1 for movs in por_carpeta.values() if movs[0]['carpeta_nueva'])
+
+    print(f"📦 {len(plan['movimientos'])} archivos a {len(por_carpeta)} carpetas ({nuevas} nuevas):\n")
+    for carpeta in sorted(por_carpeta):
+        movimientos = por_carpeta[carpeta]
+        print(f"📁 {carpeta}{' [NUEVA]' if movimientos[0]['carpeta_nueva'] else ''} ({len(movimientos)} archivos)")
+        for movimiento in sorted(movimientos, key=lambda m: os.path.basename(m['destino'])):
+            extra = ' [EXTRA/SECUELA]' if movimiento['extra'] else ''
+            print(f"   {movimiento['archivo']} → {os.path.basename(movimiento['destino'])}{extra}")
+
+    if plan['colisiones']:
+        print(f"\n⚠️  {len(plan['colisiones'])} colisiones de nombre (se renombrarán):")
+        for colision in plan['colisiones']:
+            print(f"   {colision['archivo']}: '{colision['nombre']}' {colision['motivo']} "
+                  f"→ '{colision['renombrado']}' ({colision['carpeta']})")
+    if plan['errores']:
+        print(f"\n❌ {len(plan['errores'])} archivos sin analizar (no se moverán):")
+        for error in plan['errores']:
+            print(f"   {error['archivo']}: {error['error']}")
+    print()
+
+
+def aplicar_plan_lote(plan: Dict, hilos: int) -> Dict:
+    """Aplica en bloque el plan de un lote, con diario para deshacerlo"""
+    renombrados = biblioteca.revalidar_destinos(plan)
+    if renombrados:
+        print(f"⚠️  {renombrados} destinos ya existían en la biblioteca: se renombran para no sobrescribirlos")
+    diario = os.path.join(config.BASE_DIR, 'diarios', f"lote-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
+    inicio = time.time()
+    resultado = biblioteca.aplicar_plan(plan, hilos=hilos, diario=diario)
+    if os.path.abspath(plan['base']) == os.path.abspath(config.MANGA_DESTINATION):
+        for carpeta in {m['carpeta'].split(os.sep)[0] for m in plan['movimientos']}:
+            manifiesto.marcar(carpeta)
+    print(f"\n✅ {resultado['movidos']} archivos movidos en {time.time() - inicio:.2f}s")
+    for error in resultado['errores']:
+        print(f"  ❌ {error['origen']}: {error['error']}")
+    print(f"↩️  Para deshacer: python unificar_carpetas.py --deshacer '{diario}'")
+    return resultado
+
+
+def resumir(ruta_informe: str) -> Dict:
+    """Totales de un informe, leídos en streaming"""
+    resumen = {'total': 0, 'exitosos': 0, 'fallidos': 0, 'simulados': 0,
+               'primera': None, 'ultima': None, 'segundos_archivos': 0.0}
+    for fila in leer_informe(ruta_informe):
+        resumen['total'] += 1
+        resumen['exitosos' if fila.get('exito') else 'fallidos'] += 1
+        resumen['simulados'] += 1 if fila.get('simulado') else 0
+        resumen['segundos_archivos'] += float(fila.get('segundos') or 0)
+        fecha = fila.get('fecha')
+        if fecha:
+            resumen['primera'] = min(resumen['primera'] or fecha, fecha)
+            resumen['ultima'] = max(resumen['ultima'] or fecha, fecha)
+    return resumen
+
+
+def escribir_resumen(ruta_informe: str, ruta_resumen: Optional[str] = None) -> str:
+    """
+    Genera el resumen legible de un informe (mismo estilo que el antiguo reporte-lote-grande.txt)
+
+    Returns:
+        Ruta del resumen generado
+    """
+    if ruta_resumen is None:
+        ruta_resumen = f"{os.path.splitext(ruta_informe)[0]}-resumen.txt"
+    resumen = resumir(ruta_informe)
+
+    with open(ruta_resumen, 'w', encoding='utf-8') as f:
+        f.write("=" * 80 + "\n")
+        f.write("REPORTE DE PROCESAMIENTO EN LOTE - MANGA ORGANIZER\n")
+        f.write("=" * 80 + "\n\n")
+        f.write(f"Informe: {ruta_informe}\n")
+        f.write(f"Desde: {resumen['primera'] or '-'}\n")
+        f.write(f"Hasta: {resumen['ultima'] or '-'}\n")
+        f.write(f"Total de archivos: {resumen['total']}\n")
+        f.write(f"Exitosos: {resumen['exitosos']}\n")
+        f.write(f"Fallidos: {resumen['fallidos']}\n")
+        if resumen['simulados']:
+            f.write(f"Simulados (dry-run, sin mover): {resumen['simulados']}\n")
+        f.write("\n" + "=" * 80 + "\n\n")
+
+        if resumen['exitosos']:
+            f.write(f"ARCHIVOS PROCESADOS EXITOSAMENTE ({resumen['exitosos']}):\n\n")
+            i = 0
+            for fila in leer_informe(ruta_informe):
+                if not fila.get('exito'):
+                    continue
+                i += 1
+                f.write(f"{i}. {fila['archivo']}\n")
+                f.write(f"   → Carpeta: {fila['carpeta']}\n")
+                f.write(f"   → Nuevo nombre: {fila['nuevo_nombre']}\n")
+                f.write(f"   → Capítulo: {fila['capitulo']}\n")
+                if fila.get('extra'):
+                    f.write("   → [EXTRA/SECUELA]\n")
+                f.write(f"   → Ruta: {fila['ruta']}\n\n")
+
+        if resumen['fallidos']:
+            f.write("\n" + "=" * 80 + "\n\n")
+            f.write(f"ARCHIVOS CON ERROR ({resumen['fallidos']}):\n\n")
+            i = 0
+            for fila in leer_informe(ruta_informe):
+                if fila.get('exito'):
+                    continue
+                i += 1
+                f.write(f"{i}. {fila['archivo']}\n")
+                f.write(f"   ✗ Error: {fila.get('error') or 'Error desconocido'}\n\n")
+
+        f.write("\n" + "=" * 80 + "\n")
+        f.write("Fin del reporte\n")
+    return ruta_resumen
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Procesa en lote los PDFs de una carpeta')
+    parser.add_argument('--origen', default=config.BATCH_SOURCE, help='Carpeta con los PDFs a organizar')
+    parser.add_argument('--destino', default=config.MANGA_DESTINATION, help='Carpeta de la biblioteca')
+    parser.add_argument('--concurrencia', type=int, default=8, help='Archivos procesados en paralelo')
+    parser.add_argument('--dry-run', action='store_true', help='Solo analizar: no se mueve ningún archivo')
+    parser.add_argument('--formato', choices=FORMATOS, default='jsonl', help='Formato del informe')
+    parser.add_argument('--reportes', default=config.REPORTS_DIR, help='Carpeta de los informes')
+    parser.add_argument('--resumen', metavar='INFORME',
+                        help='Solo generar el resumen de un informe existente (p. ej. de una ejecución cortada)')
+    parser.add_argument('--plan', action='store_true',
+                        help='Analizar todo el lote, mostrar el plan de movimientos y aplicarlo en bloque')
+    parser.add_argument('--exportar-plan', metavar='RUTA', help='Analizar el lote y guardar el plan en JSON sin mover nada')
+    parser.add_argument('--aplicar-plan', metavar='RUTA', help='Aplicar un plan exportado con --exportar-plan')
+    parser.add_argument('--hilos', type=int, default=16, help='Movimientos en paralelo al aplicar un plan')
+    parser.add_argument('-s', '--si', action='store_true', help='No pedir confirmación')
+    args = parser.parse_args()
+    if args.dry_run and (args.exportar_plan or args.aplicar_plan):
+        parser.error('--dry-run no se puede combinar con --exportar-plan ni --aplicar-plan')
+
+    if args.resumen:
+        print(f"📝 Resumen guardado en: {escribir_resumen(args.resumen)}")
+        return
+
+    registro.configurar()
+    manifiesto.iniciar()
+
+    if args.aplicar_plan:
+        plan = biblioteca.cargar_plan(args.aplicar_plan)
+        print(f"📄 Plan: {args.aplicar_plan} (creado {plan['creado']})\n")
+        mostrar_plan(plan)
+        if not plan['movimientos']:
+            return
+        if not args.si:
+            respuesta = input(f"¿Mover {len(plan['movimientos'])} archivos? (s/N): ").strip().lower()
+            if respuesta not in ['s', 'si', 'sí', 'y', 'yes']:
+                print("❌ Operación cancelada")
+                return
+        aplicar_plan_lote(plan, args.hilos)
+        return
+
+    planificar = args.plan or bool(args.exportar_plan)
+
+    print("=" * 80)
+    print("🚀 PROCESAMIENTO EN LOTE - MANGA ORGANIZER")
+    print("=" * 80)
+    print(f"📁 Carpeta origen: {args.origen}")
+    print(f"📚 Carpeta destino: {args.destino}")
+    print(f"🤖 Modelo: {config.GEMINI_MODEL}")
+    print(f"🔑 API Keys disponibles: {len(config.GOOGLE_API_KEYS)}")
+    if args.dry_run:
+        modo = ' (dry-run: sin mover archivos)'
+    elif planificar:
+        modo = ' (plan: se analiza todo antes de mover)'
+    else:
+        modo = ''
+    print(f"⚙️  Concurrencia: {args.concurrencia}{modo}")
+    print("=" * 80)
+
+    if not os.path.isdir(args.origen):
+        print(f"❌ La carpeta de origen no existe: {args.origen}")
+        sys.exit(1)
+
+    print("\n🔍 Buscando archivos PDF (también dentro de paquetes ZIP/CBZ)...")
+    grupos, sueltos = agrupacion.agrupar(os.path.basename(p) for p in buscar_pdfs(args.origen, LISTAR))
+    total = sum(len(nombres) for nombres in grupos.values()) + len(sueltos)
+    if total == 0:
+        print("❌ No se encontraron archivos PDF en la carpeta")
+        return
+    print(f"✅ Se encontraron {total} archivos PDF")
+    if config.CLUSTER_ANALYSIS:
+        series = sum(1 for nombres in grupos.values() if len(nombres) > 1)
+        print(f"🧩 {series} series con varios archivos: hasta {agrupacion.llamadas_ahorradas(grupos)} "
+              f"llamadas a Gemini menos")
+    print()
+
+    if not args.si and not args.dry_run and not planificar:
+        print("⚠️  IMPORTANTE:")
+        print("   - Los archivos se MOVERÁN (no se copiarán)")
+        print("   - Se organizarán en carpetas por serie")
+        print("   - Se renombrarán automáticamente\n")
+        respuesta = input(f"¿Procesar {total} archivos? (s/N): ").strip().lower()
+        if respuesta not in ['s', 'si', 'sí', 'y', 'yes']:
+            print("❌ Operación cancelada")
+            return
+
+    sondeo.iniciar()
+    ruta_informe = os.path.join(args.reportes, f"lote-{time.strftime('%Y%m%d-%H%M%S')}.{args.formato}")
+    informe = Informe(ruta_informe, args.formato)
+    print(f"📝 Informe en curso: {ruta_informe}\n")
+
+    try:
+        totales = procesar_lote(args.origen, args.destino, args.concurrencia, informe,
+                                dry_run=args.dry_run or planificar, total=total,
+                                modo_paquetes=EXTRAER if planificar and not args.dry_run else None)
+    except KeyboardInterrupt:
+        print("\n❌ Procesamiento interrumpido: el informe conserva los archivos ya procesados")
+        raise
+    finally:
+        informe.cerrar()
+        ruta_resumen = escribir_resumen(ruta_informe)
+
+    procesados = totales['procesados'] or 1
+    print("\n" + "=" * 80)
+    print("📊 RESUMEN FINAL")
+    print("=" * 80)
+    print(f"⏱️  Tiempo total: {totales['segundos']:.2f} segundos ({totales['segundos'] / 60:.2f} minutos)")
+    print(f"📦 Total procesados: {totales['procesados']}")
+    print(f"✅ Exitosos: {totales['exitosos']} ({totales['exitosos'] / procesados * 100:.1f}%)")
+    print(f"❌ Fallidos: {totales['fallidos']} ({totales['fallidos'] / procesados * 100:.1f}%)")
+    print("=" * 80)
+    print(f"💾 Informe: {ruta_informe}")
+    print(f"📝 Resumen: {ruta_resumen}")
+    if totales['fallidos']:
+        print(f"\n⚠️  Hubo {totales['fallidos']} archivo(s) con error. Revisa el resumen para más detalles.")
+
+    if not planificar:
+        return
+    plan = planificar_lote(ruta_informe, args.destino)
+    print("\n" + "=" * 80)
+    print("📋 PLAN DE MOVIMIENTOS")
+    print("=" * 80)
+    mostrar_plan(plan)
+
+    if args.exportar_plan:
+        biblioteca.guardar_plan(plan, args.exportar_plan)
+        print(f"💾 Plan guardado en: {args.exportar_plan}")
+        print(f"▶️  Para aplicarlo: python lote.py --aplicar-plan '{args.exportar_plan}'")
+        return
+    if args.dry_run:
+        print("ℹ️  Dry run: no se ha movido ningún archivo")
+        return
+    if not plan['movimientos']:
+        return
+
+    if not args.si:
+        respuesta = input(f"¿Mover {len(plan['movimientos'])} archivos según el plan? (s/N): ").strip().lower()
+        if respuesta not in ['s', 'si', 'sí', 'y', 'yes']:
+            print("❌ Operación cancelada")
+            return
+    aplicar_plan_lote(plan, args.hilos)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except KeyboardInterrupt:
+        sys.exit(1)
@@ -0,0 +1,406 @@
+#!/usr/bin/env python3
+"""
+Manifiesto precalculado de la biblioteca para el lector
+
+En vez de recorrer las carpetas de la biblioteca, el lector descarga el índice
+(indice.json: series con número de capítulos, tamaño, portada y fragmento) y,
+al abrir una serie, el fragmento que la contiene (series-NN.json: capítulos con
+rango ya interpretado y tamaño). Cada archivo se escribe también precomprimido
+(.gz y, si está instalado el paquete brotli, .br) y de forma atómica, así que
+se puede servir como estático (app.py /manifiesto/ o gzip_static de nginx).
+
+El manifiesto se actualiza por series: tras cada archivo movido por
+gemini_organizer la serie se marca y un hilo en segundo plano reescribe cada
+MANIFEST_FLUSH_SECONDS solo sus fragmentos y el índice. Al arrancar se
+comparan los mtime de las carpetas con los del índice para recoger cambios
+hechos por otras herramientas (unificar_carpetas.py, consistencia.py...).
+
+Uso:
+    python manifiesto.py              # poner al día las series cambiadas
+    python manifiesto.py --completo   # reconstruir el manifiesto entero
+"""
+import argparse
+import atexit
+import contextlib
+import fcntl
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import zlib
+from typing import Dict, Iterable, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import agrupacion
+import biblioteca
+import config
+import gemini_organizer
+
+try:
+    import brotli
+except ImportError:  # Opcional: sin él solo se generan las variantes gzip
+    brotli = None
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+INDICE = 'indice.json'
+
+# Nombres de archivo que genera organizar_manga: 'Título - Cap. 86.pdf'
+PATRON_ARCHIVO = re.compile(r'^(?P<titulo>.+?) - Cap\. (?P<capitulo>.+)\.pdf$', re.IGNORECASE)
+
+# Archivos del manifiesto que se pueden servir
+PATRON_SERVIBLE = re.compile(r'^(?:indice|series-\d+)\.json$')
+
+# Codificaciones precomprimidas, por orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+_pendientes = set()
+_lock_pendientes = threading.Lock()
+_hilo: Optional[threading.Thread] = None
+_parar = threading.Event()
+
+
+def fragmento_de(serie: str) -> str:
+    """Archivo de fragmento en el que va una serie (estable entre ejecuciones)"""
+    numero = zlib.crc32(serie.encode('utf-8')) % max(1, config.MANIFEST_SHARDS)
+    return f"series-{numero:02d}.json"
+
+
+def capitulo_de(archivo: str) -> Dict:
+    """
+    Interpreta el capítulo de un archivo de la biblioteca
+
+    Returns:
+        {'titulo', 'capitulo': '86' / '1-81' / 'ONE_SHOT' / None, 'inicio', 'fin'}
+        (inicio y fin son enteros, o None si el capítulo no es un número o rango)
+    """
+    match = PATRON_ARCHIVO.match(archivo)
+    if match:
+        titulo, capitulo = match.group('titulo'), match.group('capitulo').strip()
+    else:
+        partes = agrupacion.extraer(archivo)
+        titulo = partes['titulo'] if partes else os.path.splitext(archivo)[0]
+        capitulo = partes['capitulo'] if partes else None
+
+    rango = agrupacion.PATRON_RANGO.match(capitulo or '')
+    inicio = fin = None
+    if rango:
+        inicio = int(rango.group(1))
+        fin = int(rango.group(2)) if rango.group(2) is not None else inicio
+    return {'titulo': titulo, 'capitulo': capitulo, 'inicio': inicio, 'fin': fin}
+
+
+def entrada_serie(serie: str, escaneo: Dict) -> Dict:
+    """Entrada de fragmento de una serie a partir de biblioteca.escanear_serie()"""
+    capitulos = []
+    for archivo, tamano in escaneo['archivos'].items():
+        if archivo.startswith('.') or not archivo.lower().endswith('.pdf'):
+            continue
+        capitulos.append({'archivo': archivo, 'tamano': tamano, **capitulo_de(archivo)})
+    # Capítulos numerados en orden y después los especiales (ONE_SHOT, extras...)
+    capitulos.sort(key=lambda c: (c['inicio'] is None, c['inicio'] or 0, c['fin'] or 0, c['archivo']))
+
+    portada = capitulos[0] if capitulos else None
+    return {
+        'nombre': serie,
+        'mtime_ns': escaneo['mtime_ns'],
+        'tamano': sum(c['tamano'] for c in capitulos),
+        'capitulos': capitulos,
+        'portada_archivo': portada['archivo'] if portada else None,
+        # Cambia cuando cambia el archivo de portada: el lector puede cachear la miniatura con ella
+        'portada': hashlib.sha1(
+            f"{serie}/{portada['archivo']}:{portada['tamano']}".encode('utf-8')
+        ).hexdigest()[:16] if portada else None,
+    }
+
+
+def resumen_serie(entrada: Dict) -> Dict:
+    """Datos de una serie que van en el índice"""
+    return {
+        'fragmento': fragmento_de(entrada['nombre']),
+        'mtime_ns': entrada['mtime_ns'],
+        'capitulos': len(entrada['capitulos']),
+        'tamano': entrada['tamano'],
+        'portada': entrada['portada'],
+        'portada_archivo': entrada['portada_archivo'],
+    }
+
+
+def _ruta(nombre: str) -> str:
+    return os.path.join(config.MANIFEST_DIR, nombre)
+
+
+def _escribir_atomico(ruta: str, datos: bytes):
+    temporal = f"{ruta}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+
+def _escribir(nombre: str, datos: Dict) -> str:
+    """
+    Escribe un archivo del manifiesto con sus variantes comprimidas
+
+    Las variantes se escriben antes que el JSON plano, así que quien vea el
+    archivo nuevo ya tiene también sus versiones comprimidas.
+
+    Returns:
+        Hash del contenido (para que el lector sepa si tiene que volver a pedirlo)
+    """
+    cuerpo = json.dumps(datos, ensure_ascii=False, separators=(',', ':'), sort_keys=True).encode('utf-8')
+    ruta = _ruta(nombre)
+    # mtime=0: el mismo contenido produce siempre el mismo .gz
+    _escribir_atomico(f"{ruta}.gz", gzip.compress(cuerpo, compresslevel=9, mtime=0))
+    if brotli is not None:
+        _escribir_atomico(f"{ruta}.br", brotli.compress(cuerpo))
+    _escribir_atomico(ruta, cuerpo)
+    return hashlib.sha1(cuerpo).hexdigest()[:20]
+
+
+def _leer(nombre: str) -> Optional[Dict]:
+    try:
+        with open(_ruta(nombre), encoding='utf-8') as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+@contextlib.contextmanager
+def _bloqueo():
+    """Exclusión entre procesos (servidor, lote, workers) que actualizan el mismo manifiesto"""
+    os.makedirs(config.MANIFEST_DIR, exist_ok=True)
+    with open(_ruta('.bloqueo'), 'a') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _totales(indice: Dict):
+    indice['generado'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+    indice['total_series'] = len(indice['series'])
+    indice['total_capitulos'] = sum(s['capitulos'] for s in indice['series'].values())
+    indice['tamano'] = sum(s['tamano'] for s in indice['series'].values())
+
+
+def _construir(base: str) -> Dict:
+    escaneos = biblioteca.escanear_biblioteca(base)
+    # Todos los fragmentos, aunque queden vacíos: el lector puede pedir cualquiera del índice
+    fragmentos = {f"series-{n:02d}.json": {} for n in range(max(1, config.MANIFEST_SHARDS))}
+    indice = {'version': VERSION, 'base': base, 'fragmentos': len(fragmentos), 'hashes': {}, 'series': {}}
+    for serie, escaneo in escaneos.items():
+        entrada = entrada_serie(serie, escaneo)
+        fragmentos[fragmento_de(serie)][serie] = entrada
+        indice['series'][serie] = resumen_serie(entrada)
+
+    for nombre, series in fragmentos.items():
+        indice['hashes'][nombre] = _escribir(nombre, {'version': VERSION, 'series': series})
+    # Fragmentos de una configuración anterior con más MANIFEST_SHARDS
+    for archivo in os.listdir(config.MANIFEST_DIR):
+        if archivo.startswith('series-') and archivo.split('.', 1)[0] + '.json' not in fragmentos:
+            os.remove(_ruta(archivo))
+
+    _totales(indice)
+    _escribir(INDICE, indice)
+    log.info(f"🗂️  Manifiesto generado: {indice['total_series']} series, {indice['total_capitulos']} capítulos")
+    return indice
+
+
+def _aplicar(indice: Dict, escaneos: Dict[str, Optional[Dict]]):
+    """Reescribe los fragmentos de las series cambiadas (escaneo None = serie eliminada) y el índice"""
+    por_fragmento = {}
+    for serie, escaneo in escaneos.items():
+        por_fragmento.setdefault(fragmento_de(serie), {})[serie] = escaneo
+
+    for nombre, cambios in por_fragmento.items():
+        fragmento = _leer(nombre) or {'version': VERSION, 'series': {}}
+        for serie, escaneo in cambios.items():
+            if escaneo is None:
+                fragmento['series'].pop(serie, None)
+                indice['series'].pop(serie, None)
+            else:
+                entrada = entrada_serie(serie, escaneo)
+                fragmento['series'][serie] = entrada
+                indice['series'][serie] = resumen_serie(entrada)
+        indice['hashes'][nombre] = _escribir(nombre, fragmento)
+
+    _totales(indice)
+    _escribir(INDICE, indice)
+
+
+def _indice_vigente(base: str) -> Optional[Dict]:
+    """Índice actual, o None si no existe o es de otra biblioteca o configuración"""
+    indice = _leer(INDICE)
+    if (indice is None or indice.get('version') != VERSION or indice.get('base') != base
+            or indice.get('fragmentos') != max(1, config.MANIFEST_SHARDS)):
+        return None
+    return indice
+
+
+def construir(base: Optional[str] = None) -> Dict:
+    """Genera el manifiesto completo de la biblioteca `base` (por defecto MANGA_DESTINATION)"""
+    base = base or config.MANGA_DESTINATION
+    with _bloqueo():
+        return _construir(base)
+
+
+def actualizar(series: Iterable[str], base: Optional[str] = None) -> Dict:
+    """
+    Vuelve a leer solo las carpetas de `series` y reescribe sus fragmentos y el índice
+
+    Returns:
+        Índice del manifiesto
+    """
+    base = base or config.MANGA_DESTINATION
+    with _bloqueo():
+        indice = _indice_vigente(base)
+        if indice is None:
+            return _construir(base)
+        escaneos = {}
+        for serie in set(series):
+            try:
+                escaneos[serie] = biblioteca.escanear_serie(os.path.join(base, serie))
+            except (FileNotFoundError, NotADirectoryError):
+                escaneos[serie] = None
+        if escaneos:
+            _aplicar(indice, escaneos)
+        return indice
+
+
+def sincronizar(base: Optional[str] = None) -> Tuple[Dict, int]:
+    """
+    Pone al día el manifiesto con un stat por serie (ver biblioteca.actualizar_indice)
+
+    Returns:
+        (índice, número de series releídas o eliminadas)
+    """
+    base = base or config.MANGA_DESTINATION
+    with _bloqueo():
+        indice = _indice_vigente(base)
+        if indice is None:
+            indice = _construir(base)
+            return indice, len(indice['series'])
+        previo = {serie: {'mtime_ns': datos['mtime_ns']} for serie, datos in indice['series'].items()}
+        escaneos, cambiadas, eliminadas = biblioteca.actualizar_indice(base, previo)
+        cambios = {serie: escaneos[serie] for serie in cambiadas}
+        cambios.update({serie: None for serie in eliminadas})
+        if cambios:
+            _aplicar(indice, cambios)
+        return indice, len(cambios)
+
+
+def marcar(serie: str):
+    """Anota una serie para reescribirla en la próxima escritura del hilo de fondo"""
+    with _lock_pendientes:
+        _pendientes.add(serie)
+
+
+def _al_mover(resultado: Dict):
+    # Observador de gemini_organizer: marca la carpeta de primer nivel si el archivo
+    # acabó en la biblioteca del manifiesto (un lote puede usar otro --destino)
+    base = os.path.abspath(config.MANGA_DESTINATION)
+    ruta = os.path.abspath(resultado.get('full_path') or '')
+    if ruta.startswith(base + os.sep):
+        marcar(os.path.relpath(ruta, base).split(os.sep)[0])
+
+
+def vaciar():
+    """Escribe ya las series marcadas"""
+    global _pendientes
+    with _lock_pendientes:
+        series, _pendientes = _pendientes, set()
+    if not series:
+        return
+    try:
+        actualizar(series)
+    except Exception:
+        log.exception("❌ Error al actualizar el manifiesto")
+        with _lock_pendientes:
+            _pendientes |= series
+
+
+def _bucle_escritura():
+    while not _parar.wait(config.MANIFEST_FLUSH_SECONDS):
+        vaciar()
+
+
+def iniciar():
+    """
+    Pone al día el manifiesto y empieza a seguir los movimientos de este proceso.
+    Idempotente; no hace nada si MANIFEST_ENABLED es False.
+    """
+    global _hilo
+    if not config.MANIFEST_ENABLED or _hilo is not None:
+        return
+    try:
+        indice, cambios = sincronizar()
+        log.info(f"🗂️  Manifiesto al día: {indice['total_series']} series ({cambios} actualizadas)")
+    except OSError:
+        log.exception("❌ No se pudo sincronizar el manifiesto")
+    gemini_organizer.registrar_observador(_al_mover)
+    _parar.clear()
+    _hilo = threading.Thread(target=_bucle_escritura, name='manifiesto', daemon=True)
+    _hilo.start()
+    atexit.register(detener)
+
+
+def detener():
+    """Detiene el hilo de escritura y escribe lo que quede pendiente"""
+    global _hilo
+    _parar.set()
+    if _hilo is not None:
+        _hilo.join()
+        _hilo = None
+    vaciar()
+
+
+def variante(nombre: str, acepta) -> Optional[Tuple[str, Optional[str]]]:
+    """
+    Elige el archivo a servir para una petición del manifiesto
+
+    Args:
+        nombre: 'indice.json' o 'series-NN.json'
+        acepta: Función que da la calidad (0 = no aceptada) de una codificación de Accept-Encoding
+
+    Returns:
+        (ruta, codificación o None) o None si el archivo no existe
+    """
+    if not PATRON_SERVIBLE.match(nombre):
+        return None
+    ruta = _ruta(nombre)
+    for codificacion, extension in CODIFICACIONES:
+        if acepta(codificacion) and os.path.isfile(ruta + extension):
+            return ruta + extension, codificacion
+    if os.path.isfile(ruta):
+        return ruta, None
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Genera el manifiesto de la biblioteca para el lector')
+    parser.add_argument('--base', default=config.MANGA_DESTINATION, help='Carpeta de la biblioteca')
+    parser.add_argument('--completo', action='store_true', help='Reconstruir todo en vez de solo lo cambiado')
+    args = parser.parse_args()
+
+    inicio = time.time()
+    if args.completo:
+        indice = construir(args.base)
+        cambios = len(indice['series'])
+    else:
+        indice, cambios = sincronizar(args.base)
+    print(f"🗂️  Manifiesto en {config.MANIFEST_DIR}: {indice['total_series']} series, "
+          f"{indice['total_capitulos']} capítulos ({cambios} series escritas) en {time.time() - inicio:.2f}s")
+    if brotli is None:
+        print("ℹ️  Sin el paquete brotli solo se generan las variantes .gz")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+"""
+Métricas de rendimiento del Manga Organizer en formato Prometheus
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Tuple
+
+# Límites (en segundos) de los buckets de los histogramas de latencia
+BUCKETS_LATENCIA = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Descripción y tipo de cada métrica expuesta en /metrics
+DESCRIPCIONES = {
+    'manga_etapa_segundos': ('histogram', 'Duración de cada etapa del procesamiento'),
+    'manga_gemini_solicitudes_total': ('counter', 'Solicitudes enviadas a Gemini por API key'),
+    'manga_gemini_errores_total': ('counter', 'Errores devueltos por Gemini por API key y tipo'),
+    'manga_gemini_429_total': ('counter', 'Respuestas 429 / cuota agotada por API key'),
+    'manga_gemini_reintentos_total': ('counter', 'Reintentos realizados al analizar un archivo'),
+    'manga_analisis_total': ('counter', 'Archivos analizados por resultado'),
+    'manga_archivos_total': ('counter', 'Archivos recibidos por el servidor por resultado'),
+    'manga_cache_consultas_total': ('counter', 'Consultas a cachés por resultado (acierto/fallo)'),
+    'manga_gemini_respaldos_total': ('counter', 'Solicitudes de respaldo (hedging) por resultado'),
+    'manga_agrupacion_total': ('counter', 'Análisis resueltos sin llamada propia a Gemini (serie / coalescido)'),
+    'manga_clave_disponible': ('gauge', 'API key utilizable (1) o en cuarentena (0)'),
+    'manga_sondeos_total': ('counter', 'Sondeos de API keys por resultado'),
+    'manga_concurrencia_limite': ('gauge', 'Solicitudes simultáneas permitidas por API key (control AIMD)'),
+    'manga_admision_en_curso': ('gauge', 'Archivos y bytes de subidas admitidas aún en proceso'),
+    'manga_admision_rechazos_total': ('counter', 'Subidas rechazadas por el control de admisión por motivo'),
+}
+
+_lock = threading.Lock()
+# (nombre, etiquetas) -> valor (contadores y gauges)
+_contadores: Dict[Tuple[str, tuple], float] = {}
+# (nombre, etiquetas) -> [conteos por bucket, suma, conteo]
+_histogramas: Dict[Tuple[str, tuple], list] = {}
+
+
+def _clave(nombre: str, etiquetas: dict) -> Tuple[str, tuple]:
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def incrementar(nombre: str, valor: float = 1, **etiquetas):
+    """Suma `valor` al contador `nombre` con las etiquetas dadas"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = _contadores.get(clave, 0) + valor
+
+
+def fijar(nombre: str, valor: float, **etiquetas):
+    """Fija el valor actual del gauge `nombre` con las etiquetas dadas"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _contadores[clave] = valor
+
+
+def observar(nombre: str, segundos: float, **etiquetas):
+    """Registra una duración en el histograma `nombre`"""
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        hist = _histogramas.get(clave)
+        if hist is None:
+            hist = [[0] * len(BUCKETS_LATENCIA), 0.0, 0]
+            _histogramas[clave] = hist
+        for i, limite in enumerate(BUCKETS_LATENCIA):
+            if segundos <= limite:
+                hist[0][i] += 1
+        hist[1] += segundos
+        hist[2] += 1
+
+
+def observar_etapa(etapa: str, segundos: float):
+    """Atajo para registrar la duración de una etapa del pipeline"""
+    observar('manga_etapa_segundos', segundos, etapa=etapa)
+
+
+@contextmanager
+def cronometrar(etapa: str):
+    """Context manager que mide la duración de una etapa del pipeline"""
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        observar_etapa(etapa, time.perf_counter() - inicio)
+
+
+def dormir(etapa: str, segundos: float):
+    """time.sleep() que además contabiliza el tiempo de espera en su etapa"""
+    if segundos <= 0:
+        return
+    with cronometrar(etapa):
+        time.sleep(segundos)
+
+
+def registrar_cache(cache: str, acierto: bool):
+    """Registra un acierto o fallo en la caché indicada"""
+    incrementar('manga_cache_consultas_total', cache=cache,
+                resultado='acierto' if acierto else 'fallo')
+
+
+def reiniciar():
+    """Borra todas las métricas acumuladas"""
+    with _lock:
+        _contadores.clear()
+        _histogramas.clear()
+
+
+def resumen_etapas() -> Dict[str, Dict[str, float]]:
+    """Devuelve {etapa: {'conteo', 'suma'}} con el tiempo acumulado por etapa"""
+    resultado = {}
+    with _lock:
+        for (nombre, etiquetas), (_, suma, conteo) in _histogramas.items():
+            if nombre != 'manga_etapa_segundos':
+                continue
+            etapa = dict(etiquetas).get('etapa', '')
+            resultado[etapa] = {'conteo': conteo, 'suma': suma}
+    return resultado
+
+
+def valor_contador(nombre: str, **etiquetas) -> float:
+    """Suma los contadores `nombre` cuyas etiquetas incluyan las indicadas"""
+    buscadas = {k: str(v) for k, v in etiquetas.items()}
+    with _lock:
+        return sum(
+            valor for (n, etq), valor in _contadores.items()
+            if n == nombre and buscadas.items() <= dict(etq).items()
+        )
+
+
+def _formatear_etiquetas(etiquetas) -> str:
+    if not etiquetas:
+        return ''
+    partes = []
+    for k, v in etiquetas:
+        v = str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        partes.append(f'{k}="{v}"')
+    return '{' + ','.join(partes) + '}'
+
+
+def _formatear_numero(valor: float) -> str:
+    return str(int(valor)) if float(valor).is_integer() else repr(float(valor))
+
+
+def exportar_prometheus() -> str:
+    """Genera el texto de exposición de Prometheus (formato 0.0.4)"""
+    with _lock:
+        contadores = dict(_contadores)
+        histogramas = {k: [list(v[0]), v[1], v[2]] for k, v in _histogramas.items()}
+
+    nombres = sorted({n for n, _ in contadores} | {n for n, _ in histogramas})
+    lineas = []
+    for nombre in nombres:
+        tipo, ayuda = DESCRIPCIONES.get(nombre, ('untyped', nombre))
+        lineas.append(f'# HELP {nombre} {ayuda}')
+        lineas.append(f'# TYPE {nombre} {tipo}')
+
+        for (n, etiquetas), valor in sorted(contadores.items()):
+            if n == nombre:
+                lineas.append(f'{nombre}{_formatear_etiquetas(etiquetas)} {_formatear_numero(valor)}')
+
+        for (n, etiquetas), (buckets, suma, conteo) in sorted(histogramas.items()):
+            if n != nombre:
+                continue
+            for limite, acumulado in zip(BUCKETS_LATENCIA, buckets):
+                etq = etiquetas + (('le', _formatear_numero(limite)),)
+                lineas.append(f'{nombre}_bucket{_formatear_etiquetas(etq)} {acumulado}')
+            etq = etiquetas + (('le', '+Inf'),)
+            lineas.append(f'{nombre}_bucket{_formatear_etiquetas(etq)} {conteo}')
+            lineas.append(f'{nombre}_sum{_formatear_etiquetas(etiquetas)} {_formatear_numero(suma)}')
+            lineas.append(f'{nombre}_count{_formatear_etiquetas(etiquetas)} {conteo}')
+
+    return '\n'.join(lineas) + '\n'
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Servidor local que imita la API REST de Gemini (generateContent) para medir
+el rendimiento del organizador sin gastar cuota ni depender de la red.
+
+Uso:
+    python mock_gemini.py --puerto 8765 --latencia 0.8 --tasa-429 0.05
+    GEMINI_API_ENDPOINT=http://127.0.0.1:8765 python app.py
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Patrón del nombre de archivo dentro del prompt (ver gemini_organizer.PROMPT_TEMPLATE)
+PATRON_ARCHIVO = re.compile(r'Nombre de archivo a analizar:\s*(.+)')
+
+# Título + capítulo o rango al final del nombre ('Purgatorio 86', 'Ghost 1-81 extra')
+PATRON_CAPITULO = re.compile(
+    r'^(?P<titulo>.*?)[\s_\-]*(?:cap(?:[ií]tulo)?\.?\s*)?'
+    r'(?P<capitulo>\d+(?:\s*-\s*\d+)?)?\s*(?P<extra>extra|especial)?\s*$',
+    re.IGNORECASE
+)
+
+
+class OpcionesSimulacion:
+    """Parámetros de comportamiento del servidor simulado"""
+
+    def __init__(self, latencia=0.5, jitter=0.2, tasa_429=0.0, tasa_malformado=0.0,
+                 tasa_lenta=0.0, latencia_lenta=10.0, semilla=None,
+                 claves_invalidas=(), claves_agotadas=()):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tasa_429 = tasa_429
+        self.tasa_malformado = tasa_malformado
+        self.tasa_lenta = tasa_lenta
+        self.latencia_lenta = latencia_lenta
+        self.claves_invalidas = set(claves_invalidas)  # Responden 400 API_KEY_INVALID
+        self.claves_agotadas = set(claves_agotadas)  # Responden siempre 429
+        self.random = random.Random(semilla)
+        self.lock = threading.Lock()
+        self.solicitudes = Counter()  # (api_key, resultado) -> conteo
+
+    def sortear(self):
+        """Decide el resultado y la latencia de una solicitud"""
+        with self.lock:
+            r = self.random.random()
+            latencia = max(0.0, self.random.gauss(self.latencia, self.jitter))
+            if self.random.random() < self.tasa_lenta:
+                latencia += self.latencia_lenta
+        if r < self.tasa_429:
+            return '429', latencia
+        if r < self.tasa_429 + self.tasa_malformado:
+            return 'malformado', latencia
+        return 'ok', latencia
+
+
+def respuesta_simulada(filename: str) -> dict:
+    """Metadatos plausibles para un nombre de archivo, como los daría Gemini"""
+    stem = re.sub(r'\.(pdf|zip|cbz)$', '', filename.strip(), flags=re.IGNORECASE)
+    match = PATRON_CAPITULO.match(stem)
+    titulo = (match.group('titulo') if match else stem).strip(' -_') or stem
+    capitulo = match.group('capitulo') if match else None
+    return {
+        "nombre_carpeta_estandarizado": titulo,
+        "titulo_limpio_archivo": titulo,
+        "capitulo_o_rango": re.sub(r'\s+', '', capitulo) if capitulo else 'ONE_SHOT',
+        "es_secuela_o_extra": bool(match and match.group('extra')),
+    }
+
+
+def crear_manejador(opciones: OpcionesSimulacion):
+    """Crea la clase manejadora HTTP ligada a unas opciones de simulación"""
+
+    class ManejadorGemini(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, format, *args):
+            pass  # Silencioso: el benchmark no debe medir escrituras a la terminal
+
+        def _responder(self, codigo, cuerpo, tipo='application/json'):
+            datos = cuerpo.encode('utf-8')
+            self.send_response(codigo)
+            self.send_header('Content-Type', f'{tipo}; charset=UTF-8')
+            self.send_header('Content-Length', str(len(datos)))
+            self.end_headers()
+            self.wfile.write(datos)
+
+        def do_POST(self):
+            longitud = int(self.headers.get('Content-Length') or 0)
+            cuerpo = self.rfile.read(longitud) if longitud else b''
+            api_key = self.headers.get('x-goog-api-key', '')
+
+            if ':generateContent' not in self.path:
+                self._responder(404, json.dumps({"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}}))
+                return
+
+            try:
+                peticion = json.loads(cuerpo or b'{}')
+                texto = ''.join(
+                    parte.get('text', '')
+                    for contenido in peticion.get('contents', [])
+                    for parte in contenido.get('parts', [])
+                )
+            except (ValueError, AttributeError):
+                texto = ''
+
+            resultado, latencia = opciones.sortear()
+            if api_key in opciones.claves_invalidas:
+                resultado, latencia = 'invalida', 0.0
+            elif api_key in opciones.claves_agotadas:
+                resultado = '429'
+            with opciones.lock:
+                opciones.solicitudes[(api_key, resultado)] += 1
+            time.sleep(latencia)
+
+            if resultado == 'invalida':
+                self._responder(400, json.dumps({"error": {
+                    "code": 400,
+                    "message": "API key not valid. Please pass a valid API key.",
+                    "status": "INVALID_ARGUMENT",
+                    "details": [{"@type": "type.googleapis.com/google.rpc.ErrorInfo", "reason": "API_KEY_INVALID"}],
+                }}))
+                return
+
+            if resultado == '429':
+                self._responder(429, json.dumps({"error": {
+                    "code": 429,
+                    "message": "Resource has been exhausted (e.g. check quota).",
+                    "status": "RESOURCE_EXHAUSTED",
+                }}))
+                return
+
+            match = PATRON_ARCHIVO.search(texto)
+            filename = match.group(1).strip() if match else 'Desconocido.pdf'
+            if resultado == 'malformado':
+                contenido = 'Claro, aquí tienes el análisis: {"nombre_carpeta_estandarizado": '
+            else:
+                contenido = json.dumps(respuesta_simulada(filename), ensure_ascii=False)
+
+            self._responder(200, json.dumps({
+                "candidates": [{
+                    "content": {"parts": [{"text": contenido}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0,
+                }],
+                "usageMetadata": {"promptTokenCount": 1, "candidatesTokenCount": 1, "totalTokenCount": 2},
+            }, ensure_ascii=False))
+
+    return ManejadorGemini
+
+
+def iniciar_servidor(opciones: OpcionesSimulacion, host: str = '127.0.0.1', puerto: int = 0):
+    """
+    Arranca el servidor simulado en un hilo en segundo plano
+
+    Returns:
+        (servidor, endpoint) — endpoint listo para config.GEMINI_API_ENDPOINT
+    """
+    servidor = ThreadingHTTPServer((host, puerto), crear_manejador(opciones))
+    servidor.daemon_threads = True
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    return servidor, f"http://{host}:{servidor.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor simulado de la API de Gemini')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--puerto', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.5, help='Latencia media en segundos')
+    parser.add_argument('--jitter', type=float, default=0.2, help='Desviación estándar de la latencia')
+    parser.add_argument('--tasa-429', type=float, default=0.0, help='Proporción de respuestas 429')
+    parser.add_argument('--tasa-malformado', type=float, default=0.0, help='Proporción de respuestas con JSON inválido')
+    parser.add_argument('--tasa-lenta', type=float, default=0.0, help='Proporción de respuestas muy lentas')
+    parser.add_argument('--latencia-lenta', type=float, default=10.0, help='Segundos extra de una respuesta lenta')
+    parser.add_argument('--semilla', type=int, default=None)
+    parser.add_argument('--claves-invalidas', default='', help='API keys (separadas por comas) que se rechazan como inválidas')
+    parser.add_argument('--claves-agotadas', default='', help='API keys (separadas por comas) siempre sin cuota')
+    args = parser.parse_args()
+
+    opciones = OpcionesSimulacion(
+        latencia=args.latencia, jitter=args.jitter, tasa_429=args.tasa_429,
+        tasa_malformado=args.tasa_malformado, tasa_lenta=args.tasa_lenta,
+        latencia_lenta=args.latencia_lenta, semilla=args.semilla,
+        claves_invalidas=[c for c in args.claves_invalidas.split(',') if c],
+        claves_agotadas=[c for c in args.claves_agotadas.split(',') if c],
+    )
+    servidor = ThreadingHTTPServer((args.host, args.puerto), crear_manejador(opciones))
+    servidor.daemon_threads = True
+    print(f"🤖 Gemini simulado escuchando en http://{args.host}:{args.puerto}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        print("\n🛑 Servidor detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Ingesta de paquetes ZIP/CBZ con PDFs de manga
+
+Los PDFs de un paquete se extraen de uno en uno, sin descomprimir el paquete
+entero en una carpeta temporal, y se entregan al pipeline en cuanto cada uno
+está en disco. De cada entrada solo se usa el nombre base, así que un nombre
+como '../../etc/x.pdf' no puede escribir fuera de la carpeta de destino (zip-slip).
+"""
+import logging
+import os
+import zipfile
+import zlib
+from typing import BinaryIO, Callable, Iterator, List, Optional, Union
+
+import biblioteca
+import config
+
+log = logging.getLogger(__name__)
+
+TAMANO_BLOQUE = 1024 * 1024  # Bytes copiados por lectura al extraer
+
+
+def es_paquete(filename: str) -> bool:
+    """True si el archivo es un paquete ZIP/CBZ (ver config.ARCHIVE_EXTENSIONS)"""
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in config.ARCHIVE_EXTENSIONS
+
+
+def nombre_miembro(nombre: str) -> Optional[str]:
+    """Nombre base de una entrada del paquete; None si no es un PDF (o es oculta, como las de __MACOSX)"""
+    base = nombre.replace('\\', '/').rsplit('/', 1)[-1].replace('\x00', '').strip()
+    if not base or base.startswith('.') or not base.lower().endswith('.pdf'):
+        return None
+    return base
+
+
+def listar_pdfs(paquete: Union[str, BinaryIO]) -> Iterator[str]:
+    """Nombres de los PDFs de un paquete, sin extraerlos"""
+    with zipfile.ZipFile(paquete) as zf:
+        for info in zf.infolist():
+            nombre = None if info.is_dir() else nombre_miembro(info.filename)
+            if nombre:
+                yield nombre
+
+
+def _copiar_miembro(zf: zipfile.ZipFile, info: zipfile.ZipInfo, ruta: str, limite: Optional[int]):
+    """Descomprime una entrada a `ruta` por bloques; el archivo solo aparece cuando está completo"""
+    parcial = f"{ruta}.parcial"
+    escritos = 0
+    try:
+        with zf.open(info) as origen, open(parcial, 'wb') as destino:
+            while True:
+                bloque = origen.read(TAMANO_BLOQUE)
+                if not bloque:
+                    break
+                escritos += len(bloque)
+                # El tamaño declarado en el ZIP puede mentir: se cuenta lo que realmente sale
+                if limite and escritos > limite:
+                    raise ValueError(f"supera {config.ARCHIVE_MAX_MEMBER_MB} MB descomprimido")
+                destino.write(bloque)
+        os.replace(parcial, ruta)
+    except BaseException:
+        try:
+            os.remove(parcial)
+        except FileNotFoundError:
+            pass
+        raise
+
+
+def extraer_pdfs(paquete: Union[str, BinaryIO], carpeta: str,
+                 renombrar: Optional[Callable[[str], str]] = None,
+                 errores: Optional[List[dict]] = None) -> Iterator[str]:
+    """
+    Extrae los PDFs de un paquete a `carpeta` de uno en uno y va devolviendo sus rutas
+
+    Un PDF que ya está en `carpeta` con el mismo nombre y tamaño (de una extracción
+    anterior interrumpida) se devuelve sin volver a escribirlo.
+
+    Args:
+        paquete: Ruta o archivo abierto (con seek) del ZIP/CBZ
+        carpeta: Carpeta donde se escriben los PDFs
+        renombrar: Función opcional aplicada a cada nombre (p. ej. secure_filename)
+        errores: Lista donde añadir las entradas que no se pudieron extraer
+
+    Raises:
+        zipfile.BadZipFile: Si el paquete no es un ZIP válido
+    """
+    limite = config.ARCHIVE_MAX_MEMBER_MB * 1024 * 1024 if config.ARCHIVE_MAX_MEMBER_MB else None
+
+    def omitir(info, motivo):
+        log.warning(f"⚠️  Entrada omitida '{info.filename}': {motivo}")
+        if errores is not None:
+            errores.append({'success': False, 'original_name': info.filename, 'error': motivo})
+
+    with zipfile.ZipFile(paquete) as zf:
+        os.makedirs(carpeta, exist_ok=True)
+        raiz = os.path.realpath(carpeta)
+        ocupados = set(os.listdir(carpeta))
+        previos = set(ocupados)  # Lo que ya había de una extracción anterior
+        for info in zf.infolist():
+            nombre = None if info.is_dir() else nombre_miembro(info.filename)
+            if nombre and renombrar:
+                nombre = renombrar(nombre)
+            if not nombre or not nombre.lower().endswith('.pdf'):
+                log.debug("Entrada ignorada (no es un PDF): %s", info.filename)
+                continue
+            if info.flag_bits & 0x1:
+                omitir(info, 'PDF cifrado dentro del paquete')
+                continue
+            if limite and info.file_size > limite:
+                omitir(info, f"supera {config.ARCHIVE_MAX_MEMBER_MB} MB descomprimido")
+                continue
+
+            ruta = os.path.join(carpeta, nombre)
+            if nombre in previos and os.path.isfile(ruta) and os.path.getsize(ruta) == info.file_size:
+                previos.discard(nombre)
+                yield ruta
+                continue
+            nombre = biblioteca.resolver_colision(nombre, ocupados)
+            ruta = os.path.join(carpeta, nombre)
+            if os.path.dirname(os.path.realpath(ruta)) != raiz:
+                omitir(info, 'ruta fuera de la carpeta de extracción')
+                continue
+
+            try:
+                _copiar_miembro(zf, info, ruta, limite)
+            except (zipfile.BadZipFile, zlib.error, NotImplementedError, ValueError) as e:
+                omitir(info, f"no se pudo extraer ({e})")
+                continue
+            yield ruta
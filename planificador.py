@@ -0,0 +1,232 @@
+"""
+Planificador de turnos sobre las API keys de Gemini con clases de prioridad
+
+Cada API key admite un número limitado de solicitudes simultáneas (sus "turnos").
+Cuando hay más demanda que turnos libres, las clases de prioridad se reparten la
+capacidad de forma ponderada (stride scheduling): con pesos 8/3/1, por cada turno
+de mantenimiento se conceden tres de lote y ocho interactivos.
+
+Además, una parte de las keys queda reservada para las subidas interactivas. La
+reserva se calcula sobre config.GOOGLE_API_KEYS, de modo que todos los procesos
+(servidor web, scripts de lote, workers) coinciden en qué keys son reservadas y
+un lote en otro proceso no puede consumirlas.
+"""
+import itertools
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional
+
+import config
+import metricas
+
+# Clases de prioridad
+INTERACTIVA = 'interactiva'
+LOTE = 'lote'
+MANTENIMIENTO = 'mantenimiento'
+PRIORIDADES = (INTERACTIVA, LOTE, MANTENIMIENTO)
+
+
+def claves_reservadas() -> List[str]:
+    """Keys reservadas a la clase interactiva: las últimas de GOOGLE_API_KEYS"""
+    claves = config.GOOGLE_API_KEYS
+    if len(claves) < 2:
+        return []
+    n = min(len(claves) - 1, math.ceil(len(claves) * config.INTERACTIVE_RESERVED_SHARE))
+    return claves[len(claves) - n:] if n > 0 else []
+
+
+class _Solicitud:
+    __slots__ = ('prioridad', 'evitar', 'clave')
+
+    def __init__(self, prioridad: str, evitar: Iterable[str]):
+        self.prioridad = prioridad
+        self.evitar = set(evitar)
+        self.clave = None
+
+
+class Planificador:
+    """Reparte turnos de API keys entre clases de prioridad con reparto justo ponderado"""
+
+    def __init__(self, claves: Callable[[], List[str]],
+                 capacidad: Optional[Callable[[str], int]] = None,
+                 pesos: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            claves: Función que devuelve las API keys utilizables por este proceso
+            capacidad: Función key -> turnos simultáneos (por defecto CONCURRENCY_PER_KEY)
+            pesos: Peso de cada clase de prioridad (por defecto SCHEDULER_WEIGHTS)
+        """
+        self._claves = claves
+        self._capacidad = capacidad or (lambda clave: config.CONCURRENCY_PER_KEY)
+        self._pesos = pesos
+        self._cond = threading.Condition()
+        self._en_uso: Dict[str, int] = {}
+        self._colas = {p: deque() for p in PRIORIDADES}
+        self._pase = {p: 0.0 for p in PRIORIDADES}
+        self._rotacion = itertools.count()
+        self._cuarentena: Dict[str, float] = {}  # key -> instante (monotonic) en que sale
+
+    def _peso(self, prioridad: str) -> float:
+        pesos = self._pesos or config.SCHEDULER_WEIGHTS
+        return max(float(pesos.get(prioridad, 1)), 0.001)
+
+    def _disponible(self, clave: str) -> bool:
+        hasta = self._cuarentena.get(clave)
+        if hasta is None:
+            return True
+        if hasta <= time.monotonic():
+            del self._cuarentena[clave]
+            return True
+        return False
+
+    def _elegibles(self, prioridad: str) -> List[str]:
+        """Keys que puede usar una clase (sin las que están en cuarentena); la interactiva prefiere las reservadas"""
+        activas = [c for c in self._claves() if self._disponible(c)]
+        reservadas = [c for c in claves_reservadas() if c in activas]
+        if prioridad == INTERACTIVA:
+            return reservadas + [c for c in activas if c not in reservadas]
+        compartidas = [c for c in activas if c not in reservadas]
+        # Si este proceso solo tiene keys reservadas, las usa antes que bloquearse para siempre
+        return compartidas or activas
+
+    def _clave_libre(self, solicitud: _Solicitud) -> Optional[str]:
+        elegibles = [c for c in self._elegibles(solicitud.prioridad)
+                     if self._en_uso.get(c, 0) < self._capacidad(c)]
+        if not elegibles:
+            return None
+        preferidas = [c for c in elegibles if c not in solicitud.evitar] or elegibles
+        if solicitud.prioridad == INTERACTIVA:
+            reservadas = set(claves_reservadas())
+            libres_reservadas = [c for c in preferidas if c in reservadas]
+            preferidas = libres_reservadas or preferidas
+        # La menos ocupada; en empate, rotación para repartir el uso entre keys
+        desplazamiento = next(self._rotacion) % len(preferidas)
+        rotadas = preferidas[desplazamiento:] + preferidas[:desplazamiento]
+        return min(rotadas, key=lambda c: self._en_uso.get(c, 0))
+
+    def _despachar(self):
+        """Asigna turnos libres a las solicitudes en espera, por orden de pase (llamar con el lock)"""
+        asignadas = False
+        while True:
+            candidatas = []
+            for prioridad, cola in self._colas.items():
+                if cola:
+                    clave = self._clave_libre(cola[0])
+                    if clave is not None:
+                        candidatas.append((self._pase[prioridad], PRIORIDADES.index(prioridad), prioridad, clave))
+            if not candidatas:
+                break
+            _, _, prioridad, clave = min(candidatas)
+            solicitud = self._colas[prioridad].popleft()
+            solicitud.clave = clave
+            self._en_uso[clave] = self._en_uso.get(clave, 0) + 1
+            self._pase[prioridad] += 1.0 / self._peso(prioridad)
+            asignadas = True
+        if asignadas:
+            self._cond.notify_all()
+
+    def adquirir(self, prioridad: str = LOTE, evitar: Iterable[str] = ()) -> str:
+        """Espera un turno libre y devuelve la API key asignada"""
+        if prioridad not in PRIORIDADES:
+            raise ValueError(f"Prioridad desconocida: {prioridad}")
+        if not self._claves():
+            raise ValueError("No hay API keys configuradas")
+
+        inicio = time.perf_counter()
+        solicitud = _Solicitud(prioridad, evitar)
+        with self._cond:
+            if not self._elegibles(prioridad):
+                raise ValueError("Todas las API keys están en cuarentena")
+            if not self._colas[prioridad]:
+                # Una clase que estaba inactiva no acumula crédito: parte del pase mínimo actual
+                activos = [self._pase[p] for p, cola in self._colas.items() if cola]
+                if activos:
+                    self._pase[prioridad] = max(self._pase[prioridad], min(activos))
+            self._colas[prioridad].append(solicitud)
+            self._despachar()
+            while solicitud.clave is None:
+                # La capacidad puede cambiar sin que nadie libere un turno
+                # (p. ej. termina la pausa de una key tras un 429): revisar periódicamente
+                if not self._cond.wait(timeout=0.5):
+                    self._despachar()
+                    if solicitud.clave is None and not self._elegibles(prioridad):
+                        # Mientras esperaba, todas las keys pasaron a cuarentena: no esperar a ciegas
+                        self._colas[prioridad].remove(solicitud)
+                        raise ValueError("Todas las API keys están en cuarentena")
+        metricas.observar_etapa(f'cola_turno_{prioridad}', time.perf_counter() - inicio)
+        return solicitud.clave
+
+    def intentar_adquirir(self, prioridad: str = LOTE, evitar: Iterable[str] = ()) -> Optional[str]:
+        """
+        Toma un turno sin esperar, solo si sobra capacidad (nadie en espera)
+
+        Para trabajo opcional como las solicitudes de respaldo: nunca adelanta a
+        una solicitud encolada. Las keys de `evitar` quedan excluidas.
+
+        Returns:
+            La API key asignada o None si no hay ninguna libre
+        """
+        evitar = set(evitar)
+        with self._cond:
+            if any(self._colas.values()):
+                return None
+            libres = [c for c in self._elegibles(prioridad)
+                      if c not in evitar and self._en_uso.get(c, 0) < self._capacidad(c)]
+            if not libres:
+                return None
+            clave = min(libres, key=lambda c: self._en_uso.get(c, 0))
+            self._en_uso[clave] = self._en_uso.get(clave, 0) + 1
+            return clave
+
+    def ocupar(self, clave: str):
+        """Cuenta un turno en uso sin pasar por la cola (una llamada que sigue en vuelo)"""
+        with self._cond:
+            self._en_uso[clave] = self._en_uso.get(clave, 0) + 1
+
+    def liberar(self, clave: str):
+        """Devuelve el turno de una key"""
+        with self._cond:
+            self._en_uso[clave] = max(0, self._en_uso.get(clave, 0) - 1)
+            self._despachar()
+
+    def reevaluar(self):
+        """Reintenta asignar turnos tras un cambio de capacidad o de keys"""
+        with self._cond:
+            self._despachar()
+
+    @contextmanager
+    def turno(self, prioridad: str = LOTE, evitar: Iterable[str] = ()):
+        """Context manager: adquiere un turno, entrega la API key y lo libera al salir"""
+        clave = self.adquirir(prioridad, evitar)
+        try:
+            yield clave
+        finally:
+            self.liberar(clave)
+
+    def poner_en_cuarentena(self, clave: str, segundos: float):
+        """Deja de asignar turnos a una key durante `segundos`"""
+        with self._cond:
+            self._cuarentena[clave] = time.monotonic() + segundos
+
+    def levantar_cuarentena(self, clave: str):
+        """Vuelve a usar una key en cuarentena"""
+        with self._cond:
+            self._cuarentena.pop(clave, None)
+            self._despachar()
+
+    def en_cuarentena(self) -> Dict[str, float]:
+        """{key: segundos de cuarentena restantes}"""
+        ahora = time.monotonic()
+        with self._cond:
+            return {c: hasta - ahora for c, hasta in self._cuarentena.items() if hasta > ahora}
+
+    def estado(self) -> Dict:
+        """Turnos en uso por key y solicitudes en espera por clase"""
+        with self._cond:
+            return {
+                'en_uso': dict(self._en_uso),
+                'en_espera': {p: len(cola) for p, cola in self._colas.items()},
+            }
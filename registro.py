@@ -0,0 +1,172 @@
+"""
+Sistema de logs del Manga Organizer
+
+- Niveles estándar de `logging` (LOG_LEVEL en config.py)
+- Archivo en líneas JSON con IDs de correlación de trabajo y archivo
+- Escritura asíncrona: los hilos solo encolan el registro; un hilo aparte
+  escribe en la terminal y en disco con rotación por tamaño
+"""
+import atexit
+import contextvars
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+
+import config
+
+# IDs de correlación del trabajo (subida, lote...) y del archivo en curso
+_trabajo = contextvars.ContextVar('trabajo', default=None)
+_archivo = contextvars.ContextVar('archivo', default=None)
+
+# Atributos estándar de LogRecord que no se copian como campos extra
+_ATRIBUTOS_ESTANDAR = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'prefijo', 'trabajo', 'archivo'}
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+def nuevo_id() -> str:
+    """Genera un ID corto para correlacionar las líneas de un trabajo"""
+    return uuid.uuid4().hex[:12]
+
+
+def trabajo_actual() -> Optional[str]:
+    """ID del trabajo asociado al contexto actual"""
+    return _trabajo.get()
+
+
+@contextmanager
+def contexto(trabajo: Optional[str] = None, archivo: Optional[str] = None):
+    """
+    Asocia un trabajo y/o archivo a todas las líneas de log emitidas dentro del bloque
+
+    Los hilos de un ThreadPoolExecutor no heredan el contexto: usa
+    contextvars.copy_context().run(...) al enviar la tarea para conservarlo.
+    """
+    tokens = []
+    if trabajo is not None:
+        tokens.append((_trabajo, _trabajo.set(trabajo)))
+    if archivo is not None:
+        tokens.append((_archivo, _archivo.set(archivo)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class FiltroContexto(logging.Filter):
+    """Añade los IDs de correlación al registro en el hilo que lo emite"""
+
+    def filter(self, record):
+        if not hasattr(record, 'trabajo'):
+            record.trabajo = _trabajo.get()
+        if not hasattr(record, 'archivo'):
+            record.archivo = _archivo.get()
+        return True
+
+
+class FormatoJSON(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record):
+        datos = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'nivel': record.levelname,
+            'logger': record.name,
+            'mensaje': record.getMessage(),
+        }
+        for campo in ('trabajo', 'archivo'):
+            valor = getattr(record, campo, None)
+            if valor is not None:
+                datos[campo] = valor
+        for campo, valor in vars(record).items():
+            if campo not in _ATRIBUTOS_ESTANDAR and campo not in datos and not campo.startswith('_'):
+                datos[campo] = valor
+        if record.exc_info:
+            datos['excepcion'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            datos['excepcion'] = record.exc_text
+        return json.dumps(datos, ensure_ascii=False, default=str)
+
+
+class FormatoConsola(logging.Formatter):
+    """Formato legible para la terminal, con el ID de trabajo si existe"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(prefijo)s%(message)s', '%H:%M:%S')
+
+    def format(self, record):
+        trabajo = getattr(record, 'trabajo', None)
+        record.prefijo = f'[{trabajo}] ' if trabajo else ''
+        return super().format(record)
+
+
+class _ManejadorCola(logging.handlers.QueueHandler):
+    """QueueHandler que serializa la traza de la excepción antes de encolar el registro"""
+
+    def prepare(self, record):
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        if record.exc_info and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+def configurar(nivel: Optional[str] = None, archivo: Optional[str] = None, consola: Optional[bool] = None):
+    """
+    Configura el logger raíz (solo la primera vez que se llama)
+
+    Args:
+        nivel: Nivel mínimo (por defecto config.LOG_LEVEL)
+        archivo: Archivo JSON de log (por defecto config.LOG_FILE; '' = sin archivo)
+        consola: Si se escriben también los logs en la terminal (config.LOG_CONSOLE)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    nivel = (nivel or config.LOG_LEVEL).upper()
+    archivo = config.LOG_FILE if archivo is None else archivo
+    consola = config.LOG_CONSOLE if consola is None else consola
+
+    destinos = []
+    if consola:
+        terminal = logging.StreamHandler(sys.stdout)
+        terminal.setFormatter(FormatoConsola())
+        destinos.append(terminal)
+    if archivo:
+        os.makedirs(os.path.dirname(archivo) or '.', exist_ok=True)
+        # Varios procesos (servidor, lote.py, workers) escriben en el mismo archivo:
+        # ninguno lo rota (logrotate, ver README) y cada uno lo reabre si lo movieron
+        fichero = logging.handlers.WatchedFileHandler(archivo, encoding='utf-8')
+        fichero.setFormatter(FormatoJSON())
+        destinos.append(fichero)
+
+    cola = queue.SimpleQueue()
+    manejador = _ManejadorCola(cola)
+    manejador.addFilter(FiltroContexto())
+
+    raiz = logging.getLogger()
+    raiz.setLevel(nivel)
+    raiz.addHandler(manejador)
+
+    _listener = logging.handlers.QueueListener(cola, *destinos, respect_handler_level=True)
+    _listener.start()
+    atexit.register(detener)
+
+
+def detener():
+    """Vacía la cola de logs y detiene el hilo escritor"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
@@ -0,0 +1,94 @@
+"""
+Solicitudes de respaldo (hedging) para recortar la cola de latencia de Gemini
+
+Si una llamada tarda más que el percentil HEDGING_PERCENTILE de las últimas
+latencias de su modelo, gemini_organizer lanza un duplicado en otra API key
+libre y se queda con la primera respuesta. El presupuesto limita cuántos
+duplicados se permiten: cada solicitud principal aporta HEDGING_BUDGET de
+crédito (0.05 = como mucho un 5% de solicitudes extra) hasta HEDGING_BURST.
+"""
+import math
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+import config
+
+
+class VentanaLatencias:
+    """Últimas latencias correctas de un modelo, para estimar sus percentiles"""
+
+    def __init__(self, tamano: int):
+        self._muestras = deque(maxlen=tamano)
+        self._lock = threading.Lock()
+
+    def registrar(self, segundos: float):
+        with self._lock:
+            self._muestras.append(segundos)
+
+    def percentil(self, p: float) -> Optional[float]:
+        """Percentil p (0-100) de la ventana; None si aún no hay suficientes muestras"""
+        with self._lock:
+            if len(self._muestras) < config.HEDGING_MIN_SAMPLES:
+                return None
+            ordenadas = sorted(self._muestras)
+        indice = max(0, min(len(ordenadas) - 1, math.ceil(p / 100 * len(ordenadas)) - 1))
+        return ordenadas[indice]
+
+
+class Presupuesto:
+    """Crédito de solicitudes de respaldo (token bucket alimentado por las principales)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._credito = 0.0
+
+    def contar_principal(self):
+        with self._lock:
+            self._credito = min(float(config.HEDGING_BURST), self._credito + config.HEDGING_BUDGET)
+
+    def consumir(self) -> bool:
+        """Gasta el crédito de un respaldo; False si no alcanza"""
+        with self._lock:
+            if self._credito < 1.0:
+                return False
+            self._credito -= 1.0
+            return True
+
+    def reiniciar(self):
+        with self._lock:
+            self._credito = 0.0
+
+
+_lock = threading.Lock()
+_ventanas: Dict[str, VentanaLatencias] = {}
+presupuesto = Presupuesto()
+
+
+def _ventana(modelo: str) -> VentanaLatencias:
+    with _lock:
+        ventana = _ventanas.get(modelo)
+        if ventana is None:
+            ventana = VentanaLatencias(config.HEDGING_WINDOW)
+            _ventanas[modelo] = ventana
+        return ventana
+
+
+def registrar_latencia(modelo: str, segundos: float):
+    """Añade la latencia de una llamada correcta a la ventana del modelo"""
+    _ventana(modelo).registrar(segundos)
+
+
+def umbral(modelo: str) -> Optional[float]:
+    """Segundos tras los que se lanza un respaldo; None si aún no hay datos suficientes"""
+    p = _ventana(modelo).percentil(config.HEDGING_PERCENTILE)
+    if p is None:
+        return None
+    return max(p, config.HEDGING_MIN_DELAY)
+
+
+def reiniciar():
+    """Olvida las latencias observadas y el crédito acumulado"""
+    with _lock:
+        _ventanas.clear()
+    presupuesto.reiniciar()
@@ -0,0 +1,131 @@
+"""
+Sondeo de salud de las API keys de Gemini
+
+Prueba las keys en paralelo con una solicitud mínima al modelo de producción
+(config.GEMINI_MODEL). Las que responden con un error de key inválida o de cuota
+agotada se ponen en cuarentena en el planificador antes de que les llegue
+tráfico, y un hilo en segundo plano las vuelve a probar periódicamente para
+devolverlas al reparto en cuanto se recuperan.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import config
+import gemini_organizer
+import metricas
+
+log = logging.getLogger(__name__)
+
+# Resultado de un sondeo
+OK = 'ok'
+AGOTADA = 'agotada'
+INVALIDA = 'invalida'
+ERROR = 'error'  # Fallo transitorio (red, 5xx...): la key no se retira
+
+PROMPT_SONDEO = "Responde solo: OK"
+
+_hilo: Optional[threading.Thread] = None
+_parar = threading.Event()
+
+
+def sondear_clave(api_key: str) -> Dict:
+    """
+    Prueba una API key con una solicitud de un solo token
+
+    Returns:
+        {'clave': número de key, 'estado': OK | AGOTADA | INVALIDA | ERROR,
+         'segundos': duración, 'error': mensaje o None}
+    """
+    inicio = time.perf_counter()
+    estado, error = OK, None
+    try:
+        model = gemini_organizer.obtener_modelo(api_key)
+        model.generate_content(
+            PROMPT_SONDEO,
+            generation_config={'max_output_tokens': 1},
+            request_options={'timeout': config.KEY_PROBE_TIMEOUT},
+        )
+    except Exception as e:
+        error = str(e)
+        if gemini_organizer.es_clave_invalida(e):
+            estado = INVALIDA
+        elif gemini_organizer.es_limite_tasa(error):
+            estado = AGOTADA
+        else:
+            estado = ERROR
+    numero = gemini_organizer.numero_clave(api_key)
+    metricas.incrementar('manga_sondeos_total', clave=numero, resultado=estado)
+    return {'clave': numero, 'estado': estado, 'segundos': time.perf_counter() - inicio, 'error': error}
+
+
+def aplicar_resultado(api_key: str, resultado: Dict):
+    """Pone en cuarentena o libera una key según su sondeo"""
+    if resultado['estado'] == AGOTADA:
+        gemini_organizer.poner_en_cuarentena(api_key, config.KEY_QUARANTINE_EXHAUSTED, 'sin cuota')
+    elif resultado['estado'] == INVALIDA:
+        gemini_organizer.poner_en_cuarentena(api_key, config.KEY_QUARANTINE_INVALID, 'key inválida')
+    elif resultado['estado'] == OK:
+        gemini_organizer.levantar_cuarentena(api_key)
+
+
+def sondear_todas(claves: Optional[List[str]] = None, aplicar: bool = True) -> List[Dict]:
+    """
+    Sondea varias API keys a la vez (por defecto las activas de este proceso)
+
+    Args:
+        claves: Keys a probar
+        aplicar: Si True, actualiza la cuarentena del planificador con los resultados
+    """
+    claves = list(claves if claves is not None else gemini_organizer.claves_activas())
+    if not claves:
+        return []
+    with ThreadPoolExecutor(max_workers=min(32, len(claves))) as executor:
+        resultados = list(executor.map(sondear_clave, claves))
+    if aplicar:
+        for api_key, resultado in zip(claves, resultados):
+            aplicar_resultado(api_key, resultado)
+    return resultados
+
+
+def _bucle_resondeo():
+    while not _parar.wait(config.KEY_PROBE_INTERVAL):
+        en_cuarentena = list(gemini_organizer.claves_en_cuarentena())
+        if not en_cuarentena:
+            continue
+        try:
+            for resultado in sondear_todas(en_cuarentena):
+                if resultado['estado'] == OK:
+                    log.info(f"✅ API key #{resultado['clave']} recuperada")
+        except Exception:
+            log.exception("❌ Error al volver a sondear las API keys")
+
+
+def iniciar():
+    """
+    Sondea las keys de este proceso y arranca el hilo que reprueba las que están
+    en cuarentena. Idempotente; no hace nada si KEY_PROBE_ON_STARTUP es False.
+    """
+    global _hilo
+    if not config.KEY_PROBE_ON_STARTUP or _hilo is not None:
+        return
+    resultados = sondear_todas()
+    disponibles = sum(1 for r in resultados if r['estado'] in (OK, ERROR))
+    log.info(f"🔑 API keys disponibles: {disponibles}/{len(resultados)}")
+    for resultado in resultados:
+        if resultado['estado'] == ERROR:
+            log.warning(f"⚠️  No se pudo sondear la API key #{resultado['clave']}: {resultado['error']}")
+    _parar.clear()
+    _hilo = threading.Thread(target=_bucle_resondeo, name='sondeo-claves', daemon=True)
+    _hilo.start()
+
+
+def detener():
+    """Detiene el hilo de sondeo periódico"""
+    global _hilo
+    _parar.set()
+    if _hilo is not None:
+        _hilo.join()
+        _hilo = None
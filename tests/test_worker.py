@@ -0,0 +1,80 @@
+"""
+Pruebas del worker contra una base de la cola bloqueada por otro proceso
+"""
+import os
+import sqlite3
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cola
+import config
+import worker
+
+
+@pytest.fixture
+def rapido(monkeypatch):
+    """Esperas cortas para que las pruebas no tarden"""
+    monkeypatch.setattr(config, 'QUEUE_POLL_SECONDS', 0.05)
+    monkeypatch.setattr(config, 'QUEUE_DB_RETRY_MAX', 0.2)
+    monkeypatch.setattr(config, 'QUEUE_HEARTBEAT_SECONDS', 0.05)
+
+
+def bloquear(ruta):
+    """Otra conexión con un bloqueo exclusivo, como un worker en mitad de una escritura"""
+    con = sqlite3.connect(ruta, isolation_level=None)
+    con.execute('BEGIN EXCLUSIVE')
+    return con
+
+
+def leer_tarea(ruta, id_tarea):
+    con = sqlite3.connect(ruta)
+    con.row_factory = sqlite3.Row
+    try:
+        return dict(con.execute('SELECT * FROM tareas WHERE id = ?', (id_tarea,)).fetchone())
+    finally:
+        con.close()
+
+
+def test_bucle_sobrevive_a_la_base_bloqueada(tmp_path, rapido):
+    ruta = str(tmp_path / 'cola.db')
+    q = cola.Cola(ruta, timeout=0.01)
+    id_tarea = q.encolar('desconocido', {'ruta': '/no/existe.pdf'})
+
+    bloqueo = bloquear(ruta)
+    parar = threading.Event()
+    hilo = threading.Thread(target=worker.bucle_trabajo, args=(q, 'w1', parar, True), daemon=True)
+    hilo.start()
+    time.sleep(0.5)
+    assert hilo.is_alive(), "El hilo del worker murió con la base bloqueada"
+
+    bloqueo.execute('ROLLBACK')
+    bloqueo.close()
+    hilo.join(timeout=5)
+    assert not hilo.is_alive(), "El worker no retomó la cola al liberarse la base"
+
+    tarea = leer_tarea(ruta, id_tarea)
+    assert tarea['estado'] == cola.FALLIDA
+    assert 'Tipo de tarea desconocido' in tarea['error']
+
+
+def test_latido_sobrevive_a_la_base_bloqueada(tmp_path, rapido):
+    ruta = str(tmp_path / 'cola.db')
+    q = cola.Cola(ruta, timeout=0.01)
+    id_tarea = q.encolar(cola.ANALISIS, {'ruta': '/no/existe.pdf'})
+    tarea = q.reclamar('w1', lease=60)
+
+    bloqueo = bloquear(ruta)
+    with worker.Latido(q, tarea['id'], 'w1') as latido:
+        time.sleep(0.3)
+        assert latido._hilo.is_alive(), "El latido murió con la base bloqueada"
+        bloqueo.execute('ROLLBACK')
+        bloqueo.close()
+        lease_previo = leer_tarea(ruta, id_tarea)['lease_hasta']
+        time.sleep(0.3)
+        assert leer_tarea(ruta, id_tarea)['lease_hasta'] > lease_previo
+    assert not latido.perdido
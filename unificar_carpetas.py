@@ -2,17 +2,27 @@
 """
 Script para unificar carpetas de manga con nombres similares
 Mueve todos los archivos de carpetas duplicadas a una carpeta canónica
+
+Funciona en dos fases: primero calcula un plan a partir del índice de la
+biblioteca (exportable a JSON con --exportar-plan / --dry-run) y luego lo
+aplica en paralelo, dejando un diario para poder deshacerlo (--deshacer).
 """
 
+import argparse
 import os
-import shutil
+import time
 import unicodedata
 import re
 from collections import defaultdict
 
+import biblioteca
+
 # Ruta base donde están las carpetas de mangas
 MANGAS_BASE = '/opt/MangaRead/Mangas'
 
+# Carpeta donde se guardan los diarios para deshacer unificaciones
+DIARIOS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'diarios')
+
 def normalizar_nombre(nombre):
     """
     Normaliza un nombre de carpeta para comparación:
@@ -38,17 +48,14 @@ def normalizar_nombre(nombre):
     
     return nombre
 
-def encontrar_duplicados():
+def encontrar_duplicados(indice):
     """
-    Encuentra carpetas con nombres similares
+    Encuentra carpetas con nombres similares a partir del índice de la biblioteca
     Retorna un diccionario: nombre_normalizado -> [lista de carpetas originales]
     """
-    carpetas = [d for d in os.listdir(MANGAS_BASE) 
-                if os.path.isdir(os.path.join(MANGAS_BASE, d))]
-    
     grupos = defaultdict(list)
     
-    for carpeta in carpetas:
+    for carpeta in sorted(indice):
         normalizado = normalizar_nombre(carpeta)
         grupos[normalizado].append(carpeta)
     
@@ -82,91 +89,141 @@ def elegir_nombre_canonico(nombres):
     
     return max(nombres, key=puntuacion)
 
-def unificar_carpeta(carpetas_duplicadas):
+def planificar_unificacion(base=MANGAS_BASE, indice=None):
     """
-    Unifica varias carpetas en una sola
+    Calcula el plan de unificación sin tocar el disco
+
+    Los duplicados de nombre dentro de la carpeta canónica se resuelven en
+    memoria ('archivo (1).pdf', ...), así que aplicar el plan no necesita
+    comprobar en disco si cada destino existe.
     """
-    # Elegir nombre canónico
-    nombre_canonico = elegir_nombre_canonico(carpetas_duplicadas)
-    ruta_canonica = os.path.join(MANGAS_BASE, nombre_canonico)
-    
-    print(f"\n📁 Unificando en: {nombre_canonico}")
-    
-    # Procesar cada carpeta duplicada
-    for carpeta in carpetas_duplicadas:
-        if carpeta == nombre_canonico:
-            continue
-            
-        ruta_origen = os.path.join(MANGAS_BASE, carpeta)
-        print(f"  ⬅️  Moviendo archivos desde: {carpeta}")
+    if indice is None:
+        indice = biblioteca.escanear_biblioteca(base)
+    
+    plan = biblioteca.nuevo_plan(base, 'unificacion')
+    plan['grupos'] = []
+    
+    for carpetas in encontrar_duplicados(indice).values():
+        nombre_canonico = elegir_nombre_canonico(carpetas)
+        ruta_canonica = os.path.join(base, nombre_canonico)
+        contenido = indice[nombre_canonico]
+        ocupados = set(contenido['archivos']) | set(contenido['subcarpetas'])
+        renombrados = 0
         
-        # Mover todos los archivos
-        archivos = os.listdir(ruta_origen)
-        for archivo in archivos:
-            origen = os.path.join(ruta_origen, archivo)
-            destino = os.path.join(ruta_canonica, archivo)
-            
-            # Si el archivo ya existe en destino, renombrar
-            if os.path.exists(destino):
-                base, ext = os.path.splitext(archivo)
-                contador = 1
-                while os.path.exists(destino):
-                    nuevo_nombre = f"{base} ({contador}){ext}"
-                    destino = os.path.join(ruta_canonica, nuevo_nombre)
-                    contador += 1
-                print(f"    ⚠️  Renombrando duplicado: {archivo} -> {os.path.basename(destino)}")
-            
-            shutil.move(origen, destino)
-            print(f"    ✅ {archivo}")
+        for carpeta in carpetas:
+            if carpeta == nombre_canonico:
+                continue
+            ruta_origen = os.path.join(base, carpeta)
+            entradas = sorted(indice[carpeta]['archivos']) + indice[carpeta]['subcarpetas']
+            for archivo in entradas:
+                destino = biblioteca.resolver_colision(archivo, ocupados)
+                if destino != archivo:
+                    renombrados += 1
+                plan['movimientos'].append({
+                    'origen': os.path.join(ruta_origen, archivo),
+                    'destino': os.path.join(ruta_canonica, destino),
+                })
+            plan['eliminar_carpetas'].append(ruta_origen)
         
-        # Eliminar carpeta vacía
-        os.rmdir(ruta_origen)
-        print(f"  🗑️  Carpeta eliminada: {carpeta}")
+        plan['grupos'].append({
+            'canonico': nombre_canonico,
+            'unificadas': [c for c in carpetas if c != nombre_canonico],
+            'renombrados': renombrados,
+        })
+    
+    return plan
+
+def mostrar_plan(plan):
+    """Muestra un resumen del plan por grupo (no archivo por archivo)"""
+    for i, grupo in enumerate(plan['grupos'], 1):
+        print(f"{i}. '{grupo['canonico']}' (canónico)")
+        for carpeta in grupo['unificadas']:
+            print(f"   └─ '{carpeta}' (se unificará)")
+        if grupo['renombrados']:
+            print(f"   ⚠️  {grupo['renombrados']} archivo(s) se renombrarán por duplicado")
+    print(f"\n📦 {len(plan['movimientos'])} movimientos en {len(plan['grupos'])} grupos")
+
+def ruta_diario():
+    """Ruta del diario de deshacer para una nueva ejecución"""
+    return os.path.join(DIARIOS_DIR, f"unificacion-{time.strftime('%Y%m%d-%H%M%S')}.jsonl")
 
 def main():
+    parser = argparse.ArgumentParser(description='Unifica carpetas de manga con nombres similares')
+    parser.add_argument('--base', default=MANGAS_BASE, help='Carpeta de la biblioteca')
+    parser.add_argument('--dry-run', action='store_true', help='Solo mostrar el plan, sin mover nada')
+    parser.add_argument('--exportar-plan', metavar='RUTA', help='Guardar el plan en JSON y salir')
+    parser.add_argument('--aplicar-plan', metavar='RUTA', help='Aplicar un plan exportado previamente')
+    parser.add_argument('--deshacer', metavar='DIARIO', help='Revertir una unificación a partir de su diario')
+    parser.add_argument('--hilos', type=int, default=16, help='Movimientos en paralelo')
+    parser.add_argument('-s', '--si', action='store_true', help='No pedir confirmación')
+    args = parser.parse_args()
+    
     print("=" * 80)
     print("🔧 UNIFICADOR DE CARPETAS DE MANGA")
     print("=" * 80)
-    print(f"📂 Ruta base: {MANGAS_BASE}\n")
     
-    # Encontrar duplicados
-    duplicados = encontrar_duplicados()
+    if args.deshacer:
+        print(f"↩️  Deshaciendo: {args.deshacer}")
+        resultado = biblioteca.deshacer(args.deshacer, hilos=args.hilos)
+        print(f"✅ {resultado['movidos']} archivos devueltos a su carpeta original")
+        for error in resultado['errores']:
+            print(f"  ❌ {error['origen']}: {error['error']}")
+        return
     
-    if not duplicados:
+    if args.aplicar_plan:
+        plan = biblioteca.cargar_plan(args.aplicar_plan)
+        print(f"📄 Plan: {args.aplicar_plan} (creado {plan['creado']})")
+    else:
+        print(f"📂 Ruta base: {args.base}\n")
+        inicio = time.time()
+        plan = planificar_unificacion(args.base)
+        print(f"🔍 Plan calculado en {time.time() - inicio:.2f}s")
+    
+    if not plan['movimientos'] and not plan['eliminar_carpetas']:
         print("✅ No se encontraron carpetas duplicadas")
         return
     
-    print(f"🔍 Se encontraron {len(duplicados)} grupos de carpetas duplicadas:\n")
-    
-    # Mostrar resumen
-    for i, (normalizado, carpetas) in enumerate(duplicados.items(), 1):
-        canonico = elegir_nombre_canonico(carpetas)
-        print(f"{i}. '{canonico}' (canónico)")
-        for carpeta in carpetas:
-            if carpeta != canonico:
-                print(f"   └─ '{carpeta}' (se unificará)")
+    print(f"🔍 Se encontraron {len(plan['grupos'])} grupos de carpetas duplicadas:\n")
+    mostrar_plan(plan)
     
-    # Confirmar
-    print("\n" + "=" * 80)
-    respuesta = input("¿Deseas unificar estas carpetas? (s/N): ").strip().lower()
+    if args.exportar_plan:
+        biblioteca.guardar_plan(plan, args.exportar_plan)
+        print(f"💾 Plan guardado en: {args.exportar_plan}")
+        return
     
-    if respuesta != 's':
-        print("❌ Operación cancelada")
+    if args.dry_run:
+        print("\nℹ️  Dry run: no se ha movido ningún archivo")
         return
     
+    # Confirmar
+    if not args.si:
+        print("\n" + "=" * 80)
+        respuesta = input("¿Deseas unificar estas carpetas? (s/N): ").strip().lower()
+        
+        if respuesta != 's':
+            print("❌ Operación cancelada")
+            return
+    
     print("\n" + "=" * 80)
     print("🚀 INICIANDO UNIFICACIÓN")
     print("=" * 80)
     
-    # Unificar cada grupo
-    total_unificadas = 0
-    for carpetas in duplicados.values():
-        unificar_carpeta(carpetas)
-        total_unificadas += len(carpetas) - 1
+    # Un plan exportado puede tener horas: lo que haya aparecido desde entonces no se pisa
+    renombrados = biblioteca.revalidar_destinos(plan)
+    if renombrados:
+        print(f"⚠️  {renombrados} destinos ya existían: se renombran para no sobrescribirlos")
+    
+    diario = ruta_diario()
+    inicio = time.time()
+    resultado = biblioteca.aplicar_plan(plan, hilos=args.hilos, diario=diario)
     
     print("\n" + "=" * 80)
-    print(f"✅ COMPLETADO")
-    print(f"📊 {total_unificadas} carpetas unificadas en {len(duplicados)} grupos")
+    print(f"✅ COMPLETADO en {time.time() - inicio:.2f}s")
+    print(f"📊 {resultado['movidos']} archivos movidos, "
+          f"{len(resultado['carpetas_eliminadas'])} carpetas unificadas en {len(plan['grupos'])} grupos")
+    for error in resultado['errores']:
+        print(f"  ❌ {error['origen']}: {error['error']}")
+    print(f"↩️  Para deshacer: python unificar_carpetas.py --deshacer '{diario}'")
     print("=" * 80)
 
 if __name__ == "__main__":
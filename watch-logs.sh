@@ -1,12 +1,43 @@
 #!/bin/bash
 
 # Script para ver los logs del servidor Manga Organizer en tiempo real
+#
+# Uso:
+#   ./watch-logs.sh                 # todos los logs
+#   ./watch-logs.sh <id_trabajo>    # solo las líneas de un trabajo (ID devuelto por /upload)
+#   NIVEL=WARNING ./watch-logs.sh   # nivel mínimo: avisos, errores y críticos
+
+LOG_FILE="/opt/MangaRead/manga-organizer/logs/manga-organizer.log"
+TRABAJO="$1"
+NIVEL="${NIVEL^^}"
+NIVELES="DEBUG INFO WARNING ERROR CRITICAL"
+
+if [ -n "$NIVEL" ] && [[ " $NIVELES " != *" $NIVEL "* ]]; then
+    echo "❌ NIVEL debe ser uno de: $NIVELES"
+    exit 1
+fi
 
 echo "=========================================="
 echo "📊 LOGS DE MANGA ORGANIZER EN TIEMPO REAL"
 echo "=========================================="
+[ -n "$TRABAJO" ] && echo "🔎 Trabajo: $TRABAJO"
+[ -n "$NIVEL" ] && echo "🔎 Nivel mínimo: $NIVEL"
 echo ""
 echo "Presiona Ctrl+C para salir"
 echo ""
 
-tail -f /opt/MangaRead/manga-organizer/server.log
+if command -v jq >/dev/null 2>&1; then
+    tail -F "$LOG_FILE" | jq --unbuffered -r \
+        --arg trabajo "$TRABAJO" --arg nivel "$NIVEL" '
+        {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50} as $rango
+        | select($trabajo == "" or .trabajo == $trabajo)
+        | select($nivel == "" or ($rango[.nivel] // 0) >= $rango[$nivel])
+        | "\(.ts) \(.nivel) \(if .trabajo then "[\(.trabajo)] " else "" end)\(.mensaje)\(if .excepcion then "\n\(.excepcion)" else "" end)"'
+else
+    # NIVEL y los que van detrás en NIVELES, como alternativas: "WARNING|ERROR|CRITICAL"
+    ACEPTADOS=""
+    [ -n "$NIVEL" ] && ACEPTADOS=$(echo "$NIVELES" | tr ' ' '\n' | sed -n "/^$NIVEL\$/,\$p" | paste -sd'|')
+    tail -F "$LOG_FILE" \
+        | grep --line-buffered -F "${TRABAJO:+\"trabajo\": \"$TRABAJO\"}" \
+        | grep --line-buffered -E "${ACEPTADOS:+\"nivel\": \"($ACEPTADOS)\"}"
+fi
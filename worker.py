@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+Worker del pipeline de organización sobre una cola durable compartida (cola.py)
+
+Varios workers, en el mismo host o en otros (por ejemplo vía Tailscale con la
+biblioteca y la cola en almacenamiento compartido), reparten el trabajo. Cada
+uno usa su propio subconjunto de API keys.
+
+Uso:
+    python worker.py encolar "/opt/MangaRead/manga-organizer/Lote grande"
+    python worker.py trabajar --claves 1-5 --hilos 4      # host A
+    python worker.py trabajar --claves 6-10 --hilos 4     # host B
+    python worker.py estado
+"""
+import argparse
+import logging
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import cola
+import config
+import gemini_organizer
+import manifiesto
+import planificador
+import registro
+import sondeo
+
+log = logging.getLogger('worker')
+
+
+def parsear_claves(texto: str) -> list:
+    """'1-3,7' -> [1, 2, 3, 7]"""
+    numeros = []
+    for parte in texto.split(','):
+        parte = parte.strip()
+        if not parte:
+            continue
+        if '-' in parte:
+            inicio, fin = parte.split('-', 1)
+            numeros.extend(range(int(inicio), int(fin) + 1))
+        else:
+            numeros.append(int(parte))
+    return numeros
+
+
+def buscar_pdfs(rutas: list) -> list:
+    """Expande carpetas a los PDFs que contienen (recursivamente)"""
+    pdfs = []
+    for ruta in rutas:
+        if os.path.isdir(ruta):
+            for root, dirs, files in os.walk(ruta):
+                for file in sorted(files):
+                    if file.lower().endswith('.pdf'):
+                        pdfs.append(os.path.abspath(os.path.join(root, file)))
+        elif ruta.lower().endswith('.pdf'):
+            pdfs.append(os.path.abspath(ruta))
+    return pdfs
+
+
+class Latido:
+    """Hilo que renueva el lease de una tarea mientras se procesa"""
+
+    def __init__(self, q: cola.Cola, id_tarea: int, trabajador: str):
+        self.cola = q
+        self.id_tarea = id_tarea
+        self.trabajador = trabajador
+        self.perdido = False
+        self._parar = threading.Event()
+        self._hilo = threading.Thread(target=self._latir, daemon=True)
+
+    def _latir(self):
+        espera = config.QUEUE_HEARTBEAT_SECONDS
+        while not self._parar.wait(espera):
+            try:
+                renovado = self.cola.renovar(self.id_tarea, self.trabajador, config.QUEUE_LEASE_SECONDS)
+            except sqlite3.Error as e:
+                # Base bloqueada por otro worker, disco compartido caído...: el lease sigue
+                # vigente un rato, así que se reintenta pronto en vez de dejar que caduque
+                log.warning(f"⚠️  No se pudo renovar el lease de la tarea {self.id_tarea}: {e}")
+                espera = config.QUEUE_POLL_SECONDS
+                continue
+            espera = config.QUEUE_HEARTBEAT_SECONDS
+            if not renovado:
+                log.warning(f"⚠️  Lease perdido para la tarea {self.id_tarea}")
+                self.perdido = True
+                return
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._parar.set()
+        self._hilo.join()
+
+
+def ejecutar_tarea(q: cola.Cola, tarea: dict, trabajador: str, latido: Latido,
+                   prioridad: str = planificador.LOTE):
+    """Procesa una tarea reclamada y registra su resultado en la cola"""
+    carga = tarea['carga']
+    ruta = carga['ruta']
+    filename = os.path.basename(ruta)
+
+    if tarea['tipo'] == cola.ANALISIS:
+        if not os.path.exists(ruta):
+            q.fallar(tarea['id'], trabajador, f"El archivo no existe: {ruta}", reintentar_en=None)
+            return
+        metadatos = gemini_organizer.analizar_nombre_manga(filename, prioridad=prioridad)
+        if not metadatos:
+            q.fallar(tarea['id'], trabajador, "No se pudieron extraer metadatos del archivo",
+                     reintentar_en=config.RATE_LIMIT_WAIT)
+            return
+        q.completar(tarea['id'], trabajador, metadatos, siguientes=[{
+            'tipo': cola.MOVIMIENTO,
+            'carga': {'ruta': ruta, 'destino': carga['destino'], 'metadatos': metadatos},
+            'max_intentos': config.QUEUE_MAX_ATTEMPTS,
+        }])
+
+    elif tarea['tipo'] == cola.MOVIMIENTO:
+        if latido.perdido:
+            return  # Otro worker ya tiene la tarea: no mover dos veces
+        metadatos = carga['metadatos']
+        if not os.path.exists(ruta):
+            destino = gemini_organizer.ruta_destino(metadatos, carga['destino'])
+            if os.path.exists(destino['ruta']):
+                # Reintento de un movimiento que ya se hizo (p. ej. el worker murió antes de confirmarlo)
+                q.completar(tarea['id'], trabajador, {
+                    'success': True, 'original_name': filename, 'new_name': destino['nombre'],
+                    'full_path': destino['ruta'], 'ya_movido': True,
+                })
+            else:
+                # Ni en el origen ni en el destino: se borró o movió fuera de la cola
+                q.fallar(tarea['id'], trabajador,
+                         f"El archivo no existe ni en el origen ni en el destino: {ruta}", reintentar_en=None)
+            return
+        resultado = gemini_organizer.mover_manga(ruta, metadatos, carga['destino'])
+        if resultado['success']:
+            q.completar(tarea['id'], trabajador, resultado)
+        else:
+            q.fallar(tarea['id'], trabajador, resultado.get('error', 'Error desconocido'),
+                     reintentar_en=config.RETRY_DELAY)
+
+    else:
+        q.fallar(tarea['id'], trabajador, f"Tipo de tarea desconocido: {tarea['tipo']}", reintentar_en=None)
+
+
+def bucle_trabajo(q: cola.Cola, trabajador: str, parar: threading.Event, salir_si_vacia: bool,
+                  prioridad: str = planificador.LOTE):
+    """
+    Reclama y procesa tareas hasta que se pida parar (o la cola se vacíe)
+
+    Los errores de la base de la cola (p. ej. 'database is locked' con muchos
+    workers) no detienen el hilo: se reintenta con espera exponencial.
+    """
+    fallos = 0
+    while not parar.is_set():
+        try:
+            tarea = q.reclamar(trabajador, config.QUEUE_LEASE_SECONDS)
+            vacia = tarea is None and salir_si_vacia and q.pendientes() == 0
+        except sqlite3.Error as e:
+            fallos += 1
+            espera = min(config.QUEUE_POLL_SECONDS * 2 ** (fallos - 1), config.QUEUE_DB_RETRY_MAX)
+            log.warning(f"⚠️  Error en la base de la cola ({e}): reintento en {espera:.0f}s")
+            parar.wait(espera)
+            continue
+        fallos = 0
+        if tarea is None:
+            if vacia:
+                return
+            parar.wait(config.QUEUE_POLL_SECONDS)
+            continue
+
+        with registro.contexto(trabajo=f"tarea-{tarea['id']}", archivo=os.path.basename(tarea['carga']['ruta'])):
+            log.info(f"⚙️  {tarea['tipo']} (intento {tarea['intentos']}/{tarea['max_intentos']})")
+            try:
+                with Latido(q, tarea['id'], trabajador) as latido:
+                    ejecutar_tarea(q, tarea, trabajador, latido, prioridad)
+            except Exception as e:
+                log.exception(f"❌ Error inesperado en la tarea {tarea['id']}")
+                try:
+                    q.fallar(tarea['id'], trabajador, str(e), reintentar_en=config.RETRY_DELAY)
+                except sqlite3.Error:
+                    # Otro worker la reclamará cuando caduque su lease
+                    log.exception(f"❌ No se pudo registrar el fallo de la tarea {tarea['id']}")
+
+
+def comando_encolar(args):
+    q = cola.Cola(args.cola)
+    pdfs = buscar_pdfs(args.rutas)
+    for pdf in pdfs:
+        q.encolar(cola.ANALISIS, {'ruta': pdf, 'destino': args.destino}, max_intentos=config.QUEUE_MAX_ATTEMPTS)
+    print(f"📥 {len(pdfs)} archivo(s) encolados en {args.cola}")
+
+
+def comando_trabajar(args):
+    registro.configurar()
+    if args.claves:
+        gemini_organizer.usar_claves(parsear_claves(args.claves))
+    sondeo.iniciar()
+    manifiesto.iniciar()
+    q = cola.Cola(args.cola)
+    base = args.id or f"{socket.gethostname()}-{os.getpid()}"
+    parar = threading.Event()
+
+    log.info(f"🚀 Worker {base}: {args.hilos} hilo(s), "
+             f"API keys {args.claves or 'todas'}, prioridad {args.prioridad}, cola {args.cola}")
+    hilos = [
+        threading.Thread(
+            target=bucle_trabajo,
+            args=(q, f"{base}-{i}-{uuid.uuid4().hex[:6]}", parar, args.salir_si_vacia, args.prioridad),
+            daemon=True
+        )
+        for i in range(args.hilos)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    try:
+        while any(hilo.is_alive() for hilo in hilos):
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        log.info("🛑 Deteniendo worker: se terminan las tareas en curso...")
+        parar.set()
+        for hilo in hilos:
+            hilo.join()
+    log.info(f"🏁 Worker {base} detenido")
+
+
+def comando_estado(args):
+    q = cola.Cola(args.cola)
+    resumen = q.resumen()
+    if not resumen:
+        print("📭 La cola está vacía")
+        return
+    for tipo, estados in sorted(resumen.items()):
+        detalle = ', '.join(f"{estado}: {n}" for estado, n in sorted(estados.items()))
+        print(f"📊 {tipo}: {detalle}")
+    for tarea in q.fallidas(limite=args.fallidas):
+        print(f"  ❌ [{tarea['tipo']}] {tarea['carga']['ruta']}: {tarea['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Worker distribuido del Manga Organizer')
+    parser.add_argument('--cola', default=config.QUEUE_DB_PATH, help='Base SQLite de la cola compartida')
+    sub = parser.add_subparsers(dest='comando', required=True)
+
+    p_encolar = sub.add_parser('encolar', help='Encolar PDFs (o carpetas) para organizar')
+    p_encolar.add_argument('rutas', nargs='+')
+    p_encolar.add_argument('--destino', default=config.MANGA_DESTINATION)
+    p_encolar.set_defaults(func=comando_encolar)
+
+    p_trabajar = sub.add_parser('trabajar', help='Procesar tareas de la cola')
+    p_trabajar.add_argument('--claves', help="API keys de este worker, ej. '1-3,7' (por defecto todas)")
+    p_trabajar.add_argument('--hilos', type=int, default=2, help='Tareas en paralelo en este worker')
+    p_trabajar.add_argument('--id', help='Identificador del worker (por defecto host-pid)')
+    p_trabajar.add_argument('--prioridad', default=planificador.LOTE,
+                            choices=[planificador.LOTE, planificador.MANTENIMIENTO],
+                            help='Prioridad de los análisis frente a las subidas web (por defecto lote)')
+    p_trabajar.add_argument('--salir-si-vacia', action='store_true', help='Terminar cuando no queden tareas')
+    p_trabajar.set_defaults(func=comando_trabajar)
+
+    p_estado = sub.add_parser('estado', help='Resumen de la cola')
+    p_estado.add_argument('--fallidas', type=int, default=20, help='Cuántas tareas fallidas mostrar')
+    p_estado.set_defaults(func=comando_estado)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()